@@ -6,6 +6,9 @@ import bpy
 from . import panel
 from . import operators
 from . import data
+from . import assetCache
+from . import buildLayers
+from . import updateScheduler
 import logging
 import pathlib
 
@@ -73,9 +76,12 @@ classes = (
     operators.ACA_OT_default_ludingRafterSpan,
     operators.ACA_OT_Show_Message_Box,
     operators.ACA_OT_PROFILE,
+    operators.ACA_OT_LEAK_CHECK,
+    operators.ACA_OT_purge_orphans,
     operators.ACA_OT_EXPORT_FBX,
     operators.ACA_OT_EXPORT_GLB,
     operators.ACA_OT_JOIN,
+    operators.ACA_OT_REALIZE_TILE,
     operators.ACA_UL_Template_Items,
     operators.ACA_OT_SELECT_TEMPLATE_DIALOG,
 )
@@ -91,6 +97,15 @@ def register():
     # 初始化日志记录器
     initLogger()
 
+    # 注册资产缓存的文件回调
+    assetCache.register()
+
+    # 注册分层重建的文件回调
+    buildLayers.register()
+
+    # 注册延迟重建的文件回调
+    updateScheduler.register()
+
     # 250311 发现在中文版中UV贴图异常
     # 最终发现是该选项会导致生成的'UVMap'变成'UV贴图'
     # 禁用语言-翻译-新建数据
@@ -106,6 +121,15 @@ def unregister():
     # 销毁自定义属性
     data.delprop()
 
+    # 移除资产缓存
+    assetCache.unregister()
+
+    # 清除分层重建的记录
+    buildLayers.unregister()
+
+    # 取消等待中的重建
+    updateScheduler.unregister()
+
     # 移除日志记录器
     removeLogger()
 
@@ -0,0 +1,173 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   资产预处理缓存
+#   瓦片、屋脊、跑兽等资产在每次营造时都需要复制、按斗口缩放、
+#   应用缩放和修改器，每一步都会触发场景刷新，且前后檐、两山、
+#   每次重新生成、每个建筑都要重复一遍
+#   这里按（资产，斗口，琉璃配色）缓存预处理后的结果，在整个会话中复用
+#   资产以对象指针和资产库文件的修改时间标识，重新载入或资产库更新后自然失效
+#   保存、打开新文件、卸载插件时清空缓存
+import os
+import bpy
+from bpy.app.handlers import persistent
+from mathutils import Matrix
+
+from . import utils
+from . import meshArray
+from . import texture as mat
+from .const import ACA_Consts as con
+from .data import ACA_data_obj as acaData
+
+# 瓦片网格数组的缓存
+# key为（资产标识，斗口，瓦面配色，剪边配色）
+__tileCache = {}
+# 缩放后网格的缓存，用于屋脊、跑兽等仍以对象出现的构件
+# key为（资产标识，斗口）
+__meshCache = {}
+# 缓存网格的命名前缀
+CACHE_PREFIX = 'ACA.cache.'
+
+# 资产库文件的标识，取路径和修改时间
+# 资产库文件更新后，缓存自然失效
+def __getLibraryKey(sourceObj:bpy.types.Object):
+    library = sourceObj.library
+    if library == None:
+        return None
+    filepath = bpy.path.abspath(library.filepath)
+    try:
+        mtime = os.path.getmtime(filepath)
+    except OSError:
+        mtime = None
+    return (filepath,mtime)
+
+# 资产的缓存标识
+# 同一资产重复载入时，link方式返回同一对象，可以复用缓存
+# append方式或资产库更新后为新对象，指针不同，不会命中旧的缓存
+# 指针可能被复用，所以同时取对象名和网格名
+def __getAssetKey(sourceObj:bpy.types.Object):
+    return (sourceObj.as_pointer(),
+            sourceObj.data.as_pointer(),
+            sourceObj.name,
+            sourceObj.data.name,
+            __getLibraryKey(sourceObj))
+
+# 斗口取一定精度，避免浮点误差导致缓存失效
+def __getDkKey(dk):
+    return round(dk,6)
+
+# 获取预处理后的瓦片网格数组
+# 按斗口缩放、应用修改器、切换琉璃材质编号
+# 返回的数组为共享的缓存，调用方不应修改
+def getTileArrays(sourceObj:bpy.types.Object,
+                  bData:acaData):
+    key = (__getAssetKey(sourceObj)
+           + (__getDkKey(bData.DK),
+              bData.tile_color,
+              bData.tile_alt_color))
+    tileArrays = __tileCache.get(key)
+    if tileArrays != None:
+        return tileArrays
+
+    # 未命中缓存，复制一个临时对象处理，用完即删除
+    tileObj:bpy.types.Object = utils.copyObject(
+        sourceObj,singleUser=True)
+    # 根据斗口调整尺度
+    tileObj = utils.resizeObj(tileObj,
+        bData.DK / con.DEFAULT_DK)
+    utils.applyTransfrom(tileObj,use_scale=True)
+    # 应用所有的modifier，以免后续快速合并时丢失
+    utils.applyAllModifer(tileObj)
+    tileArrays = meshArray.getMeshArrays(tileObj.data)
+    # 250110 新增琉璃颜色切换
+    # 仅在数组上切换材质编号，不再对单个瓦片展UV
+    # UV在瓦面合并后统一展开
+    tileArrays['matIndex'] = mat.setGlazeSlots(
+        tileArrays['matIndex'],sourceObj.data.name,bData)
+    tileMesh = tileObj.data
+    bpy.data.objects.remove(tileObj)
+    bpy.data.meshes.remove(tileMesh)
+
+    __tileCache[key] = tileArrays
+    return tileArrays
+
+# 获取按斗口缩放后的网格
+# 等同于复制对象后resizeObj，再applyTransfrom(use_scale=True)，
+# 但直接在网格上做变换，不触发场景刷新
+def __getScaledMesh(sourceObj:bpy.types.Object,dk):
+    key = __getAssetKey(sourceObj) + (__getDkKey(dk),)
+    mesh = __meshCache.get(key)
+    if mesh != None:
+        try:
+            mesh.name
+            return mesh
+        except ReferenceError:
+            # 缓存网格已被外部删除
+            del __meshCache[key]
+
+    scale = sourceObj.matrix_basis.decompose()[2] * (dk / con.DEFAULT_DK)
+    mesh = sourceObj.data.copy()
+    mesh.name = CACHE_PREFIX + sourceObj.data.name
+    mesh.transform(Matrix.Diagonal(scale).to_4x4())
+    # 保留伪用户，以免被清理孤立数据时删除
+    mesh.use_fake_user = True
+    __meshCache[key] = mesh
+    return mesh
+
+# 复制资产对象，并使用按斗口缩放后的网格
+# 替代copyObject(singleUser=True)+resizeObj+applyTransfrom(use_scale=True)
+# 修改器仍保留在新对象上，与原来的处理一致
+def copyAsset(sourceObj:bpy.types.Object,
+              dk,
+              name=None,
+              parentObj:bpy.types.Object = None,
+              location=None,
+              rotation=None,
+              ) -> bpy.types.Object:
+    newObj = utils.copyObject(
+        sourceObj=sourceObj,
+        name=name,
+        parentObj=parentObj,
+        location=location,
+        rotation=rotation,
+        scale=(1,1,1))
+    newObj.data = __getScaledMesh(sourceObj,dk).copy()
+    newObj.data.name = sourceObj.data.name
+    newObj.data.use_fake_user = False
+    # 不再逐个刷新场景，需要尺寸时以utils.getDimensions获取
+    utils.markSceneDirty()
+    return newObj
+
+# 清空缓存
+# 在保存文件、卸载插件时调用
+def clearCache():
+    __tileCache.clear()
+    for mesh in __meshCache.values():
+        try:
+            bpy.data.meshes.remove(mesh)
+        except ReferenceError:
+            pass
+    __meshCache.clear()
+    return
+
+# 打开新文件后，原来的网格引用已经失效，仅清空索引
+@persistent
+def __onLoadPost(dummy):
+    __tileCache.clear()
+    __meshCache.clear()
+
+# 保存前移除缓存网格，以免写入用户的blend文件
+@persistent
+def __onSavePre(dummy):
+    clearCache()
+
+def register():
+    bpy.app.handlers.load_post.append(__onLoadPost)
+    bpy.app.handlers.save_pre.append(__onSavePre)
+
+def unregister():
+    if __onLoadPost in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(__onLoadPost)
+    if __onSavePre in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(__onSavePre)
+    clearCache()
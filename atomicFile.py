@@ -0,0 +1,36 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   文件的原子写入
+#   先写入同目录下的临时文件，再整体替换，写入中途崩溃时原文件不受影响
+#   仅依赖标准库，不依赖bpy，可以脱离blender做测试
+import os
+import shutil
+import tempfile
+
+# 原子写入文件
+# mkstemp创建的临时文件权限为0600，替换后原文件的权限会随之改变，
+# 共享或网络目录中的模板库会变为仅所有者可读写，
+# 所以替换前先将原文件的权限复制到临时文件
+def writeAtomic(filePath,data:bytes):
+    folder = os.path.dirname(filePath)
+    fd,tempPath = tempfile.mkstemp(
+        dir=folder,prefix='.aca.',suffix='.tmp')
+    try:
+        with os.fdopen(fd,'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(filePath):
+            shutil.copymode(filePath,tempPath)
+        else:
+            # 新建的文件，按umask设置默认权限，与open()新建文件一致
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tempPath,0o666 & ~umask)
+        os.replace(tempPath,filePath)
+    except:
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+    return
@@ -0,0 +1,225 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   命令行批量营造，无需界面，用于在渲染节点上批量生成建筑样式库
+#   每个模板输出一个.blend或.glb文件，以及一个记录营造耗时、
+#   对象数量、顶点/面数、内存峰值的metrics.json
+#   用法：
+#   blender -b --python "<插件目录>/batchBuild.py" -- [参数]
+#       --templates 模板1 模板2 ...  待营造的模板，不填则营造所有模板
+#       --format glb|blend           输出格式，默认glb
+#       --output 目录                 输出目录，默认为当前目录下的aca_batch
+#       --list                       仅列出所有模板
+#   任一模板营造失败时，以非0状态退出
+
+# 以脚本方式运行时，先启用插件，再以插件包的方式重新载入本模块
+# 否则无法使用插件内的相对引用
+if __name__ == "__main__":
+    import os
+    import sys
+    import importlib
+    import addon_utils
+    folder = os.path.dirname(os.path.abspath(__file__))
+    addonName = None
+    for mod in addon_utils.modules():
+        if os.path.dirname(os.path.abspath(mod.__file__)) == folder:
+            addonName = mod.__name__
+            break
+    if addonName == None:
+        print("ACA: 未找到插件，请先安装ACA Builder")
+        sys.exit(2)
+    addon_utils.enable(addonName, default_set=False)
+    batch = importlib.import_module(addonName + '.batchBuild')
+    argv = []
+    if '--' in sys.argv:
+        argv = sys.argv[sys.argv.index('--')+1:]
+    sys.exit(batch.main(argv))
+
+import bpy
+import os
+import json
+import time
+import argparse
+import traceback
+
+from .const import ACA_Consts as con
+from . import utils
+from . import build
+from . import template
+from . import buildTrace
+from . import buildRooftile
+
+# 进程的内存峰值(MB)，不支持的平台返回None
+def __getPeakMemory():
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字节为单位，linux以KB为单位
+    if sys.platform == 'darwin':
+        return round(peak/1024/1024,1)
+    return round(peak/1024,1)
+
+# 统计根目录下的对象数量和网格规模
+def getSceneStats():
+    stats = {'objects':0,'verts':0,'faces':0}
+    rootColl = bpy.data.collections.get(con.ROOT_COLL_NAME)
+    if rootColl == None:
+        return stats
+    for obj in rootColl.all_objects:
+        stats['objects'] += 1
+        if obj.type == 'MESH':
+            stats['verts'] += len(obj.data.vertices)
+            stats['faces'] += len(obj.data.polygons)
+    return stats
+
+# 营造的建筑根节点
+def getBuildings():
+    buildingList = []
+    rootColl = bpy.data.collections.get(con.ROOT_COLL_NAME)
+    if rootColl == None:
+        return buildingList
+    for obj in rootColl.all_objects:
+        if (hasattr(obj,'ACA_data')
+            and obj.ACA_data.aca_type in (
+                con.ACA_TYPE_BUILDING,con.ACA_TYPE_YARDWALL)):
+            buildingList.append(obj)
+    return buildingList
+
+# 清除已营造的建筑，以便下一个模板单独输出
+def clearBuildings():
+    rootColl = bpy.data.collections.get(con.ROOT_COLL_NAME)
+    if rootColl == None:
+        return
+    # 与build.delBuilding一致，仅释放建筑自身的对象和数据
+    # 不再全局清理孤立数据，以免影响用户的其他数据，以及泄漏检测的统计
+    objList = []
+    collList = []
+    for coll in list(rootColl.children):
+        objList += list(coll.all_objects)
+        collList += [coll] + list(coll.children_recursive)
+        rootColl.children.unlink(coll)
+    bpy.data.batch_remove(collList)
+    utils.deleteObjects(objList)
+    return
+
+# 输出文件
+def __export(filePath,fileFormat):
+    if fileFormat == 'blend':
+        bpy.ops.wm.save_as_mainfile(
+            filepath=filePath,copy=True)
+    else:
+        # 瓦片实例先实体化，导出器不能可靠的导出几何节点实例
+        for buildingObj in getBuildings():
+            buildRooftile.realizeTileInstances(buildingObj)
+        bpy.ops.export_scene.gltf(
+            filepath=filePath,
+            export_format='GLB',
+            use_visible=True,           # only visible
+            use_renderable=True,        # only renderable
+            export_apply=True,          # apply modifiers
+            export_animations=False,    # not export ani
+            export_skins=False,         # not export skin
+            export_morph=False,         # not export shapekey
+        )
+    return
+
+# 文件名中去除非法字符
+def __getFileName(templateName):
+    for char in '\\/:*?"<>|':
+        templateName = templateName.replace(char,'_')
+    return templateName
+
+# 营造单个模板，返回metrics
+def buildTemplate(templateName,outputFolder,fileFormat='glb'):
+    fileName = __getFileName(templateName)
+    filePath = os.path.join(outputFolder,fileName + '.' + fileFormat)
+    metrics = {
+        'template' : templateName,
+        'success' : False,
+        'output' : None,
+        'time' : 0.0,
+    }
+    timeStart = time.perf_counter()
+    try:
+        clearBuildings()
+        # 开启营造计时，分阶段耗时写入metrics
+        bpy.context.scene.ACA_data.is_build_trace = True
+        result = utils.fastRun(
+            lambda:build.build(templateName))
+        if 'FINISHED' not in result:
+            raise Exception(str(result.get('CANCELLED')))
+        metrics['time'] = round(time.perf_counter() - timeStart,3)
+        metrics['stages'] = buildTrace.getSpans()
+        metrics.update(getSceneStats())
+        __export(filePath,fileFormat)
+        metrics['output'] = filePath
+        metrics['success'] = True
+    except Exception as e:
+        metrics['time'] = round(time.perf_counter() - timeStart,3)
+        metrics['error'] = str(e)
+        utils.outputMsg("批量营造失败：" + templateName)
+        traceback.print_exc()
+    metrics['peak_memory_mb'] = __getPeakMemory()
+
+    with open(os.path.join(outputFolder,fileName + '.metrics.json'),
+              'w',encoding='utf-8') as f:
+        json.dump(metrics,f,ensure_ascii=False,indent=1)
+    return metrics
+
+def __parseArgs(argv):
+    parser = argparse.ArgumentParser(
+        prog='batchBuild',
+        description='ACA Builder 批量营造')
+    parser.add_argument('--templates',nargs='*',default=None,
+                        help='待营造的模板名称，不填则营造所有模板')
+    parser.add_argument('--format',choices=('glb','blend'),
+                        default='glb',help='输出格式')
+    parser.add_argument('--output',default='aca_batch',
+                        help='输出目录')
+    parser.add_argument('--list',action='store_true',
+                        help='仅列出所有模板')
+    return parser.parse_args(argv)
+
+# 命令行入口，返回进程的退出状态
+def main(argv):
+    args = __parseArgs(argv)
+    templateList = template.getTemplateList(onlyname=True)
+    if args.list:
+        for templateName in templateList:
+            print(templateName)
+            for child in template.getTemplateChild(templateName):
+                print('  ' + child['templateName'])
+        return 0
+
+    # 组合模板在营造时自动包括其子模板
+    if args.templates:
+        unknown = [name for name in args.templates
+                   if name not in templateList]
+        if len(unknown) > 0:
+            print("ACA: 未找到模板：" + ','.join(unknown))
+            return 2
+        templateList = args.templates
+
+    outputFolder = os.path.abspath(args.output)
+    os.makedirs(outputFolder,exist_ok=True)
+
+    summary = []
+    for templateName in templateList:
+        metrics = buildTemplate(templateName,outputFolder,args.format)
+        summary.append({key:metrics.get(key) for key in (
+            'template','success','time','objects','verts','faces')})
+        utils.outputMsg("%s: %s, %.1fs" % (
+            templateName,
+            'OK' if metrics['success'] else 'FAILED',
+            metrics['time']))
+    with open(os.path.join(outputFolder,'summary.json'),
+              'w',encoding='utf-8') as f:
+        json.dump(summary,f,ensure_ascii=False,indent=1)
+
+    failed = [item for item in summary if not item['success']]
+    if len(failed) > 0:
+        return 1
+    return 0
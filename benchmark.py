@@ -0,0 +1,530 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   性能回归测试
+#   以template.xml中的模板为基础，按屋顶类型、是否使用斗栱、
+#   不同的面阔间数/步架数组合成固定的测试矩阵，
+#   每个组合在后台重复营造N次，统计各阶段耗时的中位数和P95、对象数量和顶点数
+#   结果可保存为基线，后续运行与基线比较，超过阈值的阶段视为性能回退
+#   用法：
+#   blender -b --python "<插件目录>/benchmark.py" -- [参数]
+#       --repeat N              每个组合重复营造的次数，默认5
+#       --baseline 文件          基线文件，默认为当前目录下的aca_baseline.json
+#       --save                  将本次结果保存为基线
+#       --threshold 0.1         耗时增加超过该比例视为回退，默认10%
+#       --min-delta 0.05        耗时增加小于该秒数时忽略，避免短阶段的计时抖动
+#       --styles 1 2 ...        仅测试指定的屋顶类型
+#       --output 文件            本次结果的输出文件，默认aca_benchmark.json
+#   与基线比较时，存在回退则以非0状态退出
+#   规模曲线：
+#       --sweep                 按面阔间数、进深间数、步架数分别扫描建筑规模，
+#                               拟合各阶段耗时与瓦片数量、柱子数量的幂指数，
+#                               指数明显大于1的阶段标记为超线性
+#       --tolerance 0.15        指数超过1+tolerance时标记，默认0.15
+#   泄漏检测：
+#       --leak K                以--styles中的屋顶类型各营造一个建筑，
+#                               重复重建K次，检测持续增长的数据块和python内存
+#                               发现泄漏时以非0状态退出
+#   UV检查：
+#       --uv-check              以--styles中的屋顶类型各营造一个建筑，使用瓦片实例，
+#                               实体化后比较实例瓦片与合并瓦面的UV密度
+#                               不一致时以非0状态退出
+
+# 以脚本方式运行时，先启用插件，再以插件包的方式重新载入本模块
+# 否则无法使用插件内的相对引用
+if __name__ == "__main__":
+    import os
+    import sys
+    import importlib
+    import addon_utils
+    folder = os.path.dirname(os.path.abspath(__file__))
+    addonName = None
+    for mod in addon_utils.modules():
+        if os.path.dirname(os.path.abspath(mod.__file__)) == folder:
+            addonName = mod.__name__
+            break
+    if addonName == None:
+        print("ACA: 未找到插件，请先安装ACA Builder")
+        sys.exit(2)
+    addon_utils.enable(addonName, default_set=False)
+    bench = importlib.import_module(addonName + '.benchmark')
+    argv = []
+    if '--' in sys.argv:
+        argv = sys.argv[sys.argv.index('--')+1:]
+    sys.exit(bench.main(argv))
+
+import bpy
+import os
+import json
+import math
+import argparse
+
+from .const import ACA_Consts as con
+from . import utils
+from . import build
+from . import template
+from . import templateStore
+from . import buildTrace
+from . import batchBuild
+from . import leakCheck
+from . import buildRooftile
+
+# 基线文件的格式版本
+BASELINE_VERSION = 1
+
+# 测试矩阵
+# 屋顶类型
+ROOF_STYLES = (
+    con.ROOF_WUDIAN,
+    con.ROOF_XIESHAN,
+    con.ROOF_XUANSHAN,
+    con.ROOF_YINGSHAN,
+    con.ROOF_LUDING,
+    con.ROOF_XUANSHAN_JUANPENG,
+    con.ROOF_YINGSHAN_JUANPENG,
+    con.ROOF_XIESHAN_JUANPENG,
+)
+# 是否使用斗栱
+DOUGONG_OPTIONS = (False,True)
+# 建筑规模：（面阔间数，步架数）
+SIZE_OPTIONS = ((3,4),(5,6),(7,8))
+
+# 规模曲线的扫描范围
+# 以基准规模为中心，每次仅改变一个参数
+SWEEP_BASE = {'x_rooms':5,'y_rooms':3,'rafter_count':6}
+SWEEP_RANGES = {
+    'x_rooms' : (3,5,7,9,11),
+    'y_rooms' : (1,2,3,4,5),
+    # 步架数在data中限制为最多9
+    'rafter_count' : (4,5,6,7,8,9),
+}
+# 拟合时忽略的耗时下限(秒)，过短的阶段计时抖动太大
+SWEEP_MIN_TIME = 0.005
+
+# 查找各个屋顶类型的基础模板
+# 取模板库中第一个该屋顶类型的单体建筑
+def getBaseTemplates():
+    path = template.getTemplatePath()
+    baseTemplates = {}
+    for templateName in template.getTemplateList(onlyname=True):
+        if (template.getBuildingType(templateName)
+                != con.ACA_TYPE_BUILDING):
+            continue
+        params = templateStore.getTemplateParams(path,templateName)
+        if params == None or 'roof_style' not in params:
+            continue
+        roofStyle = str(params['roof_style'])
+        if roofStyle not in baseTemplates:
+            baseTemplates[roofStyle] = templateName
+    return baseTemplates
+
+# 生成测试矩阵
+def getCases(styles=None):
+    baseTemplates = getBaseTemplates()
+    cases = []
+    for roofStyle in ROOF_STYLES:
+        if styles and roofStyle not in styles:
+            continue
+        # 模板库中没有该屋顶类型时，借用第一个模板修改屋顶类型
+        baseTemplate = baseTemplates.get(roofStyle)
+        if baseTemplate == None and len(baseTemplates) > 0:
+            baseTemplate = list(baseTemplates.values())[0]
+        if baseTemplate == None:
+            continue
+        for useDg in DOUGONG_OPTIONS:
+            for xRooms,rafterCount in SIZE_OPTIONS:
+                cases.append({
+                    'key' : 'roof%s.dg%d.x%d.r%d' % (
+                        roofStyle,useDg,xRooms,rafterCount),
+                    'template' : baseTemplate,
+                    'params' : {
+                        'roof_style' : int(roofStyle),
+                        'use_dg' : useDg,
+                        'x_rooms' : xRooms,
+                        'rafter_count' : rafterCount,
+                    },
+                })
+    return cases
+
+# 营造基础模板，并修改为测试参数
+# 修改面阔间数后，与重设地盘一样清空柱网、额枋、装修、踏跺的设置
+def prepareCase(case):
+    batchBuild.clearBuildings()
+    buildTrace.enable(False)
+    result = utils.fastRun(
+        lambda:build.build(case['template']))
+    if 'FINISHED' not in result:
+        raise Exception(str(result.get('CANCELLED')))
+    buildingObj = batchBuild.getBuildings()[0]
+    bData = buildingObj.ACA_data
+    for key,value in case['params'].items():
+        bData[key] = value
+    for key in ('piller_net','fang_net','wall_net','step_net'):
+        bData[key] = ''
+    return buildingObj
+
+# 将嵌套的span展开为{阶段路径:耗时}
+# 同一路径出现多次时（如前后檐、两山各调用一次），耗时累加
+def flattenSpans(spans,prefix='',result=None):
+    if result == None:
+        result = {}
+    for record in spans:
+        path = prefix + record['name']
+        result[path] = result.get(path,0.0) + record['duration']
+        flattenSpans(record['children'],path + '/',result)
+    return result
+
+# 重复营造，返回每次的各阶段耗时
+def runCase(buildingObj,repeat):
+    runs = []
+    for n in range(repeat):
+        bpy.context.scene.ACA_data.is_build_trace = True
+        result = utils.fastRun(
+            lambda:build.updateBuilding(buildingObj))
+        if 'FINISHED' not in result:
+            raise Exception(str(result.get('CANCELLED')))
+        runs.append(flattenSpans(buildTrace.getSpans()))
+    return runs
+
+# 取百分位数，按最近秩法
+def percentile(values,p):
+    values = sorted(values)
+    if len(values) == 0:
+        return 0.0
+    rank = max(1,math.ceil(p/100*len(values)))
+    return values[min(rank,len(values))-1]
+
+# 汇总各阶段的中位数和P95
+def summarize(runs):
+    stages = {}
+    for path in runs[0].keys():
+        values = [run.get(path,0.0) for run in runs]
+        stages[path] = {
+            'median' : round(percentile(values,50),4),
+            'p95' : round(percentile(values,95),4),
+        }
+    return stages
+
+# 执行整个测试矩阵
+def runBenchmark(repeat=5,styles=None):
+    cases = {}
+    for case in getCases(styles):
+        utils.outputMsg("Benchmark: " + case['key'])
+        entry = {'template':case['template'],'params':case['params']}
+        try:
+            buildingObj = prepareCase(case)
+            runs = runCase(buildingObj,repeat)
+            entry['stages'] = summarize(runs)
+            entry.update(batchBuild.getSceneStats())
+        except Exception as e:
+            entry['error'] = str(e)
+        cases[case['key']] = entry
+    batchBuild.clearBuildings()
+    return {
+        'version' : BASELINE_VERSION,
+        'blender' : bpy.app.version_string,
+        'repeat' : repeat,
+        'cases' : cases,
+    }
+
+# 与基线比较
+# 中位数耗时增加超过threshold比例，且超过minDelta秒的阶段视为回退
+# 对象数量和顶点数的变化一并列出，便于判断是否为预期的修改
+def compare(baseline,current,threshold=0.1,minDelta=0.05):
+    regressions = []
+    changes = []
+    for key,entry in current['cases'].items():
+        baseEntry = baseline['cases'].get(key)
+        if baseEntry == None:
+            continue
+        if 'error' in entry and 'error' not in baseEntry:
+            regressions.append({'case':key,'error':entry['error']})
+            continue
+        if 'stages' not in entry or 'stages' not in baseEntry:
+            continue
+        for path,stat in entry['stages'].items():
+            baseStat = baseEntry['stages'].get(path)
+            if baseStat == None:
+                continue
+            delta = stat['median'] - baseStat['median']
+            if (delta > minDelta
+                and stat['median'] > baseStat['median']*(1+threshold)):
+                regressions.append({
+                    'case' : key,
+                    'stage' : path,
+                    'baseline' : baseStat['median'],
+                    'current' : stat['median'],
+                    'ratio' : round(stat['median']
+                                    / max(baseStat['median'],1e-6),3),
+                })
+        for field in ('objects','verts'):
+            if entry.get(field) != baseEntry.get(field):
+                changes.append({
+                    'case' : key,
+                    'field' : field,
+                    'baseline' : baseEntry.get(field),
+                    'current' : entry.get(field),
+                })
+    return regressions,changes
+
+# 生成规模曲线的扫描点
+def getSweepPoints(styles=None):
+    baseTemplates = getBaseTemplates()
+    points = []
+    for roofStyle in ROOF_STYLES:
+        if styles and roofStyle not in styles:
+            continue
+        baseTemplate = baseTemplates.get(roofStyle)
+        if baseTemplate == None and len(baseTemplates) > 0:
+            baseTemplate = list(baseTemplates.values())[0]
+        if baseTemplate == None:
+            continue
+        keys = set()
+        for axis,values in SWEEP_RANGES.items():
+            for value in values:
+                params = dict(SWEEP_BASE)
+                params[axis] = value
+                key = 'roof%s.x%d.y%d.r%d' % (
+                    roofStyle,params['x_rooms'],
+                    params['y_rooms'],params['rafter_count'])
+                # 各个参数的基准点相同，仅营造一次
+                if key in keys:
+                    continue
+                keys.add(key)
+                params['roof_style'] = int(roofStyle)
+                points.append({
+                    'key' : key,
+                    'roofStyle' : roofStyle,
+                    'template' : baseTemplate,
+                    'params' : params,
+                })
+    return points
+
+# 在双对数坐标下做最小二乘拟合，返回（指数，R²）
+# 有效点少于3个，或自变量没有变化时返回None
+def fitExponent(xs,ys):
+    pairs = [(math.log(x),math.log(y)) for x,y in zip(xs,ys)
+             if x > 0 and y > 0]
+    if len(pairs) < 3:
+        return None
+    n = len(pairs)
+    mx = sum(p[0] for p in pairs)/n
+    my = sum(p[1] for p in pairs)/n
+    sxx = sum((p[0]-mx)**2 for p in pairs)
+    syy = sum((p[1]-my)**2 for p in pairs)
+    sxy = sum((p[0]-mx)*(p[1]-my) for p in pairs)
+    if sxx == 0:
+        return None
+    slope = sxy/sxx
+    r2 = 1.0 if syy == 0 else sxy*sxy/(sxx*syy)
+    return slope,r2
+
+# 执行规模曲线扫描
+def runSweep(repeat=3,styles=None,tolerance=0.15):
+    samples = []
+    for point in getSweepPoints(styles):
+        utils.outputMsg("Sweep: " + point['key'])
+        sample = {'key':point['key'],'roofStyle':point['roofStyle'],
+                  'params':point['params']}
+        try:
+            buildingObj = prepareCase(point)
+            runs = runCase(buildingObj,repeat)
+            sample['stages'] = {path:stat['median'] for path,stat
+                                in summarize(runs).items()}
+            counters = buildTrace.getSpans()[0]['counters']
+            sample['tiles'] = counters.get('tiles',0)
+            sample['pillers'] = counters.get('pillers',0)
+        except Exception as e:
+            sample['error'] = str(e)
+        samples.append(sample)
+    batchBuild.clearBuildings()
+
+    # 按屋顶类型分别拟合，各阶段对瓦片数量、柱子数量分别求指数
+    fits = []
+    for roofStyle in sorted(set(s['roofStyle'] for s in samples)):
+        group = [s for s in samples
+                 if s['roofStyle'] == roofStyle and 'stages' in s]
+        paths = set()
+        for s in group:
+            paths.update(s['stages'].keys())
+        for path in sorted(paths):
+            points = [s for s in group
+                      if s['stages'].get(path,0) >= SWEEP_MIN_TIME]
+            fit = {'roofStyle':roofStyle,'stage':path,
+                   'points':len(points)}
+            for driver in ('tiles','pillers'):
+                result = fitExponent(
+                    [s[driver] for s in points],
+                    [s['stages'][path] for s in points])
+                if result != None:
+                    fit[driver] = {'exponent':round(result[0],3),
+                                   'r2':round(result[1],3)}
+            # 以拟合度较高的规模参数判断是否超线性
+            drivers = [fit[d] for d in ('tiles','pillers') if d in fit]
+            if len(drivers) == 0:
+                continue
+            best = max(drivers,key=lambda d:d['r2'])
+            fit['superlinear'] = best['exponent'] > 1 + tolerance
+            fits.append(fit)
+    return {
+        'version' : BASELINE_VERSION,
+        'blender' : bpy.app.version_string,
+        'repeat' : repeat,
+        'tolerance' : tolerance,
+        'samples' : samples,
+        'fits' : fits,
+    }
+
+# 执行泄漏检测
+# 各个屋顶类型取基础模板，按默认规模重复重建
+def runLeak(cycles=5,styles=None):
+    reports = []
+    baseTemplates = getBaseTemplates()
+    for roofStyle,templateName in baseTemplates.items():
+        if styles and roofStyle not in styles:
+            continue
+        batchBuild.clearBuildings()
+        result = utils.fastRun(
+            lambda:build.build(templateName))
+        if 'FINISHED' not in result:
+            reports.append({'building':templateName,
+                            'error':str(result.get('CANCELLED'))})
+            continue
+        buildingObj = batchBuild.getBuildings()[0]
+        try:
+            report = leakCheck.runLeakCheck(buildingObj,cycles)
+        except Exception as e:
+            report = {'building':templateName,'error':str(e)}
+        else:
+            leakCheck.outputReport(report)
+        reports.append(report)
+    batchBuild.clearBuildings()
+    return reports
+
+# 执行瓦片UV检查
+# 各个屋顶类型取基础模板，改为瓦片实例后重新营造
+def runUVCheck(styles=None):
+    reports = []
+    baseTemplates = getBaseTemplates()
+    for roofStyle,templateName in baseTemplates.items():
+        if styles and roofStyle not in styles:
+            continue
+        batchBuild.clearBuildings()
+        result = utils.fastRun(
+            lambda:build.build(templateName))
+        if 'FINISHED' in result:
+            buildingObj = batchBuild.getBuildings()[0]
+            buildingObj.ACA_data['use_tile_instance'] = True
+            result = utils.fastRun(
+                lambda:build.updateBuilding(buildingObj))
+        if 'FINISHED' not in result:
+            reports.append({'building':templateName,
+                            'error':str(result.get('CANCELLED'))})
+            continue
+        mismatches = buildRooftile.checkTileUV(buildingObj)
+        for matName,realized,merged in mismatches:
+            utils.outputMsg("UV不一致：%s %s 实例%.6f 合并%.6f" % (
+                templateName,matName,realized,merged))
+        reports.append({'building':templateName,
+                        'mismatches':mismatches})
+    batchBuild.clearBuildings()
+    return reports
+
+def __parseArgs(argv):
+    parser = argparse.ArgumentParser(
+        prog='benchmark',
+        description='ACA Builder 性能回归测试')
+    parser.add_argument('--repeat',type=int,default=5)
+    parser.add_argument('--baseline',default='aca_baseline.json')
+    parser.add_argument('--save',action='store_true')
+    parser.add_argument('--threshold',type=float,default=0.1)
+    parser.add_argument('--min-delta',type=float,default=0.05)
+    parser.add_argument('--styles',nargs='*',default=None)
+    parser.add_argument('--output',default='aca_benchmark.json')
+    parser.add_argument('--sweep',action='store_true')
+    parser.add_argument('--tolerance',type=float,default=0.15)
+    parser.add_argument('--leak',type=int,default=0)
+    parser.add_argument('--uv-check',action='store_true')
+    return parser.parse_args(argv)
+
+# 输出规模曲线的报告
+def __outputSweep(report):
+    for fit in report['fits']:
+        text = "%s roof%s" % (fit['stage'],fit['roofStyle'])
+        for driver in ('tiles','pillers'):
+            if driver in fit:
+                text += ", %s^%.2f(R²=%.2f)" % (
+                    driver,fit[driver]['exponent'],fit[driver]['r2'])
+        if fit['superlinear']:
+            text = "超线性：" + text
+        utils.outputMsg(text)
+    return
+
+# 命令行入口，返回进程的退出状态
+def main(argv):
+    args = __parseArgs(argv)
+    if args.leak > 0:
+        reports = runLeak(args.leak,args.styles)
+        with open(args.output,'w',encoding='utf-8') as f:
+            json.dump(reports,f,ensure_ascii=False,indent=1)
+        for report in reports:
+            if ('error' in report
+                or len(report['leaks']) > 0
+                or report['malloc'] != None):
+                return 1
+        return 0
+
+    if args.uv_check:
+        reports = runUVCheck(args.styles)
+        with open(args.output,'w',encoding='utf-8') as f:
+            json.dump(reports,f,ensure_ascii=False,indent=1)
+        for report in reports:
+            if ('error' in report
+                or len(report['mismatches']) > 0):
+                return 1
+        return 0
+
+    if args.sweep:
+        report = runSweep(args.repeat,args.styles,args.tolerance)
+        with open(args.output,'w',encoding='utf-8') as f:
+            json.dump(report,f,ensure_ascii=False,indent=1)
+        __outputSweep(report)
+        return 0
+
+    current = runBenchmark(args.repeat,args.styles)
+    with open(args.output,'w',encoding='utf-8') as f:
+        json.dump(current,f,ensure_ascii=False,indent=1)
+
+    if args.save:
+        with open(args.baseline,'w',encoding='utf-8') as f:
+            json.dump(current,f,ensure_ascii=False,indent=1)
+        utils.outputMsg("基线已保存：" + os.path.abspath(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        utils.outputMsg("未找到基线文件，请先以--save运行")
+        return 2
+    with open(args.baseline,'r',encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        utils.outputMsg("基线文件版本不一致，请重新生成")
+        return 2
+
+    regressions,changes = compare(
+        baseline,current,args.threshold,args.min_delta)
+    for item in changes:
+        utils.outputMsg("规模变化：%s %s %s -> %s" % (
+            item['case'],item['field'],
+            item['baseline'],item['current']))
+    for item in regressions:
+        if 'error' in item:
+            utils.outputMsg("营造失败：%s %s" % (
+                item['case'],item['error']))
+        else:
+            utils.outputMsg("性能回退：%s %s %.3fs -> %.3fs (x%.2f)" % (
+                item['case'],item['stage'],
+                item['baseline'],item['current'],item['ratio']))
+    if len(regressions) > 0:
+        return 1
+    utils.outputMsg("未发现性能回退")
+    return 0
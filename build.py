@@ -4,6 +4,7 @@
 #   营造的主入口
 #   判断是建造一个新的单体建筑，还是院墙等附加建筑
 import bpy
+import time
 from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from . import utils
@@ -11,19 +12,19 @@ from . import template
 from . import buildFloor
 from . import buildYardWall
 from . import buildRoof
+from . import buildTrace
+from . import buildLayers
+from . import updateScheduler
 
 isFinished = True
 buildStatus = ''
 progress = 0
 
-def __buildSingle(acaType,templateName):
-    # 根据模板类型调用不同的入口
-    if acaType == con.ACA_TYPE_BUILDING:
-        buildFloor.buildFloor(None,templateName)
-    elif acaType == con.ACA_TYPE_YARDWALL:
-        buildYardWall.buildYardWall(None,templateName)
-    else:
-        utils.popMessageBox("无法创建该类型的建筑：" + templateName)
+# 开始营造计时
+def __beginTrace():
+    scnData = bpy.context.scene.ACA_data
+    buildTrace.enable(scnData.is_build_trace)
+    buildTrace.reset()
     return
 
 # 排除目录下的其他建筑
@@ -49,8 +50,83 @@ def __excludeOther(rootColl,isExclude,buildingObj=None):
     utils.redrawViewport() # 刷新视图
     return
 
+# 各步骤的默认耗时权重，该模板首次营造时用于估算进度
+STEP_WEIGHTS = {
+    'pillers' : 10,
+    'platform' : 5,
+    'walls' : 15,
+    'dougong' : 20,
+    'beams' : 10,
+    'rafters' : 20,
+    'tiles' : 20,
+}
+# 分层重建时，各层包含的营造步骤
+# 未列出的层，步骤名称与层名称相同
+LAYER_STEPS = {
+    buildLayers.LAYER_ROOF : ('dougong','beams','rafters','tiles'),
+}
+# 各模板上一次营造时各步骤的实际耗时
+# 组合建筑记录的是每个单体的平均耗时
+__stepTimes = {}
+
+# 按步骤的耗时估算进度
+# 以该模板上一次营造的各步骤耗时为权重，首次营造时使用默认权重
+# count为重复营造的单体数量，组合建筑按子建筑数量放大总量
+# onlySteps为分层重建时实际执行的步骤，仅以这些步骤计算总量
+def __trackSteps(steps,key,count=1,onlySteps=None):
+    global progress
+    expected = __stepTimes.get(key,STEP_WEIGHTS)
+    if onlySteps != None:
+        total = sum(expected.get(step,0.0) for step in onlySteps)
+    else:
+        total = sum(expected.values()) * count
+    measured = {}
+    done = 0.0
+    timeStart = time.perf_counter()
+    for step in steps:
+        measured[step] = (measured.get(step,0.0) 
+                          + time.perf_counter() - timeStart)
+        done += expected.get(step,0.0)
+        if total > 0:
+            progress = min(done/total,0.99)
+        yield step
+        # 在调用方继续后重新计时，不计入两步之间的等待
+        timeStart = time.perf_counter()
+    # 仅记录完整营造的耗时，取消的营造、分层重建不计入
+    if len(measured) > 0 and onlySteps == None:
+        __stepTimes[key] = {step:value/count 
+                            for step,value in measured.items()}
+    return
+
+# 分层重建时实际执行的步骤
+def __getLayerSteps(layers):
+    steps = set()
+    for layer in layers:
+        steps.update(LAYER_STEPS.get(layer,(layer,)))
+    return steps
+
+def __buildSingleSteps(acaType,templateName):
+    # 根据模板类型调用不同的入口
+    if acaType == con.ACA_TYPE_BUILDING:
+        yield from buildFloor.buildFloorSteps(None,templateName)
+    elif acaType == con.ACA_TYPE_YARDWALL:
+        buildYardWall.buildYardWall(None,templateName)
+        yield 'yardwall'
+    else:
+        utils.popMessageBox("无法创建该类型的建筑：" + templateName)
+    return
+
 # 开始新的营造
-def build():
+# templateName为空时，取用户界面上选择的模板
+def build(templateName=None):
+    for step in buildSteps(templateName):
+        pass
+    return {'FINISHED'}
+
+# 分步执行新的营造
+# 每完成一层返回该层名称，由调用方决定何时继续
+# 中途关闭生成器时，已完成的层保持完整，并恢复排除的其他建筑
+def buildSteps(templateName=None):
     # 250311 发现在中文版中UV贴图异常
     # 最终发现是该选项会导致生成的'UVMap'变成'UV贴图'
     # 禁用语言-翻译-新建数据
@@ -63,9 +139,10 @@ def build():
     # 待营造的模板，来自用户界面上的选择
     from . import data
     scnData : data.ACA_data_scene = bpy.context.scene.ACA_data
-    templateList = scnData.templateItem
-    templateIndex = scnData.templateIndex
-    templateName = templateList[templateIndex].name
+    if templateName == None:
+        templateList = scnData.templateItem
+        templateIndex = scnData.templateIndex
+        templateName = templateList[templateIndex].name
 
     # 获取模板类型，建筑或院墙
     acaType = template.getBuildingType(templateName)
@@ -77,32 +154,55 @@ def build():
     # 暂时排除目录下的其他建筑，以加快执行速度
     __excludeOther(rootColl,True)
 
-    if acaType != con.ACA_TYPE_COMBO:
-        # 单体建筑
-        __buildSingle(
-            acaType=acaType,
-            templateName=templateName
-        )
-    else:
-        # 组合建筑
-        tempChildren = template.getTemplateChild(templateName)
-        for child in tempChildren:
-            __buildSingle(
-                acaType=child['acaType'],
-                templateName=child['templateName']
-            )
-    
-    isFinished = True
-    # 取消排除目录下的其他建筑
-    __excludeOther(rootColl,False)
+    __beginTrace()
+    try:
+        with buildTrace.span('build',template=templateName):
+            count = 1
+            if acaType != con.ACA_TYPE_COMBO:
+                # 单体建筑
+                steps = __buildSingleSteps(
+                    acaType=acaType,
+                    templateName=templateName
+                )
+            else:
+                # 组合建筑
+                steps = __buildComboSteps(templateName)
+                count = max(len(template.getTemplateChild(templateName)),1)
+            yield from __trackSteps(steps,templateName,count)
+    finally:
+        isFinished = True
+        # 取消排除目录下的其他建筑
+        __excludeOther(rootColl,False)
+        # 状态恢复后再输出计时
+        buildTrace.finish()
 
     # 关闭视角自动锁定
     scnData['is_auto_viewall'] = False
+    return
 
-    return {'FINISHED'}
+def __buildComboSteps(templateName):
+    tempChildren = template.getTemplateChild(templateName)
+    for child in tempChildren:
+        yield from __buildSingleSteps(
+            acaType=child['acaType'],
+            templateName=child['templateName']
+        )
+    return
 
+# incremental=True时，仅重建修改参数影响的构件层
 def updateBuilding(buildingObj:bpy.types.Object,
-                   reloadAssets = False):
+                   reloadAssets = False,
+                   incremental = False):
+    for step in updateBuildingSteps(buildingObj,
+                                    reloadAssets,
+                                    incremental):
+        pass
+    return {'FINISHED'}
+
+# 分步执行建筑的更新，用法同buildSteps
+def updateBuildingSteps(buildingObj:bpy.types.Object,
+                        reloadAssets = False,
+                        incremental = False):
     # 250311 发现在中文版中UV贴图异常
     # 最终发现是该选项会导致生成的'UVMap'变成'UV贴图'
     # 禁用语言-翻译-新建数据
@@ -124,32 +224,58 @@ def updateBuilding(buildingObj:bpy.types.Object,
     progress = 0
 
     # 根据模板类型调用不同的入口
-    if bData.aca_type == con.ACA_TYPE_BUILDING:
-        buildFloor.buildFloor(buildingObj,
-                    reloadAssets=reloadAssets)
-    elif bData.aca_type == con.ACA_TYPE_YARDWALL:
-        buildYardWall.buildYardWall(buildingObj,
-                    reloadAssets=reloadAssets)
-    else:
-        utils.popMessageBox("无法创建该类型的建筑：" + bData.aca_type)
-
-    isFinished = True
-    # 取消排除目录下的其他建筑
-    __excludeOther(rootColl,False,buildingObj)
-
-    return {'FINISHED'}
+    __beginTrace()
+    try:
+        with buildTrace.span('updateBuilding',building=buildingObj.name):
+            # 没有营造记录，或修改了未登记的参数时，整体重建
+            dirtyLayers = None
+            if (incremental and not reloadAssets
+                and bData.aca_type == con.ACA_TYPE_BUILDING):
+                dirtyLayers = buildLayers.getDirtyLayers(buildingObj)
+            if dirtyLayers != None:
+                if len(dirtyLayers) > 0:
+                    yield from __trackSteps(
+                        buildFloor.rebuildLayerSteps(buildingObj,
+                                                     dirtyLayers),
+                        bData.template_name,
+                        onlySteps=__getLayerSteps(dirtyLayers))
+            elif bData.aca_type == con.ACA_TYPE_BUILDING:
+                yield from __trackSteps(
+                    buildFloor.buildFloorSteps(buildingObj,
+                        reloadAssets=reloadAssets),
+                    bData.template_name)
+            elif bData.aca_type == con.ACA_TYPE_YARDWALL:
+                buildYardWall.buildYardWall(buildingObj,
+                            reloadAssets=reloadAssets)
+                yield 'yardwall'
+            else:
+                utils.popMessageBox("无法创建该类型的建筑：" + bData.aca_type)
+    finally:
+        isFinished = True
+        # 取消排除目录下的其他建筑
+        __excludeOther(rootColl,False,buildingObj)
+        # 状态恢复后再输出计时
+        buildTrace.finish()
+    return
 
 # 删除建筑
 def delBuilding(buildingObj:bpy.types.Object):
+    # 放弃等待中的重建
+    updateScheduler.cancel(buildingObj)
     # 找到对应的目录
     buildingColl = buildingObj.users_collection[0]
     # 从“ACA筑韵古建”目录查找
     rootcoll = bpy.context.scene.collection.children[con.ROOT_COLL_NAME]
+    # 记录目录中的对象和数据
+    # 250404 不再全局清理，仅释放该建筑的对象和数据
+    objList = list(buildingColl.all_objects)
+    # 包括柱网、装修等子目录
+    collList = [buildingColl] + list(buildingColl.children_recursive)
     # 删除该目录
     rootcoll.children.unlink(buildingColl)
-    bpy.data.collections.remove(buildingColl)
-    # 清理垃圾  
-    utils.delOrphan()
+    bpy.data.batch_remove(collList)
+    # 清理垃圾
+    utils.deleteObjects(objList)
     return {'FINISHED'}
 
 # 清除所有的装修、踏跺等，重新生成地盘
@@ -186,6 +312,9 @@ def resetRoof(buildingObj:bpy.types.Object):
     __excludeOther(rootColl,True,buildingObj)
 
     buildRoof.buildRoof(buildingObj)
+    # 记录屋顶层的参数，用于后续的分层重建
+    buildLayers.markBuilt(buildingObj,buildLayers.getLayerProps(
+        (buildLayers.LAYER_ROOF,buildLayers.LAYER_TILES)))
 
     isFinished = True
     # 取消排除目录下的其他建筑
@@ -11,6 +11,7 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import buildFloor
 from . import texture as mat
 
@@ -1342,6 +1343,7 @@ def __buildBeam(buildingObj:bpy.types.Object,purlin_pos):
     return beamSetObj
 
 # 营造梁架层，包括桁檩、梁架
+@buildTrace.traced()
 def buildBeamFrame(buildingObj:bpy.types.Object):
     # 设定“梁架”根节点
     beamRootObj = __addBeamRoot(buildingObj)
@@ -1465,7 +1467,7 @@ def __drawJiaobei(shuzhuObj:bpy.types.Object):
     bData:acaData = buildingObj.ACA_data
     dk = bData.DK
     
-    shuzhu_height = shuzhuObj.dimensions.z
+    shuzhu_height = utils.getDimensions(shuzhuObj).z
     # 仅柱高大于柱径才需要角背，否则直接返回
     if shuzhu_height <= con.PILLER_CHILD*dk: 
         return None
@@ -4,13 +4,14 @@
 #   隔扇、槛窗的营造
 import bpy
 import math
-from mathutils import Vector
+from mathutils import Vector,Matrix
 
 from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import texture as mat
 from . import utils
+from . import meshArray
 
 # 构建扇心
 # 包括在槛框中嵌入的横披窗扇心
@@ -37,35 +38,37 @@ def __buildShanxin(parent,scale:Vector,location:Vector):
         return
 
     # 仔边环绕
-    # 创建一个平面，转换为curve，设置curve的横截面
-    bpy.ops.mesh.primitive_plane_add(size=1,location=location)
-    zibianObj = bpy.context.object
-    zibianObj.name = '仔边'
-    zibianObj.parent = parent
-    # 三维的scale转为plane二维的scale
-    zibianObj.rotation_euler.x = math.radians(90)
-    zibianObj.scale = (
-        scale.x - con.ZIBIAN_WIDTH*pd,
-        scale.z - con.ZIBIAN_WIDTH*pd, # 旋转90度，原Zscale给Yscale
-        0)
-    # apply scale
-    bpy.ops.object.transform_apply(location=False, rotation=True, scale=True)
-    # 转换为Curve
-    bpy.ops.object.convert(target='CURVE')
-    # 旋转所有的点45度，形成四边形
-    bpy.ops.object.editmode_toggle()
-    bpy.ops.curve.select_all(action='SELECT')
-    bpy.ops.transform.tilt(value=math.radians(45))
-    bpy.ops.object.editmode_toggle()
-    # 设置Bevel
-    zibianObj.data.bevel_mode = 'PROFILE'        
-    zibianObj.data.bevel_depth = con.ZIBIAN_WIDTH/2  # 仔边宽度
-    # 转为mesh
-    bpy.ops.object.convert(target='MESH')
-    zibianObj = bpy.context.object
+    # 250406 原来添加plane后转换为curve，设置45度tilt和bevel，再转换为mesh，
+    # 现在直接以方形截面沿矩形路径放样
+    # 矩形路径在XZ平面，截面边长与原bevel_depth的菱形截面旋转45度后一致
+    pathX = (scale.x - con.ZIBIAN_WIDTH*pd)/2
+    pathZ = (scale.z - con.ZIBIAN_WIDTH*pd)/2
+    path = (
+        (-pathX,0,-pathZ),
+        (pathX,0,-pathZ),
+        (pathX,0,pathZ),
+        (-pathX,0,pathZ),
+    )
+    half = con.ZIBIAN_WIDTH/2 * math.sqrt(0.5)  # 仔边宽度
+    profile = (
+        (-half,-half),
+        (half,-half),
+        (half,half),
+        (-half,half),
+    )
+    zibianArrays = meshArray.sweepArrays(
+        path,
+        profile,
+        normal=(0,1,0),
+        closed=True)
+    zibianObj = utils.addMeshObject(
+        zibianArrays,
+        name='仔边',
+        parent=parent,
+        location=location)
     # 仔边刷红漆
     mat.setMat(zibianObj,aData.mat_red)
-    linxingList.append(bpy.context.object)
+    linxingList.append(zibianObj)
 
     # # 填充棂心
     # lingxinObj = aData.lingxin_source
@@ -99,17 +102,18 @@ def __buildShanxin(parent,scale:Vector,location:Vector):
     # utils.applyAllModifer(lingxin)
 
     # 添加简化版的棂心（平面贴图方式）
-    bpy.ops.mesh.primitive_plane_add(location=location,size=1)
-    linxinObj = bpy.context.object
-    linxinObj.name = '棂心'
-    linxinObj.data.name = '棂心'
-    linxinObj.parent = parent
-    linxinObj.scale = (scale.x- con.ZIBIAN_WIDTH*2*pd,
-                   scale.z- con.ZIBIAN_WIDTH*2*pd,
-                   1)
-    linxinObj.rotation_euler.x = math.radians(90)
-    # apply
-    bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
+    # 平面旋转90度立起，原来在apply时包含了location，网格直接带上位置
+    linxinArrays = meshArray.planeArrays(
+        width=scale.x- con.ZIBIAN_WIDTH*2*pd,
+        height=scale.z- con.ZIBIAN_WIDTH*2*pd)
+    linxinArrays = meshArray.transformArrays(
+        linxinArrays,
+        Matrix.Translation(location)
+        @ Matrix.Rotation(math.radians(90),4,'X'))
+    linxinObj = utils.addMeshObject(
+        linxinArrays,
+        name='棂心',
+        parent=parent)
     # 棂心贴图（三交六椀）
     mat.setMat(linxinObj,aData.mat_geshanxin)
     linxingList.append(linxinObj)
@@ -136,7 +140,7 @@ def __buildKanKuang(wallproxy,windowsillHeight):
     use_KanWall = wData.use_KanWall
     pillerD = bData.piller_diameter
     # 分解槛框的长、宽、高
-    frame_width,frame_depth,frame_height = wallproxy.dimensions
+    frame_width,frame_depth,frame_height = utils.getDimensions(wallproxy)
 
     KankuangObjs = []
 
@@ -813,7 +817,7 @@ def __buildKanqiang(wallproxy:bpy.types.Object
     pillerD = bData.piller_diameter
     use_KanWall = wData.use_KanWall
     # 分解槛框的长、宽、高
-    frame_width,frame_depth,frame_height = wallproxy.dimensions
+    frame_width,frame_depth,frame_height = utils.getDimensions(wallproxy)
 
     kanQiangObjs = []
 
@@ -940,7 +944,7 @@ def buildDoor(wallProxy:bpy.types.Object):
     pd = con.PILLER_D_EAVE * dk
     pillerD = bData.piller_diameter
     # 分解槛框的长、宽、高
-    frame_width,frame_depth,frame_height = wallProxy.dimensions
+    frame_width,frame_depth,frame_height = utils.getDimensions(wallProxy)
     # wallID
     wallID = wallProxy.ACA_data['wallID']
 
@@ -991,8 +995,8 @@ def buildDoor(wallProxy:bpy.types.Object):
     if wData.use_KanWall :
         # 窗台高度
         scale = Vector((
-            wallProxy.dimensions.x,
-            wallProxy.dimensions.y,
+            utils.getDimensions(wallProxy).x,
+            utils.getDimensions(wallProxy).y,
             windowsillHeight
         ))
         # 添加槛墙
@@ -10,6 +10,7 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import buildFloor
 from . import texture as mat
 
@@ -205,7 +206,7 @@ def __buildDGFangbyBuilding(dgrootObj:bpy.types.Object,
     # 跟随缩放
     fangCopy.scale = bData.dg_scale
     utils.updateScene()
-    fangCopy.dimensions.x = bData.x_total + extendLength
+    utils.setDimensions(fangCopy,x=bData.x_total + extendLength)
     utils.applyTransfrom(fangCopy,use_scale=True)
     # 镜像
     utils.addModifierMirror(
@@ -239,7 +240,7 @@ def __buildDGFangbyBuilding(dgrootObj:bpy.types.Object,
         # 跟随缩放
         fangCopy.scale = bData.dg_scale
         utils.updateScene()
-        fangCopy.dimensions.x = bData.y_total + extendLength
+        utils.setDimensions(fangCopy,x=bData.y_total + extendLength)
         utils.applyTransfrom(fangCopy,use_scale=True)
         fangCopy.rotation_euler.z = math.radians(90)
         # 镜像
@@ -323,7 +324,7 @@ def __buildDGFangbyRoom(
         )
         utils.updateScene()
         # 拉伸到开间面阔
-        fangCopy.dimensions.x = fang['len']
+        utils.setDimensions(fangCopy,x=fang['len'])
         utils.applyTransfrom(fangCopy,use_scale=True)
         # 根据拉伸，更新UV平铺
         mat.UvUnwrap(fangCopy,mat.uvType.CUBE)
@@ -592,6 +593,7 @@ def __buildDougong(dgrootObj:bpy.types.Object):
     return
 
 # 排布斗栱层
+@buildTrace.traced()
 def buildDougong(buildingObj:bpy.types.Object): 
     # 载入数据
     bData : acaData = buildingObj.ACA_data
@@ -13,10 +13,13 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import template
 from . import buildWall
 from . import buildPlatform
 from . import buildRoof
+from . import buildRooftile
+from . import buildLayers
 
 # 添加建筑empty根节点，并绑定设计模板
 # 返回建筑empty根节点对象
@@ -202,11 +205,11 @@ def __drawBWQ(fangObj:bpy.types.Object,
         rotation=(0,0,rotZ)
     )
     # 霸王拳尺度权衡，参考马炳坚p163
-    bawangquanObj.dimensions = (
+    utils.setDimensions(bawangquanObj,(
         con.BAWANGQUAN_L*bData.piller_diameter,         # 长1D
         con.BAWANGQUAN_Y*bData.piller_diameter,         # 厚0.5D，马炳坚定义的0.8额枋
         con.BAWANGQUAN_H*bData.piller_diameter,          # 厚0.5D，马炳坚定义的高0.8额枋
-    )
+    ))
     utils.applyTransfrom(bawangquanObj,use_scale=True)
     return
 
@@ -318,7 +321,7 @@ def __buildQueti(fangObj):
         singleUser=True
     )
     # 宽度适配到开间的净面宽
-    quetiObj.dimensions.x = fang_length-bData.piller_diameter
+    utils.setDimensions(quetiObj,x=fang_length-bData.piller_diameter)
     utils.applyTransfrom(quetiObj,use_scale=True)
     return quetiObj
 
@@ -526,6 +529,7 @@ def __buildJinFang(buildingObj:bpy.types.Object):
     return
 
 # 在柱间添加额枋
+@buildTrace.traced()
 def __buildFang(buildingObj:bpy.types.Object):
     # 载入数据
     bData:acaData = buildingObj.ACA_data
@@ -914,6 +918,7 @@ def getPillerHeight(buildingObj,pillerID):
 # 3. 修改柱样式时，也会重排柱子
 # 建筑根节点（内带设计参数集）
 # 不涉及墙体重建，很快
+@buildTrace.traced()
 def buildPillers(buildingObj:bpy.types.Object):
     # 载入数据
     bData:acaData = buildingObj.ACA_data
@@ -998,9 +1003,10 @@ def buildPillers(buildingObj:bpy.types.Object):
             pillerObj.ACA_data['aca_obj'] = True
             pillerObj.ACA_data['aca_type'] = con.ACA_TYPE_PILLER
             pillerObj.ACA_data['pillerID'] = pillerID
+            buildTrace.count('pillers')
             # 250212 金柱的升高处理（包含廊间举架）
-            pillerObj.dimensions.z = getPillerHeight(
-                    buildingObj,pillerID)
+            utils.setDimensions(pillerObj,z=getPillerHeight(
+                    buildingObj,pillerID))
             # 应用拉伸
             utils.applyTransfrom(pillerObj,use_scale=True)
 
@@ -1013,9 +1019,9 @@ def buildPillers(buildingObj:bpy.types.Object):
                 sourceObj=aData.pillerbase_source,
                 location=(0,0,0),
                 scale=(
-                        pd/piller_source.dimensions.x,
-                        pd/piller_source.dimensions.y,
-                        pd/piller_source.dimensions.x,
+                        pd/utils.getDimensions(piller_source).x,
+                        pd/utils.getDimensions(piller_source).y,
+                        pd/utils.getDimensions(piller_source).x,
                     ),
                 parentObj=newPillerObj
             )
@@ -1112,16 +1118,20 @@ def resizePiller(buildingObj:bpy.types.Object):
             if pillerProxy.ACA_data['aca_type'] == con.ACA_TYPE_PILLER:
                 for child in pillerProxy.children:
                     if '柱子' in child.name:
-                        child.dimensions = (
+                        utils.setDimensions(child,(
                             bData.piller_diameter,
                             bData.piller_diameter,
                             bData.piller_height
-                        )
+                        ))
 
     # 柱高、柱径的变化，都会引起隔扇、墙体的变化，需要重建
     # 重新生成墙体
     funproxy = partial(buildWall.buildWallLayout,buildingObj=buildingObj)
     utils.fastRun(funproxy)
+    # 记录柱高、柱径和装修的参数，用于后续的分层重建
+    buildLayers.markBuilt(buildingObj,
+        {'piller_height','piller_diameter'}
+        | buildLayers.getLayerProps((buildLayers.LAYER_WALLS,)))
 
     # 重新聚焦建筑根节点
     utils.focusObj(buildingObj)
@@ -1158,6 +1168,27 @@ def resetFloor(buildingObj:bpy.types.Object):
 def buildFloor(buildingObj:bpy.types.Object,
                templateName = None,
                reloadAssets = False):
+    for step in buildFloorSteps(buildingObj,
+                                templateName,
+                                reloadAssets):
+        pass
+    return {'FINISHED'}
+
+# 分步执行营造整体过程
+# 每完成一层后返回该层名称，便于分步执行和中途取消
+# 中途取消时，已完成的层保持完整
+def buildFloorSteps(buildingObj:bpy.types.Object,
+                    templateName = None,
+                    reloadAssets = False):
+    with buildTrace.span('buildFloor'):
+        yield from __buildFloorSteps(buildingObj,
+                                     templateName,
+                                     reloadAssets)
+    return
+
+def __buildFloorSteps(buildingObj:bpy.types.Object,
+                      templateName = None,
+                      reloadAssets = False):
     # 定位到collection，如果没有则新建
     utils.setCollection(con.ROOT_COLL_NAME,
                         isRoot=True,colorTag=2)
@@ -1191,21 +1222,89 @@ def buildFloor(buildingObj:bpy.types.Object,
     if bData.is_showPillers:
         utils.outputMsg("Building Pillers...")
         buildPillers(buildingObj)
+        yield 'pillers'
     
     # 生成台基
     if bData.is_showPlatform:
         utils.outputMsg("Building Platform...")
         buildPlatform.buildPlatform(buildingObj)
+        yield 'platform'
     
     # 生成墙体
     if bData.is_showWalls:
         utils.outputMsg("Building Wall...")
         buildWall.buildWallLayout(buildingObj)
+        yield 'walls'
     
     # 生成屋顶
-    buildRoof.buildRoof(buildingObj)
+    with buildTrace.span('buildRoof'):
+        yield from buildRoof.buildRoofSteps(buildingObj)
+
+    # 记录本次营造的参数，用于后续的分层重建
+    buildLayers.markBuilt(buildingObj)
+
+    # 重新聚焦回根节点
+    utils.focusObj(buildingObj)
+    return
+
+# 仅重建受影响的构件层，其他层保持不动
+# layers为buildLayers.getDirtyLayers返回的层集合
+def rebuildLayers(buildingObj:bpy.types.Object,layers):
+    for step in rebuildLayerSteps(buildingObj,layers):
+        pass
+    return {'FINISHED'}
+
+# 分步执行分层重建，每重建一层返回该层的营造步骤名称，用法同buildFloorSteps
+def rebuildLayerSteps(buildingObj:bpy.types.Object,layers):
+    with buildTrace.span('rebuildLayers'):
+        yield from __rebuildLayerSteps(buildingObj,layers)
+    return
+
+def __rebuildLayerSteps(buildingObj:bpy.types.Object,layers):
+    # 定位到collection，如果没有则新建
+    utils.setCollection(con.ROOT_COLL_NAME,
+                        isRoot=True,colorTag=2)
+    utils.outputMsg("更新建筑：" + ','.join(
+        layer for layer in buildLayers.LAYERS if layer in layers))
+    bData:acaData = buildingObj.ACA_data
+
+    # 删除需重建层的根节点
+    # 各层根节点在新建时按台基高、柱高定位，已有的根节点不会重新定位
+    for layer,rootType in buildLayers.LAYER_ROOTS.items():
+        if layer not in layers:
+            continue
+        rootObj = utils.getAcaChild(buildingObj,rootType)
+        if rootObj != None:
+            utils.deleteHierarchy(rootObj,del_parent=True)
+
+    # 按营造顺序重建
+    if buildLayers.LAYER_PILLERS in layers and bData.is_showPillers:
+        utils.outputMsg("Building Pillers...")
+        buildPillers(buildingObj)
+        yield 'pillers'
+    
+    if buildLayers.LAYER_PLATFORM in layers and bData.is_showPlatform:
+        utils.outputMsg("Building Platform...")
+        buildPlatform.buildPlatform(buildingObj)
+        yield 'platform'
+    
+    if buildLayers.LAYER_WALLS in layers and bData.is_showWalls:
+        utils.outputMsg("Building Wall...")
+        buildWall.buildWallLayout(buildingObj)
+        yield 'walls'
+    
+    # 屋顶层整体重建时已包括瓦作
+    if buildLayers.LAYER_ROOF in layers:
+        with buildTrace.span('buildRoof'):
+            yield from buildRoof.buildRoofSteps(buildingObj)
+    elif buildLayers.LAYER_TILES in layers and bData.is_showTiles:
+        utils.outputMsg("Building Tiles...")
+        buildRooftile.buildTile(buildingObj)
+        yield 'tiles'
+
+    buildLayers.markBuilt(buildingObj)
 
     # 重新聚焦回根节点
     utils.focusObj(buildingObj)
 
-    return {'FINISHED'}
\ No newline at end of file
+    return
\ No newline at end of file
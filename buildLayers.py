@@ -0,0 +1,239 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   按修改的参数，仅重建受影响的构件层
+#   原来大部分参数修改都调用build.updateBuilding，先删除整个建筑，
+#   再重新生成台基、柱网、装修、斗栱、梁架、椽望、瓦作
+#   这里记录每个建筑上一次营造时的参数，与当前参数比较得到修改的参数集合，
+#   再按参数与构件层的对应关系，以及层间的依赖，得到需要重建的层
+#   未受影响的层保持不动
+import bpy
+from bpy.app.handlers import persistent
+
+from .const import ACA_Consts as con
+from .data import ACA_data_obj as acaData
+from . import templateStore
+
+# 构件层，按营造顺序排列
+LAYER_PLATFORM = 'platform'     # 台基
+LAYER_PILLERS = 'pillers'       # 柱网、额枋
+LAYER_WALLS = 'walls'           # 装修
+LAYER_ROOF = 'roof'             # 屋顶层：斗栱、梁架、椽望、瓦作
+LAYER_TILES = 'tiles'           # 瓦作，屋顶层的一部分，可以单独重建
+LAYERS = (LAYER_PLATFORM,LAYER_PILLERS,LAYER_WALLS,LAYER_ROOF,LAYER_TILES)
+
+# 层间的依赖：某层重建后，哪些层也需要重建
+# 柱网的位置、高度决定了装修和屋顶层的位置
+# 屋顶层重建时包括瓦作
+LAYER_DEPENDENTS = {
+    LAYER_PLATFORM : (),
+    LAYER_PILLERS : (LAYER_WALLS,LAYER_ROOF),
+    LAYER_WALLS : (),
+    LAYER_ROOF : (LAYER_TILES,),
+    LAYER_TILES : (),
+}
+
+# 各层根节点的类型
+LAYER_ROOTS = {
+    LAYER_PLATFORM : con.ACA_TYPE_BASE_ROOT,
+    LAYER_PILLERS : con.ACA_TYPE_FLOOR_ROOT,
+    LAYER_WALLS : con.ACA_TYPE_WALL_ROOT,
+    LAYER_ROOF : con.ACA_TYPE_ROOF_ROOT,
+}
+
+# 参数与构件层的对应关系
+# 未列出的参数修改时，重建整个建筑
+PROP_LAYERS = {
+    # 台基，台基高度影响柱网的起点
+    'platform_height' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'platform_extend' : (LAYER_PLATFORM,),
+    'step_net' : (LAYER_PLATFORM,),
+    # 开间、进深决定了台基的尺寸和柱网
+    'x_rooms' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'x_1' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'x_2' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'x_3' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'x_4' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'y_rooms' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'y_1' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'y_2' : (LAYER_PLATFORM,LAYER_PILLERS),
+    'y_3' : (LAYER_PLATFORM,LAYER_PILLERS),
+    # 柱网、额枋
+    'piller_net' : (LAYER_PILLERS,),
+    'fang_net' : (LAYER_PILLERS,),
+    'piller_height' : (LAYER_PILLERS,),
+    'piller_diameter' : (LAYER_PILLERS,),
+    'use_smallfang' : (LAYER_PILLERS,),
+    'use_hallway' : (LAYER_PILLERS,),
+    # 斗栱涉及柱高的变化，与柱网一起重建
+    'use_dg' : (LAYER_PILLERS,),
+    'use_pingbanfang' : (LAYER_PILLERS,),
+    'dg_style' : (LAYER_PILLERS,),
+    'dg_gap' : (LAYER_PILLERS,),
+    'dg_extend' : (LAYER_PILLERS,),
+    'dg_height' : (LAYER_PILLERS,),
+    'dg_scale' : (LAYER_PILLERS,),
+    # 装修
+    'wall_net' : (LAYER_WALLS,),
+    'wall_layout' : (LAYER_WALLS,),
+    'wall_style' : (LAYER_WALLS,),
+    'wall_depth' : (LAYER_WALLS,),
+    'wall_span' : (LAYER_WALLS,),
+    'door_num' : (LAYER_WALLS,),
+    'gap_num' : (LAYER_WALLS,),
+    'use_topwin' : (LAYER_WALLS,),
+    'door_height' : (LAYER_WALLS,),
+    'use_KanWall' : (LAYER_WALLS,),
+    # 屋顶
+    'roof_style' : (LAYER_ROOF,),
+    'rafter_count' : (LAYER_ROOF,),
+    'use_flyrafter' : (LAYER_ROOF,),
+    'use_wangban' : (LAYER_ROOF,),
+    'qiqiao' : (LAYER_ROOF,),
+    'chong' : (LAYER_ROOF,),
+    'use_pie' : (LAYER_ROOF,),
+    'shengqi' : (LAYER_ROOF,),
+    'liangtou' : (LAYER_ROOF,),
+    'tuishan' : (LAYER_ROOF,),
+    'shoushan' : (LAYER_ROOF,),
+    'luding_rafterspan' : (LAYER_ROOF,),
+    'juzhe' : (LAYER_ROOF,),
+    # 瓦作
+    'tile_color' : (LAYER_TILES,),
+    'tile_alt_color' : (LAYER_TILES,),
+    'use_tile_instance' : (LAYER_TILES,),
+    'paoshou_count' : (LAYER_TILES,),
+    # 显示开关，打开时需要生成该层
+    'is_showPlatform' : (LAYER_PLATFORM,),
+    'is_showPillers' : (LAYER_PILLERS,),
+    'is_showWalls' : (LAYER_WALLS,),
+    'is_showDougong' : (LAYER_ROOF,),
+    'is_showBeam' : (LAYER_ROOF,),
+    'is_showRafter' : (LAYER_ROOF,),
+    'is_showTiles' : (LAYER_ROOF,),
+}
+
+# 不影响营造的参数，或在营造过程中计算的参数
+IGNORE_PROPS = {
+    'aca_obj',
+    'aca_type',
+    'template_name',
+    'name',
+    'x_total',
+    'y_total',
+    'tile_width',       # 瓦作营造时按瓦片资产计算
+    'tile_length',
+    'tile_width_real',
+    'roof_qiao_point',
+}
+
+# 各个建筑上一次营造时的参数
+# key为对象指针，同时校验名称，避免对象删除后指针被复用
+__builtParams = {}
+
+# 读取建筑的当前参数
+def __getParams(bData:acaData):
+    params = {}
+    for key,keyType in templateStore.getSchema().items():
+        if key in IGNORE_PROPS or keyType == 'PointerProperty':
+            continue
+        value = getattr(bData,key)
+        # 向量类参数转为tuple，以便比较
+        if hasattr(value,'__len__') and not isinstance(value,str):
+            value = tuple(value)
+        params[key] = value
+    return params
+
+def __getKey(buildingObj:bpy.types.Object):
+    return buildingObj.as_pointer()
+
+# 仅影响指定层的参数，这些层重建后，参数即为已营造
+def getLayerProps(layers):
+    return {key for key,propLayers in PROP_LAYERS.items()
+            if set(propLayers) <= set(layers)}
+
+# 营造完成后，记录当前参数
+# props为None时记录全部参数，用于整体营造
+# 仅重建了部分构件时（如单独重建屋顶、瓦作），只记录这些构件对应的参数，
+# 其他参数保持原来的记录，等待中的重建仍能发现它们的修改
+def markBuilt(buildingObj:bpy.types.Object,props=None):
+    key = __getKey(buildingObj)
+    params = __getParams(buildingObj.ACA_data)
+    if props != None:
+        built = __builtParams.get(key)
+        # 没有整体营造的记录，无法得知其他参数的状态，不做记录
+        if built == None or built[0] != buildingObj.name:
+            return
+        builtParams = dict(built[1])
+        for prop in props:
+            if prop in params:
+                builtParams[prop] = params[prop]
+        params = builtParams
+    __builtParams[key] = (buildingObj.name,params)
+    return
+
+# 清除建筑的记录，下次必须整体重建
+def markDirty(buildingObj:bpy.types.Object):
+    __builtParams.pop(__getKey(buildingObj),None)
+    return
+
+# 获取修改的参数
+# 没有营造记录时返回None
+def getChangedProps(buildingObj:bpy.types.Object):
+    built = __builtParams.get(__getKey(buildingObj))
+    if built == None or built[0] != buildingObj.name:
+        return None
+    builtParams = built[1]
+    params = __getParams(buildingObj.ACA_data)
+    changed = set()
+    for key,value in params.items():
+        if builtParams.get(key) != value:
+            changed.add(key)
+    return changed
+
+# 获取需要重建的层，包括依赖的层
+# 返回None时需要整体重建
+def getDirtyLayers(buildingObj:bpy.types.Object):
+    changed = getChangedProps(buildingObj)
+    if changed == None:
+        return None
+    layers = set()
+    for key in changed:
+        if key not in PROP_LAYERS:
+            return None
+        layers.update(PROP_LAYERS[key])
+    # 加入依赖的层
+    pending = list(layers)
+    while len(pending) > 0:
+        layer = pending.pop()
+        for dependent in LAYER_DEPENDENTS[layer]:
+            if dependent not in layers:
+                layers.add(dependent)
+                pending.append(dependent)
+    return layers
+
+# 打开新文件后，原来的对象指针失效
+@persistent
+def __onLoadPost(dummy):
+    __builtParams.clear()
+
+# 撤销、重做后，对象的指针和名称不变，但参数已恢复为之前的值，
+# 记录的参数与场景不再对应，可能把重新修改的参数误判为未修改
+# 清空记录，下次整体重建
+@persistent
+def __onUndoRedo(dummy):
+    __builtParams.clear()
+
+def register():
+    bpy.app.handlers.load_post.append(__onLoadPost)
+    bpy.app.handlers.undo_post.append(__onUndoRedo)
+    bpy.app.handlers.redo_post.append(__onUndoRedo)
+
+def unregister():
+    if __onLoadPost in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(__onLoadPost)
+    if __onUndoRedo in bpy.app.handlers.undo_post:
+        bpy.app.handlers.undo_post.remove(__onUndoRedo)
+    if __onUndoRedo in bpy.app.handlers.redo_post:
+        bpy.app.handlers.redo_post.remove(__onUndoRedo)
+    __builtParams.clear()
@@ -8,6 +8,7 @@ from mathutils import Vector
 from typing import List
 
 from . import utils
+from . import buildTrace
 from . import buildFloor
 from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
@@ -399,7 +400,7 @@ def __drawStep(
     # 根据stepID生成踏跺（如，’3/0#4/0‘）
     stepProxy = __addStepProxy(
         baseRootObj,stepID)
-    (pWidth,pDeepth,pHeight) = stepProxy.dimensions
+    (pWidth,pDeepth,pHeight) = utils.getDimensions(stepProxy)
     # 判断相邻踏跺，只做单边
     isOnlyLeft = __checkNextStep(
         baseRootObj,stepID)
@@ -616,8 +617,8 @@ def __addPlatformExpand(
                 loc_z,
             ),
             dimension = (
-                    taimingObj.dimensions.x + pfExpand,
-                    taimingObj.dimensions.y + pfExpand,
+                    utils.getDimensions(taimingObj).x + pfExpand,
+                    utils.getDimensions(taimingObj).y + pfExpand,
                     height
             ),
             rotation = taimingObj.rotation_euler,
@@ -640,8 +641,8 @@ def __addPlatformExpand(
                 loc_z,
             ),
             dimension = (
-                    (stepObj.dimensions.x + pfExpand),
-                     stepObj.dimensions.y + pfExpand,
+                    (utils.getDimensions(stepObj).x + pfExpand),
+                     utils.getDimensions(stepObj).y + pfExpand,
                      height - offset   
             ),
             rotation = stepObj.rotation_euler,
@@ -760,6 +761,7 @@ def delStep(buildingObj:bpy.types.Object,
     return {'FINISHED'}
 
 # 根据固定模板，创建新的台基
+@buildTrace.traced()
 def buildPlatform(buildingObj:bpy.types.Object):
     # 0、准备
     # 载入数据
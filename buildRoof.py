@@ -12,6 +12,7 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import buildDougong
 from . import buildBeam
 from . import buildRooftile
@@ -196,6 +197,47 @@ def __getRafterName(count):
         names.insert(2,'中花架椽')
     return names
 
+# 计算一层椽子的起止点
+# 椽子直接连接上下层的桁檩，上移与桁檩上皮相切，檐椽再按檐总平出加斜延长
+# 250406 原来先创建椽子，再用bpy.ops.transform.translate上移，
+# 修改dimensions延长檐椽后applyTransfrom，现在直接算出最终的起止点
+def __getRafterSegment(buildingObj:bpy.types.Object,
+                       rafter_start:Vector,
+                       rafter_end:Vector,
+                       isEave=False):
+    # 载入数据
+    bData : acaData = buildingObj.ACA_data
+    dk = bData.DK
+    rafterRootObj = utils.getAcaChild(
+        buildingObj,con.ACA_TYPE_RAFTER_ROOT)
+    rotation = utils.alignToVector(rafter_end-rafter_start)
+    rotation.x = 0
+
+    # 上移，与桁檩上皮相切
+    lift = Vector((0,0,(con.HENG_COMMON_D+con.YUANCHUAN_D)*dk/2))
+    if con.OFFSET_ORIENTATION == 'GLOBAL':
+        # 全局的垂直方向，转换到椽望根节点的坐标系
+        lift = rafterRootObj.matrix_world.inverted().to_3x3() @ lift
+    else:
+        # 沿椽子自身的方向
+        lift.rotate(rotation)
+    rafter_start = rafter_start + lift
+    rafter_end = rafter_end + lift
+
+    # 檐椽延长，按檐总平出加斜计算
+    if isEave:
+        # 檐椽斜率（圆柱体默认转90度）
+        yan_rafter_angle = math.cos(rotation.y)
+        # 檐总平出=斗栱平出+14斗口檐椽平出（暂不考虑7斗口的飞椽平出）
+        yan_rafter_ex = con.YANCHUAN_EX * dk
+        if bData.use_dg : 
+            yan_rafter_ex += bData.dg_extend
+        # 加斜计算，原点在椽尾，向椽头方向延长
+        direction = (rafter_end-rafter_start).normalized()
+        rafter_end = rafter_end + direction * (
+            yan_rafter_ex / yan_rafter_angle)
+    return rafter_start,rafter_end
+
 # 营造前后檐椽子
 # 庑殿、歇山可自动裁切
 def __buildRafter_FB(buildingObj:bpy.types.Object,purlin_pos):
@@ -217,6 +259,10 @@ def __buildRafter_FB(buildingObj:bpy.types.Object,purlin_pos):
         rafter_offset = Vector((con.YUANCHUAN_D*dk,0,0))
         rafter_end += rafter_offset
         rafter_start += rafter_offset
+        # 2. 各层椽子都上移，与桁檩上皮相切
+        # 3. 仅檐椽延长，按檐总平出加斜计算
+        rafter_start,rafter_end = __getRafterSegment(
+            buildingObj,rafter_start,rafter_end,isEave=(n==0))
         # 根据起始点创建椽子
         fbRafterObj = utils.addCylinderBy2Points(
             radius = con.YUANCHUAN_D/2*dk,
@@ -225,27 +271,9 @@ def __buildRafter_FB(buildingObj:bpy.types.Object,purlin_pos):
             name="前后檐.%d-%s" % (n+1,rafterNames[n]),
             root_obj = rafterRootObj
         )
-        
-        # 2. 各层椽子都上移，与桁檩上皮相切
-        bpy.ops.transform.translate(
-            value = (0,0,(con.HENG_COMMON_D+con.YUANCHUAN_D)*dk/2),
-            orient_type = con.OFFSET_ORIENTATION
-        )  
-        
-        # 3. 仅檐椽延长，按檐总平出加斜计算
         if n == 0:
             fbRafterObj.ACA_data['aca_obj'] = True
             fbRafterObj.ACA_data['aca_type'] = con.ACA_TYPE_RAFTER_FB
-            # 檐椽斜率（圆柱体默认转90度）
-            yan_rafter_angle = math.cos(fbRafterObj.rotation_euler.y)
-            # 斗栱平出+14斗口檐椽平出
-            yan_rafter_ex = con.YANCHUAN_EX * dk
-            if bData.use_dg : 
-                yan_rafter_ex += bData.dg_extend
-
-            # 加斜计算
-            fbRafterObj.dimensions.x += yan_rafter_ex / yan_rafter_angle
-            utils.applyTransfrom(fbRafterObj,use_scale=True) # 便于后续做望板时获取真实长度
 
         # 4、歇山顶在山花处再加一层檐椽
         if (bData.roof_style in (con.ROOF_XIESHAN,
@@ -458,6 +486,10 @@ def __buildRafter_LR(buildingObj:bpy.types.Object,purlin_pos):
         rafter_offset = Vector((0,con.YUANCHUAN_D*dk,0))
         rafter_end = purlin_pos[n]*Vector((1,0,1))+rafter_offset
         rafter_start = purlin_pos[n+1]*Vector((1,0,1))+rafter_offset
+        # 上移，与桁檩上皮相切
+        # 檐面和山面的檐椽延长，按檐总平出加斜计算
+        rafter_start,rafter_end = __getRafterSegment(
+            buildingObj,rafter_start,rafter_end,isEave=(n==0))
         lrRafterObj = utils.addCylinderBy2Points(
             radius = con.YUANCHUAN_D/2*dk,
             start_point = rafter_start,
@@ -465,25 +497,9 @@ def __buildRafter_LR(buildingObj:bpy.types.Object,purlin_pos):
             name="两山.%d-%s" % (n+1,rafterNames[n]),
             root_obj = rafterRootObj
         )
-        # 上移，与桁檩上皮相切
-        bpy.ops.transform.translate(
-            value = (0,0,(con.HENG_COMMON_D+con.YUANCHUAN_D)*dk/2),
-            orient_type = con.OFFSET_ORIENTATION # GLOBAL/LOCAL ?
-        )   
-        
-        # 檐面和山面的檐椽延长，按檐总平出加斜计算
         if n == 0:
             lrRafterObj.ACA_data['aca_obj'] = True
             lrRafterObj.ACA_data['aca_type'] = con.ACA_TYPE_RAFTER_LR
-            # 檐椽斜率（圆柱体默认转90度）
-            yan_rafter_angle = math.cos(lrRafterObj.rotation_euler.y)
-            # 檐总平出=斗栱平出+14斗口檐椽平出（暂不考虑7斗口的飞椽平出）
-            yan_rafter_ex = con.YANCHUAN_EX * dk
-            if bData.use_dg : 
-                yan_rafter_ex += bData.dg_extend
-            # 檐椽加斜长度
-            lrRafterObj.dimensions.x += yan_rafter_ex / yan_rafter_angle
-            utils.applyTransfrom(lrRafterObj,use_scale=True) # 便于后续做望板时获取真实长度
 
         # 平铺Array
         if bData.roof_style == con.ROOF_WUDIAN and n != 0:
@@ -585,7 +601,7 @@ def __buildWangban_FB(buildingObj:bpy.types.Object,
             extend_hyp -= (con.QUETAI            # 雀台避让
                     + con.LIKOUMU_Y)* dk    # 里口木避让
             # 加斜计算
-            wangbanObj.dimensions.x += extend_hyp
+            utils.setDimensions(wangbanObj,x=utils.getDimensions(wangbanObj).x + extend_hyp)
             utils.applyTransfrom(wangbanObj,use_scale=True) 
 
         # 所有望板上移
@@ -630,7 +646,7 @@ def __buildWangban_FB(buildingObj:bpy.types.Object,
             tympanumWangban.name = '山花补齐望板'
             tympanumWangban.modifiers.clear()
             tympanumWangban.ACA_data['aca_type'] = ''
-            tympanumWangban.dimensions.y = purlin_pos[-1].x
+            utils.setDimensions(tympanumWangban,y=purlin_pos[-1].x)
             tympanumWangban.location.x += (purlin_pos[-1].x - purlin_pos[1].x)/2
             bpy.context.collection.objects.link(tympanumWangban)
             # 裁剪
@@ -769,7 +785,7 @@ def __buildWangban_LR(buildingObj:bpy.types.Object,purlin_pos):
                 extend_hyp -= (con.QUETAI            # 雀台避让
                         + con.LIKOUMU_Y)* dk    # 里口木避让
             # 加斜计算
-            wangbanObj.dimensions.x += extend_hyp
+            utils.setDimensions(wangbanObj,x=utils.getDimensions(wangbanObj).x + extend_hyp)
             utils.applyTransfrom(wangbanObj,use_scale=True)
 
         # 所有望板上移，与椽架上皮相切（从桁檩中心偏：半桁檩+1椽径+半望板）
@@ -1358,7 +1374,7 @@ def __buildCornerBeam(buildingObj:bpy.types.Object,purlin_pos):
             ex_length = ex_length * math.sqrt(2)
             # 立面加斜老角梁扣金角度   
             ex_length = ex_length / math.cos(CornerBeamObj.rotation_euler.y)
-            CornerBeamObj.dimensions.x += ex_length
+            utils.setDimensions(CornerBeamObj,x=utils.getDimensions(CornerBeamObj).x + ex_length)
             utils.applyTransfrom(CornerBeamObj,use_scale=True)
             utils.addModifierBevel(
                 object=CornerBeamObj,
@@ -1420,26 +1436,13 @@ def __buildCornerRafterEave(buildingObj:bpy.types.Object,
     width = con.LIKOUMU_Y*dk
 
     # 定义bevel横截面
-    bpy.ops.mesh.primitive_plane_add(size=1,location=(0,0,0))
-    bevel_object = bpy.context.object
-    bevel_object.name = name + '.bevel'
-    bevel_object.parent = rafterRootObj
-    # 设置大小
-    bevel_object.scale = (width,height,0)
-    bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-    utils.updateScene()
     # 移动origin到下皮外沿
-    bpy.ops.object.mode_set(mode = 'EDIT')
-    bpy.ops.mesh.select_all(action = 'SELECT')
-    bpy.ops.transform.translate(value=(width/2,height/2,0))
-    bpy.ops.object.mode_set(mode = 'OBJECT')    
-    # 将Plane Mesh转换为Curve，才能绑定到curve上
-    bpy.ops.object.convert(target='CURVE')
-    # 翻转curve，否则会导致连檐的face朝向不对
-    bpy.ops.object.editmode_toggle()
-    bpy.ops.curve.switch_direction()
-    bpy.ops.object.editmode_toggle()
-    utils.hideObj(bevel_object)
+    bevel_object = utils.addBevelProfile(
+        name=name + '.bevel',
+        width=width,
+        height=height,
+        root_obj=rafterRootObj,
+        offset=(width/2,height/2))
 
     # 创建小连檐
     rafterEaveObj = utils.copyObject(
@@ -1627,8 +1630,12 @@ def __buildCornerRafter(buildingObj:bpy.types.Object,
     crEnd_0 = jinhengPos + Vector((0,0,(con.HENG_COMMON_D+con.YUANCHUAN_D)/2*dk))
     # 翼角椽尾展开的合计宽度
     crEndSpread = con.CORNER_RAFTER_START_SPREAD * dk
-    # 依次摆放翼角椽
-    cornerRafterColl = []  # 暂存翼角椽，传递给翘飞椽参考
+    # 依次计算翼角椽的起止点
+    # 250406 原来逐根调用addCylinderBy2Points创建翼角椽对象，营造结束时再合并，
+    # 现在先算出所有翼角椽的起止点，一次生成合并的翼角椽网格
+    # 翼角椽的定位数据传递给翼角望板、翘飞椽参考：
+    # start为椽尾（原翼角椽对象的原点），head为椽头，rotation为旋转角度
+    cornerRafterColl = []
     for n in range(len(crHeadPoints)):
         # 椽尾沿角梁散开一斗口
         offset = Vector((crEndSpread*n,0,0))
@@ -1647,48 +1654,35 @@ def __buildCornerRafter(buildingObj:bpy.types.Object,
                 ))
         vOffset.rotate(rot)
         crHead += vOffset
-        cornerRafterObj = utils.addCylinderBy2Points(
-            start_point = crEnd, 
-            end_point = crHead,   # 在曲线上定位的椽头坐标
-            radius=con.YUANCHUAN_D/2*dk,
-            name='翼角椽',
-            root_obj=rafterRootObj
-        )
         # 翼角椽如果按照檐口旋转，可以让翘飞椽随檐口翻转排列
-        # 最终觉得还是上下垂直更加符合图纸，取消此操作
-        # if n > 0: 
-        #     rotV = crEndPoints[n] - crEndPoints[n-1]
-        #     rot = utils.alignToVector(rotV)
-        #     cornerRafterObj.rotation_euler.x = -rot.z
-        cornerRafterObj.rotation_euler.x = 0
-        # 250324 为了防止裁剪翼角椽，导致无法准确获取椽头坐标，进而导致翘飞椽构造异常
-        # 将裁剪已到了__buildRafterForAll中合并翼角椽后进行处理
-        # # 裁剪椽架，檐椽不做裁剪
-        # utils.addBisect(
-        #         object=cornerRafterObj,
-        #         pStart=buildingObj.matrix_world @ purlin_pos[0],
-        #         pEnd=buildingObj.matrix_world @ purlin_pos[1],
-        #         pCut=buildingObj.matrix_world @ purlin_pos[0] - \
-        #             Vector((con.JIAOLIANG_Y*dk/2*math.sqrt(2),0,0)),
-        #         clear_outer=True
-        # ) 
-        # 为了便于贴图，将镜像延后到所有椽架做完后添加
-        # # 角梁45度对称
-        # utils.addModifierMirror(
-        #     object=cornerRafterObj,
-        #     mirrorObj=cornerBeamObj,
-        #     use_axis=(False,True,False)
-        # )
-        # # 四向对称
-        # utils.addModifierMirror(
-        #     object=cornerRafterObj,
-        #     mirrorObj=rafterRootObj,
-        #     use_axis=(True,True,False)
-        # )
-
-        cornerRafterColl.append(cornerRafterObj)
-    
-    return cornerRafterColl
+        # 最终觉得还是上下垂直更加符合图纸，不做x轴旋转
+        crRotation = utils.alignToVector(crHead-crEnd)
+        crRotation.x = 0
+        cornerRafterColl.append({
+            'start' : crEnd,
+            'head' : crHead,
+            'rotation' : crRotation,
+        })
+    # 250324 为了防止裁剪翼角椽，导致无法准确获取椽头坐标，进而导致翘飞椽构造异常
+    # 将裁剪已到了__buildRafterForAll中合并翼角椽后进行处理
+    # 为了便于贴图，镜像也延后到所有椽架做完后添加
+
+    # 一次生成所有翼角椽
+    crSet = utils.addCylinderSegments(
+        radius=con.YUANCHUAN_D/2*dk,
+        segments=[(cr['start'],cr['head']) 
+                  for cr in cornerRafterColl],
+        name='翼角椽',
+        root_obj=rafterRootObj
+    )
+    
+    return crSet,cornerRafterColl
+
+# 翼角椽头坐标，按四方对称取正值
+# 与getObjectHeadPoint(is_symmetry=(True,True,False))的结果一致
+def __getCornerRafterHead(cornerRafter):
+    head:Vector = cornerRafter['head']
+    return Vector((abs(head.x),abs(head.y),head.z))
 
 # 绘制翼角椽望板
 # 分别连接金桁交点、各个翼角椽头上皮
@@ -1730,23 +1724,23 @@ def __drawCrWangban(
             m = n-2
         else:
             m = n-1
-        crObj:bpy.types.Object = crCollection[m]
+        cornerRafter = crCollection[m]
         # X：避让里口木，Z：抬升半椽
         offset = Vector((-con.LIKOUMU_Y*dk,
                          0,
                          0
                         ))
-        offset.rotate(crObj.rotation_euler)
+        offset.rotate(cornerRafter['rotation'])
         crEnd_loc += offset
         vectors.insert(0,crEnd_loc)
     
     # 循环插入翼角椽头
     for n in range(len(crCollection)):
         # 翘飞椽头坐标,插入队列尾
-        crObj:bpy.types.Object = crCollection[n]
-        crHead_loc = crWangbanObj.matrix_world.inverted() @ crObj.location
+        cornerRafter = crCollection[n]
+        crHead_loc = crWangbanObj.matrix_world.inverted() @ cornerRafter['start']
         offset = Vector((0,0,con.YUANCHUAN_D/2*dk))
-        offset.rotate(crObj.rotation_euler)
+        offset.rotate(cornerRafter['rotation'])
         crHead_loc += offset
         # 在第一根椽之前，手工添加金交点一侧的后点
         if n==0:
@@ -1873,26 +1867,13 @@ def __buildCornerFlyrafterEave(buildingObj:bpy.types.Object,
     width = con.DALIANYAN_Y*dk
     
     # 定义bevel横截面
-    bpy.ops.mesh.primitive_plane_add(size=1,location=(0,0,0))
-    bevel_object = bpy.context.object
-    bevel_object.name = name + '.bevel'
-    bevel_object.parent = rafterRootObj
-    # 设置大小
-    bevel_object.scale = (width,height,0)
-    bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-    utils.updateScene()
     # 移动origin到下皮外沿
-    bpy.ops.object.mode_set(mode = 'EDIT')
-    bpy.ops.mesh.select_all(action = 'SELECT')
-    bpy.ops.transform.translate(value=(width/2,height/2,0))
-    bpy.ops.object.mode_set(mode = 'OBJECT')    
-    # 将Plane Mesh转换为Curve，才能绑定到curve上
-    bpy.ops.object.convert(target='CURVE')
-    # 翻转curve，否则会导致连檐的face朝向不对
-    bpy.ops.object.editmode_toggle()
-    bpy.ops.curve.switch_direction()
-    bpy.ops.object.editmode_toggle()
-    utils.hideObj(bevel_object)
+    bevel_object = utils.addBevelProfile(
+        name=name + '.bevel',
+        width=width,
+        height=height,
+        root_obj=rafterRootObj,
+        offset=(width/2,height/2))
 
     # 创建大连檐
     flyrafterEaveObj = utils.copyObject(
@@ -2014,25 +1995,23 @@ def __buildCornerFlyrafterCurve(buildingObj:bpy.types.Object):
 # 椽尾楔形构造：使用bmesh逐点定位、绘制
 # 特殊处理：椽头撇度处理、椽腰扭度处理
 def __drawCornerFlyrafter(
-        cornerRafterObj:bpy.types.Object,
+        cornerRafter,
         cornerFlyrafterEnd,
         name,
         head_shear:Vector,
         mid_shear:Vector,
         root_obj):
     # 载入数据
-    buildingObj = utils.getAcaParent(cornerRafterObj,con.ACA_TYPE_BUILDING)
+    buildingObj = utils.getAcaParent(root_obj,con.ACA_TYPE_BUILDING)
     bData : acaData = buildingObj.ACA_data
     dk = bData.DK
 
     # 1、定位翘飞椽起点（腰点），在翼角椽头上移半椽+望板
     # 获取翼角椽的椽头坐标
-    cr_head_co = utils.getObjectHeadPoint(cornerRafterObj,
-            eval=False,
-            is_symmetry=(True,True,False))
+    cr_head_co = __getCornerRafterHead(cornerRafter)
     # 移动到上皮+望板(做法与正身一致，基于水平投影的垂直移动)
     offset_z = (con.YUANCHUAN_D/2+con.WANGBAN_H)*dk
-    offset_z = offset_z / math.cos(cornerRafterObj.rotation_euler.y)
+    offset_z = offset_z / math.cos(cornerRafter['rotation'].y)
     origin_point = cr_head_co + Vector((0,0,offset_z))
 
     # 2、任意添加一个对象，具体几何数据在bmesh中建立
@@ -2043,7 +2022,7 @@ def __drawCornerFlyrafter(
     cfrObj.name = name
     cfrObj.parent = root_obj    
     # 翘飞椽与翼角椽对齐旋转角度
-    cfrObj.rotation_euler = cornerRafterObj.rotation_euler
+    cfrObj.rotation_euler = cornerRafter['rotation']
     utils.updateScene() # 需要刷新，才能正确获取到该对象的matrix_local
 
     # 3、创建bmesh
@@ -2094,7 +2073,7 @@ def __drawCornerFlyrafter(
     # 飞尾平出：7斗口*2.5=17.5斗口
     cfr_pingchu = con.FLYRAFTER_EX/con.FLYRAFTER_HEAD_TILE_RATIO*dk
     # 飞尾长斜边的长度，平出转到檐椽角度
-    cfrEnd_length = cfr_pingchu / math.cos(cornerRafterObj.rotation_euler.y) 
+    cfrEnd_length = cfr_pingchu / math.cos(cornerRafter['rotation'].y) 
 
     v5 = Vector((-cfrEnd_length,0,0))
     vectors.append(v5) 
@@ -2188,13 +2167,13 @@ def __drawCornerFlyrafter(
 def __drawCornerFlyrafter(
         name,
         root_obj,
-        cornerRafterObj:bpy.types.Object,
+        cornerRafter,
         cornerRafterObjPre,
         cornerFlyrafterHead,
         cornerFlyrafterHeadPre,
     ):
     # 载入数据
-    buildingObj = utils.getAcaParent(cornerRafterObj,con.ACA_TYPE_BUILDING)
+    buildingObj = utils.getAcaParent(root_obj,con.ACA_TYPE_BUILDING)
     bData : acaData = buildingObj.ACA_data
     dk = bData.DK
     
@@ -2203,16 +2182,14 @@ def __drawCornerFlyrafter(
     # 定位：沿着翼角椽方向，移动到上皮+望板
     offset = Vector((0,0,
         (con.YUANCHUAN_D/2+con.WANGBAN_H)*dk))
-    offset.rotate(cornerRafterObj.rotation_euler)
+    offset.rotate(cornerRafter['rotation'])
     # 获取翼角椽的椽头坐标
-    cr_head_co = utils.getObjectHeadPoint(cornerRafterObj,
-            eval=False,
-            is_symmetry=(True,True,False))
+    cr_head_co = __getCornerRafterHead(cornerRafter)
     loc = cr_head_co + offset
     # 添加对象
     cfrObj = utils.addCube(name=name,
         location=loc,    # 原点放在腰部下皮
-        rotation=cornerRafterObj.rotation_euler,    # 沿用翼角椽的旋转角度
+        rotation=cornerRafter['rotation'],    # 沿用翼角椽的旋转角度
         parent=root_obj
     )
     utils.updateScene() # 需要刷新，才能正确获取到该对象的matrix_local
@@ -2283,7 +2260,7 @@ def __drawCornerFlyrafter(
     # 飞尾平出：7斗口*2.5=17.5斗口
     cfr_pingchu = con.FLYRAFTER_EX/con.FLYRAFTER_HEAD_TILE_RATIO*dk
     # 飞尾长斜边的长度，平出转到檐椽角度
-    cfrEnd_length = cfr_pingchu / math.cos(cornerRafterObj.rotation_euler.y) 
+    cfrEnd_length = cfr_pingchu / math.cos(cornerRafter['rotation'].y) 
     v5 = Vector((-cfrEnd_length,0,0))
     vectors.append(v5) 
 
@@ -2460,7 +2437,7 @@ def __drawCornerFlyrafter(
 # 营造翼角翘飞椽（Corner Flyrafter,缩写CFR）
 def __buildCornerFlyrafter(
         buildingObj:bpy.types.Object,
-        cornerRafterColl:List[bpy.types.Object],
+        cornerRafterColl,
         cfrCurve:bpy.types.Curve):
     bData : acaData = buildingObj.ACA_data
     dk = bData.DK
@@ -2479,10 +2456,9 @@ def __buildCornerFlyrafter(
     curveData:bpy.types.Curve = cfrCurve.data
     bpoints = curveData.splines[0].bezier_points
     cfrHeads = []
-    for crObj in cornerRafterColl:
-        crEnd = crObj.location
-        crStart = utils.getObjectHeadPoint(
-            object=crObj)
+    for cornerRafter in cornerRafterColl:
+        crEnd = cornerRafter['start']
+        crStart = cornerRafter['head']
         
         # 计算交点
         intersections = utils.intersect_line_bezier(
@@ -2513,17 +2489,15 @@ def __buildCornerFlyrafter(
             cornerFlyrafterHeadPre = bpoints[0].co
         else:
             # 上一根翼角椽坐标
-            cornerRafterObjPre = utils.getObjectHeadPoint(
-                cornerRafterColl[n-1],
-                eval=False,
-                is_symmetry=(True,True,False))
+            cornerRafterObjPre = __getCornerRafterHead(
+                cornerRafterColl[n-1])
             # 上一根翘飞椽坐标
             cornerFlyrafterHeadPre = cfrHeads[n-1]
                    
         cfr_Obj = __drawCornerFlyrafter(
             name='翘飞椽',
             root_obj=rafterRootObj,
-            cornerRafterObj = cornerRafterColl[n], # 对应的翼角椽对象
+            cornerRafter = cornerRafterColl[n], # 对应的翼角椽
             cornerRafterObjPre = cornerRafterObjPre,
             cornerFlyrafterHead = cfrHeads[n], # 头在翘飞椽定位线上
             cornerFlyrafterHeadPre = cornerFlyrafterHeadPre,
@@ -2752,7 +2726,7 @@ def __buildRafterForAll(buildingObj:bpy.types.Object,purlin_pos):
         # 营造小连檐
         __buildCornerRafterEave(buildingObj,crCurve)
         # 营造翼角椽
-        cornerRafterColl = __buildCornerRafter(buildingObj,
+        crSet,cornerRafterColl = __buildCornerRafter(buildingObj,
                     purlin_pos,crCurve)
         
         if useWangban:
@@ -2812,9 +2786,7 @@ def __buildRafterForAll(buildingObj:bpy.types.Object,purlin_pos):
                 use_axis=(True,True,False)
             )
 
-        # 合并翼角椽
-        crSet = utils.joinObjects(
-            cornerRafterColl,newName='翼角椽')
+        # 翼角椽已在__buildCornerRafter中一次生成
         # 绑定材质
         crSet = mat.setMat(crSet,aData.mat_paint_rafter,override=True)
         # 倒角
@@ -3233,7 +3205,7 @@ def __drawBofengCurve(buildingObj:bpy.types.Object,
                 )
         # 为了防止与排山勾滴穿模，向下调整一个筒瓦高度
         if n > 1 :
-            tileHeight = (aData.circularTile_source.dimensions.z 
+            tileHeight = (utils.getDimensions(aData.circularTile_source).z 
                   * bData.DK 
                   / con.DEFAULT_DK)
             offsetZ -= tileHeight
@@ -3427,7 +3399,7 @@ def __buildBofeng(buildingObj: bpy.types.Object,
               + con.YUANCHUAN_D*dk
               )
     # 排山勾滴的瓦高调整
-    tileHeight = (aData.circularTile_source.dimensions.z 
+    tileHeight = (utils.getDimensions(aData.circularTile_source).z 
                   * bData.DK 
                   / con.DEFAULT_DK)
     bofengHeight -= tileHeight
@@ -3445,10 +3417,9 @@ def __buildBofeng(buildingObj: bpy.types.Object,
     ):
         # 硬山、悬山做宽一些，更加美观
         bofengHeight += con.BOFENG_OFFSET_YS*dk
-    bofengObj.dimensions = (
-        bofengObj.dimensions.x,
-        con.BOFENG_WIDTH*dk,
-        bofengHeight)
+    utils.setDimensions(bofengObj,
+        y=con.BOFENG_WIDTH*dk,
+        z=bofengHeight)
     # 添加curve变形
     modCurve : bpy.types.CurveModifier = \
         bofengObj.modifiers.new('曲线拟合','CURVE')
@@ -3539,10 +3510,9 @@ def __buildBofeng(buildingObj: bpy.types.Object,
         # 山花拉伸高度，要保证能够在Y轴合并
         # 太小，会出现没有完全合并，太大，反而会导致上部被合并
         shanhuaHeight = bData.y_total/2 # 没有依据，只是一个差不多的值
-        shanhuaObj.dimensions = (
-            shanhuaObj.dimensions.x,
-            con.BOFENG_WIDTH*dk,
-            shanhuaHeight)
+        utils.setDimensions(shanhuaObj,
+            y=con.BOFENG_WIDTH*dk,
+            z=shanhuaHeight)
         
         
         # 4、添加curve变形
@@ -3751,6 +3721,7 @@ def __buildShanWall(
     return
 
 # 营造椽望层
+@buildTrace.traced()
 def __buildRafterFrame(buildingObj:bpy.types.Object):
     # 设定“椽望”根节点
     rafterRootObj = __addRafterRoot(buildingObj)
@@ -3802,7 +3773,15 @@ def __buildRafterFrame(buildingObj:bpy.types.Object):
     return
 
 # 营造整个房顶
+@buildTrace.traced()
 def buildRoof(buildingObj:bpy.types.Object):
+    for step in buildRoofSteps(buildingObj):
+        pass
+    return {'FINISHED'}
+
+# 分步营造房顶
+# 每完成一层后返回该层名称，便于分步执行和中途取消
+def buildRoofSteps(buildingObj:bpy.types.Object):
     # 载入数据
     bData:acaData = buildingObj.ACA_data
     # 添加“屋顶层”根节点
@@ -3824,21 +3803,25 @@ def buildRoof(buildingObj:bpy.types.Object):
     if bData.is_showDougong:
         utils.outputMsg("Building Dougong...")
         buildDougong.buildDougong(buildingObj)
+        yield 'dougong'
 
     # 生成梁架
     if bData.is_showBeam:
         utils.outputMsg("Building Beams...")
         buildBeam.buildBeamFrame(buildingObj)
+        yield 'beams'
     
     # 生成椽望
     if bData.is_showRafter:
         utils.outputMsg("Building Rafters...")
         __buildRafterFrame(buildingObj)
+        yield 'rafters'
 
     # 生成瓦作层
     if bData.is_showTiles:
         utils.outputMsg("Building Tiles...")
         buildRooftile.buildTile(buildingObj)
+        yield 'tiles'
     
     utils.focusObj(buildingObj)
-    return {'FINISHED'}
\ No newline at end of file
+    return
\ No newline at end of file
@@ -5,11 +5,17 @@
 import bpy
 import bmesh
 import math
-from mathutils import Vector,Matrix
+import numpy as np
+from mathutils import Vector,Matrix,Euler
 
 from . import utils
+from . import buildTrace
+from . import meshArray
+from . import assetCache
+from . import tileFrame
 from . import buildBeam
 from . import template
+from . import buildLayers
 from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
@@ -566,6 +572,7 @@ def __getTileCols(buildingObj:bpy.types.Object,direction='X'):
     return tileCols
 
 # 绘制瓦面网格，依赖于三条曲线的控制
+@buildTrace.traced()
 def __drawTileGrid(
             buildingObj:bpy.types.Object,
             rafter_pos,
@@ -582,10 +589,10 @@ def __drawTileGrid(
     # 250116 不再以用户输入瓦垄长，以筒瓦为依据
     # # 瓦片长度
     # tileLength = bData.tile_length
-    tileLength = (aData.circularTile_source.dimensions.y 
+    tileLength = (utils.getDimensions(aData.circularTile_source).y 
                   * bData.DK 
                   / con.DEFAULT_DK)
-    tileHeight = (aData.circularTile_source.dimensions.z 
+    tileHeight = (utils.getDimensions(aData.circularTile_source).z 
                   * bData.DK 
                   / con.DEFAULT_DK)
 
@@ -647,19 +654,19 @@ def __drawTileGrid(
     # 注意：GridCols不是列数，是划线数，需要减一，
     # 且GridCols是半垄，实际应该乘二
     if direction == 'X':
-        bData['tile_width_real'] = tileGrid.dimensions.x/(GridCols-1)*2
+        bData['tile_width_real'] = utils.getDimensions(tileGrid).x/(GridCols-1)*2
 
     return tileGrid
 
-# 绘制瓦面的斜切boolean对象
+# 计算瓦面的由戗裁剪范围
 # 分别可以适应庑殿与歇山屋瓦的裁剪（悬山、硬山不涉及）
 # 庑殿沿着角梁、由戗裁剪，其中包含了推山的因素
 # 歇山基于桁架形状裁剪，其中的歇山转折点做了特殊计算
-def __drawTileBool(
+# 原来以此构造boolean裁剪体，现仅返回瓦作层坐标系中的平面多边形(K,2)
+# 裁剪体为竖直挤出，高度范围覆盖整个屋面，所以仅需判断平面坐标
+def __getTileCutPolygon(
         buildingObj:bpy.types.Object,
-        purlin_cross_points,
-        name='tile.bool',
-        direction='X'):
+        purlin_cross_points):
     # 载入数据
     bData:acaData = buildingObj.ACA_data
     dk = bData.DK
@@ -670,17 +677,6 @@ def __drawTileBool(
         buildingObj,con.ACA_TYPE_ROOF_ROOT
     )
 
-    # 任意添加一个对象，具体几何数据在bmesh中建立
-    bpy.ops.mesh.primitive_cube_add(
-        location=(0,0,0)
-    )
-    tileboolObj = bpy.context.object
-    tileboolObj.name = name
-    tileboolObj.data.name = name
-    tileboolObj.parent = tileRootObj
-
-    # 创建bmesh
-    bm = bmesh.new()
     # 各个点的集合
     vectors = []
 
@@ -756,81 +752,355 @@ def __drawTileBool(
         # 插入后点，即前点的Y镜像
         vectors.append(cutPoint*Vector((1,-1,1)))
     
-    # 摆放点
-    vertices=[]
-    for n in range(len(vectors)):
-        if n==0:
-            vert = bm.verts.new(vectors[n])
-        else:
-            # 挤出
-            return_geo = bmesh.ops.extrude_vert_indiv(bm, verts=[vert])
-            vertex_new = return_geo['verts'][0]
-            del return_geo
-            # 给挤出的点赋值
-            vertex_new.co = vectors[n]
-            # 交换vertex给下一次循环
-            vert = vertex_new
-        vertices.append(vert)
-
-    # 创建面
-    for n in range(len(vertices)//2-1): #注意‘/’可能是float除,用'//'进行整除
-        bm.faces.new((
-            vertices[n],vertices[n+1], # 两根椽头
-            vertices[-n-2],vertices[-n-1] # 两根椽尾
-        ))
-
-    # 挤出厚度
-    # 裁剪体的高度为了保险起见，从地平一直做到正脊
-    # 简化计算即屋顶层的起点高度+举架高度
-    # 举架高度进一步简化为通进深*5举
-    # 另外考虑斗栱高度，灰泥高度，正脊高度等，粗暴的再加100DK
-    height = (roofRootObj.location.z 
-              + bData.y_total * 0.5
-              + 100*dk)
-    return_geo = bmesh.ops.extrude_face_region(bm, geom=bm.faces)
-    verts = [elem for elem in return_geo['geom'] if type(elem) == bmesh.types.BMVert]
-    bmesh.ops.translate(bm, verts=verts, vec=(0, 0,height))
-
-    # 确保face normal朝向
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-    bm.to_mesh(tileboolObj.data)
-    tileboolObj.data.update()
-    bm.free()
-
-    # 添加细分，可以减少裁剪瓦片时出现的异常毛刺点
-    utils.subdivideObject(tileboolObj,level=3)
-
-    # 添加镜像
-    mod = tileboolObj.modifiers.new(name='mirror', type='MIRROR')
-    mod.use_axis[0] = True
-    mod.use_axis[1] = False
-    mod.mirror_object = tileRootObj
-
-    return tileboolObj
-
-# 在face上放置瓦片
-def __setTile(
-            sourceObj,
-            name,
-            Matrix,
-            offset,
-            parent
-):    
-    TileCopy = utils.copySimplyObject(
-        sourceObj=sourceObj,
-        name=name,
-        parentObj=parent,
-    )  
-    # 滴水定位，从网格面中心偏移半个瓦垄（实际落在网格线上，也保证了瓦垄居中）
-    TileCopy.matrix_local = Matrix
-    offset.rotate(TileCopy.rotation_euler)
-    TileCopy.location += offset
-
-    # 250110 新增琉璃颜色切换
-    mat.setGlazeStyle(TileCopy)
-    return TileCopy   
+    return np.array([(v.x,v.y) for v in vectors])
+
+# 计算瓦片顶点在瓦作层坐标系中的平面坐标，(N,V,2)
+# gridMatrix为瓦面网格在瓦作层中的matrix_local
+def __getTileRootXY(tileArrays,mats,gridMatrix):
+    rootMats = np.einsum('ij,njk->nik', gridMatrix, mats)
+    return (np.einsum('nij,vj->nvi', rootMats[:,:2,:3], tileArrays['co'])
+            + rootMats[:,None,:2,3])
+
+# 按由戗裁剪范围，批量筛选瓦片
+# 替代原来的boolean修改器：完全在范围外的瓦片直接舍弃，
+# 仅跨越裁剪线的瓦片，按最近的一段裁剪线做bisect
+# keepInside=True保留范围内的瓦片（原INTERSECT），否则保留范围外的瓦片（原DIFFERENCE）
+# 返回完整保留的瓦片矩阵，以及裁剪后的网格数组列表，坐标仍基于瓦面网格
+def __trimTiles(tileArrays,
+                mats,
+                cutPolygon,
+                gridMatrix,
+                keepInside):
+    if len(mats) == 0:
+        return mats,[]
+    # 瓦片顶点转换到瓦作层坐标系，仅取平面坐标
+    co = __getTileRootXY(tileArrays,mats,gridMatrix)
+    points = co.reshape((-1,2))
+    # 裁剪体带有X向镜像
+    isIn = (meshArray.pointsInPolygon(points,cutPolygon)
+            | meshArray.pointsInPolygon(points*(-1,1),cutPolygon))
+    isIn = isIn.reshape(co.shape[:2])
+    allIn = isIn.all(axis=1)
+    anyIn = isIn.any(axis=1)
+    if keepInside:
+        isKeep = allIn
+    else:
+        isKeep = ~anyIn
+    isCut = anyIn & ~allIn
+    result = []
+    if not np.any(isCut):
+        return mats[isKeep],result
+
+    # 跨越裁剪线的瓦片，查找距离最近的裁剪线
+    # 裁剪线为竖直面，在镜像一侧的瓦片，按镜像后的坐标查找
+    center = co[isCut].mean(axis=1)
+    sign = np.where(center[:,0] < 0, -1, 1)
+    center[:,0] *= sign
+    edgeStart = cutPolygon
+    edgeDir = np.roll(cutPolygon,-1,axis=0) - cutPolygon
+    edgeLen2 = (edgeDir**2).sum(axis=1)
+    edgeLen2[edgeLen2 == 0] = 1
+    t = np.einsum('mkj,kj->mk',
+        center[:,None,:] - edgeStart[None,:,:], edgeDir) / edgeLen2
+    t = np.clip(t,0,1)
+    foot = edgeStart[None,:,:] + t[:,:,None]*edgeDir[None,:,:]
+    edgeIndex = np.argmin(
+        ((center[:,None,:] - foot)**2).sum(axis=2),axis=1)
+    # 多边形的环绕方向，使裁剪面的法线朝向多边形内侧
+    x,y = cutPolygon[:,0],cutPolygon[:,1]
+    orient = np.sign(np.sum(x*np.roll(y,-1) - np.roll(x,-1)*y))
+    gridInv = np.linalg.inv(gridMatrix)
+
+    # 同一段裁剪线上的瓦片合并后一次裁切
+    cutMats = mats[isCut]
+    groupKey = edgeIndex*2 + (sign < 0)
+    for key in np.unique(groupKey):
+        group = groupKey == key
+        k = key // 2
+        s = -1 if key % 2 else 1
+        planeCo = np.array((edgeStart[k,0]*s, edgeStart[k,1], 0, 1))
+        planeNo = np.array((-edgeDir[k,1]*s, edgeDir[k,0], 0))*orient
+        # 转换到瓦面网格坐标系，法线按逆转置变换
+        planeCo = (gridInv @ planeCo)[:3]
+        planeNo = gridMatrix[:3,:3].T @ planeNo
+        result.append(meshArray.bisectArrays(
+            meshArray.instanceArrays(tileArrays,cutMats[group]),
+            planeCo=Vector(planeCo),
+            planeNo=Vector(planeNo).normalized(),
+            clearInner=keepInside,
+            clearOuter=not keepInside))
+    return mats[isKeep],result
+
+# 瓦片实例的几何节点
+# 在点上按tile_type分别摆放滴水、勾头、板瓦、筒瓦，
+# 并按tile_rotation/tile_scale旋转缩放，最后做四面镜像
+# 瓦片资源以对象输入，各建筑共用同一个节点树
+TILE_INSTANCE_TREE = 'ACA瓦片实例'
+TILE_INSTANCE_MOD = '瓦片实例'
+TILE_INSTANCE_INPUTS = ('滴水','勾头','板瓦','筒瓦')
+def __getTileInstanceTree():
+    tree = bpy.data.node_groups.get(TILE_INSTANCE_TREE)
+    if tree != None:
+        return tree
+    
+    tree = bpy.data.node_groups.new(TILE_INSTANCE_TREE,'GeometryNodeTree')
+    tree.interface.new_socket('Geometry',
+        in_out='INPUT',socket_type='NodeSocketGeometry')
+    tree.interface.new_socket('Geometry',
+        in_out='OUTPUT',socket_type='NodeSocketGeometry')
+    for inputName in TILE_INSTANCE_INPUTS:
+        tree.interface.new_socket(inputName,
+            in_out='INPUT',socket_type='NodeSocketObject')
+    nodes = tree.nodes
+    links = tree.links
+    nodeIn = nodes.new('NodeGroupInput')
+    nodeOut = nodes.new('NodeGroupOutput')
+
+    # 网格顶点转为点
+    toPoints = nodes.new('GeometryNodeMeshToPoints')
+    links.new(nodeIn.outputs['Geometry'],toPoints.inputs['Mesh'])
+    # 读取瓦片属性
+    attrType = nodes.new('GeometryNodeInputNamedAttribute')
+    attrType.data_type = 'INT'
+    attrType.inputs['Name'].default_value = 'tile_type'
+    attrRot = nodes.new('GeometryNodeInputNamedAttribute')
+    attrRot.data_type = 'FLOAT_VECTOR'
+    attrRot.inputs['Name'].default_value = 'tile_rotation'
+    attrScale = nodes.new('GeometryNodeInputNamedAttribute')
+    attrScale.data_type = 'FLOAT_VECTOR'
+    attrScale.inputs['Name'].default_value = 'tile_scale'
+
+    # 按瓦片类型分别摆放
+    joinNode = nodes.new('GeometryNodeJoinGeometry')
+    for n,inputName in enumerate(TILE_INSTANCE_INPUTS):
+        objInfo = nodes.new('GeometryNodeObjectInfo')
+        objInfo.transform_space = 'ORIGINAL'
+        links.new(nodeIn.outputs[inputName],objInfo.inputs['Object'])
+        compare = nodes.new('FunctionNodeCompare')
+        compare.data_type = 'INT'
+        compare.operation = 'EQUAL'
+        # Compare节点的第3、4个输入为整数
+        links.new(attrType.outputs['Attribute'],compare.inputs[2])
+        compare.inputs[3].default_value = n
+        instance = nodes.new('GeometryNodeInstanceOnPoints')
+        links.new(toPoints.outputs['Points'],instance.inputs['Points'])
+        links.new(compare.outputs['Result'],instance.inputs['Selection'])
+        links.new(objInfo.outputs['Geometry'],instance.inputs['Instance'])
+        links.new(attrRot.outputs['Attribute'],instance.inputs['Rotation'])
+        links.new(attrScale.outputs['Attribute'],instance.inputs['Scale'])
+        links.new(instance.outputs['Instances'],joinNode.inputs['Geometry'])
+
+    # 四面镜像，镜像轴即瓦作层的坐标轴
+    mirrorNode = nodes.new('GeometryNodeJoinGeometry')
+    links.new(joinNode.outputs['Geometry'],mirrorNode.inputs['Geometry'])
+    for scale in ((-1,1,1),(1,-1,1),(-1,-1,1)):
+        transform = nodes.new('GeometryNodeTransform')
+        transform.inputs['Scale'].default_value = scale
+        links.new(joinNode.outputs['Geometry'],transform.inputs['Geometry'])
+        links.new(transform.outputs['Geometry'],mirrorNode.inputs['Geometry'])
+    links.new(mirrorNode.outputs['Geometry'],nodeOut.inputs['Geometry'])
+    return tree
+
+# 瓦片实例的资源对象
+# 以缓存的瓦片网格生成，前后檐与两山共用，隐藏在瓦作层下
+def __getTileInstanceSource(tileRootObj:bpy.types.Object,
+                            tileArrays,
+                            tileName,
+                            bData:acaData):
+    sourceName = '屋瓦.实例源.' + tileName
+    for obj in tileRootObj.children:
+        if obj.name.startswith(sourceName):
+            return obj
+    sourceMesh = meshArray.newMeshByArrays(tileArrays,sourceName)
+    sourceObj = bpy.data.objects.new(sourceName,sourceMesh)
+    bpy.context.collection.objects.link(sourceObj)
+    sourceObj.parent = tileRootObj
+    # 展UV，UV密度在__buildTileInstances中与合并瓦面统一
+    sourceObj.active_material_index = int(bData.tile_color)*2
+    mat.setGlazeUV(sourceObj,uvType=None,matIndex=[
+        int(bData.tile_color)*2,
+        int(bData.tile_alt_color)*2])
+    utils.hideObj(sourceObj)
+    return sourceObj
+
+# 以几何节点实例的方式摆放瓦片
+# 每片瓦仅记录一个点，以及类型、旋转、缩放属性，
+# 不再生成实际的网格，直到合并、导出或手工实体化
+def __buildTileInstances(buildingObj:bpy.types.Object,
+                         tileList,
+                         matsList,
+                         gridMatrix,
+                         name,
+                         mergedObj=None):
+    # 载入数据
+    bData:acaData = buildingObj.ACA_data
+    tileRootObj = utils.getAcaChild(
+        buildingObj,con.ACA_TYPE_TILE_ROOT
+    )
+    tileType = np.concatenate([
+        np.full(len(mats),n,dtype=np.int32)
+        for n,mats in enumerate(matsList)])
+    if len(tileType) == 0:
+        return None
+    # 转换到瓦作层坐标系，以便在几何节点中沿坐标轴镜像
+    rootMats = np.einsum('ij,njk->nik',
+        gridMatrix, np.concatenate(matsList))
+    euler,size = tileFrame.matrixToEuler(rootMats[:,:3,:3])
+
+    # 构造点云网格
+    pointMesh = bpy.data.meshes.new(name)
+    pointMesh.vertices.add(len(tileType))
+    pointMesh.vertices.foreach_set('co',
+        rootMats[:,:3,3].astype(np.float32).ravel())
+    attr = pointMesh.attributes.new('tile_type','INT','POINT')
+    attr.data.foreach_set('value',tileType)
+    attr = pointMesh.attributes.new('tile_rotation','FLOAT_VECTOR','POINT')
+    attr.data.foreach_set('vector',euler.astype(np.float32).ravel())
+    attr = pointMesh.attributes.new('tile_scale','FLOAT_VECTOR','POINT')
+    attr.data.foreach_set('vector',size.astype(np.float32).ravel())
+    pointMesh.update()
+    instanceObj = bpy.data.objects.new(name,pointMesh)
+    bpy.context.collection.objects.link(instanceObj)
+    instanceObj.parent = tileRootObj
+
+    # 几何节点
+    gnMod:bpy.types.NodesModifier = instanceObj.modifiers.new(
+        TILE_INSTANCE_MOD,'NODES')
+    gnMod.node_group = __getTileInstanceTree()
+    sourceObjs = []
+    createdObjs = []
+    for n,inputName in enumerate(TILE_INSTANCE_INPUTS):
+        sourceName = '屋瓦.实例源.' + inputName
+        isNew = not any(obj.name.startswith(sourceName)
+                        for obj in tileRootObj.children)
+        sourceObj = __getTileInstanceSource(
+            tileRootObj,tileList[n],inputName,bData)
+        utils.setGN_Input(gnMod,inputName,sourceObj)
+        sourceObjs.append(sourceObj)
+        if isNew:
+            createdObjs.append(sourceObj)
+
+    # 新建的资源对象，UV密度与合并瓦面保持一致
+    if len(createdObjs) > 0:
+        matIndex = [int(bData.tile_color)*2,
+                    int(bData.tile_alt_color)*2]
+        density = __getInstanceUVDensity(
+            mergedObj,sourceObjs,
+            [len(mats) for mats in matsList],
+            matIndex)
+        for sourceObj in createdObjs:
+            mat.setUVDensity(sourceObj.data,density,matIndex)
+    return instanceObj
+
+# 瓦片实例资源对象的UV密度
+# 单片瓦展UV后的密度远大于合并的瓦面（smart project将UV岛缩放到0~1范围内），
+# 以同一瓦面中合并部分的密度为准，实体化后贴图尺度与合并的瓦片一致
+# 没有合并部分时（没有裁剪、跨越镜像轴的瓦片），
+# 按UV密度与总面积的平方根成反比，由单片瓦的密度估算整个瓦面的密度
+def __getInstanceUVDensity(mergedObj:bpy.types.Object,
+                           sourceObjs,
+                           counts,
+                           matIndex):
+    if mergedObj != None:
+        density = mat.getUVDensity(mergedObj.data,matIndex)
+        if density != None:
+            return density
+    # 实例在几何节点中四面镜像
+    totalArea = 4*sum(mat.getFaceArea(obj.data,matIndex)*count
+                      for obj,count in zip(sourceObjs,counts))
+    for obj in sourceObjs:
+        density = mat.getUVDensity(obj.data,matIndex)
+        if density == None or totalArea <= 0:
+            continue
+        area = mat.getFaceArea(obj.data,matIndex)
+        return density*(area/totalArea)**0.5
+    return None
+
+# 瓦片实例的实体化
+# 将建筑中的瓦片实例转换为实际网格，并删除实例的资源对象
+# 用于合并、导出，或用户手工操作
+def realizeTileInstances(buildingObj:bpy.types.Object):
+    tileRootObj = utils.getAcaChild(
+        buildingObj,con.ACA_TYPE_TILE_ROOT
+    )
+    if tileRootObj == None:
+        return 0
+    instanceObjs = [obj for obj in tileRootObj.children
+                    if TILE_INSTANCE_MOD in obj.modifiers]
+    if len(instanceObjs) == 0:
+        return 0
+    
+    # 保留当前的选择状态，以免影响导出时的use_selection
+    selected = list(bpy.context.selected_objects)
+    active = bpy.context.view_layer.objects.active
+    for obj in instanceObjs:
+        # 转换为网格时，实例会被实体化
+        utils.applyAllModifer(obj)
+    utils.deleteObjects([obj for obj in tileRootObj.children
+                         if obj.name.startswith('屋瓦.实例源.')])
+    for obj in bpy.context.selected_objects:
+        obj.select_set(False)
+    for obj in selected:
+        try:
+            obj.select_set(True)
+        except ReferenceError:
+            pass
+    bpy.context.view_layer.objects.active = active
+    return len(instanceObjs)
+
+# 按材质统计对象的UV密度
+# 实体化后材质编号可能重排，所以按材质名称统计
+def __getUVDensityByMat(obj:bpy.types.Object):
+    densities = {}
+    for n,slot in enumerate(obj.material_slots):
+        if slot.material == None:
+            continue
+        density = mat.getUVDensity(obj.data,[n])
+        if density != None:
+            densities[slot.material.name] = density
+    return densities
+
+# 检查实例化瓦片与合并瓦面的UV尺度是否一致
+# 将瓦片实例实体化后，按材质比较实体化的瓦片与前后檐合并瓦面的UV密度
+# 前后檐没有合并部分时，资源对象的密度为估算值，不做比较
+# 实例的缩放会带来少量差异，以相对误差tolerance判断
+# 返回不一致的记录列表，每条为（材质，实体化的密度，合并的密度）
+# 会实体化瓦片实例，仅用于测试
+def checkTileUV(buildingObj:bpy.types.Object,
+                tolerance=0.05):
+    tileRootObj = utils.getAcaChild(
+        buildingObj,con.ACA_TYPE_TILE_ROOT
+    )
+    if tileRootObj == None:
+        return []
+    instanceObjs = [obj for obj in tileRootObj.children
+                    if TILE_INSTANCE_MOD in obj.modifiers]
+    # 资源对象在前后檐铺瓦时创建，UV密度以前后檐的合并瓦面为准
+    # 两山的合并瓦面大小不同，smart project的密度本来就与前后檐不同
+    mergedObjs = [obj for obj in tileRootObj.children
+                  if obj.name.startswith('屋瓦.前后檐')
+                  and obj.type == 'MESH'
+                  and obj not in instanceObjs]
+    realizeTileInstances(buildingObj)
+
+    realized = {}
+    for obj in instanceObjs:
+        realized.update(__getUVDensityByMat(obj))
+    merged = {}
+    for obj in mergedObjs:
+        merged.update(__getUVDensityByMat(obj))
+    mismatches = []
+    for matName,density in realized.items():
+        if matName not in merged:
+            continue
+        if abs(density-merged[matName]) > tolerance*merged[matName]:
+            mismatches.append((matName,density,merged[matName]))
+    return mismatches
 
 # 在网格上平铺瓦片
+# 不再逐片复制对象再合并，而是以numpy批量计算所有瓦片的坐标，
+# 一次性写入一个合并的网格
+@buildTrace.traced()
 def __arrayTileGrid(buildingObj:bpy.types.Object,
                 rafter_pos,
                 tileGrid:bpy.types.Object,
@@ -843,42 +1113,23 @@ def __arrayTileGrid(buildingObj:bpy.types.Object,
     )
 
     # 载入瓦片资源
-    flatTile:bpy.types.Object = utils.copyObject(
-        aData.flatTile_source,singleUser=True)
-    circularTile:bpy.types.Object = utils.copyObject(
-        aData.circularTile_source,singleUser=True)
-    eaveTile:bpy.types.Object = utils.copyObject(
-        aData.eaveTile_source,singleUser=True)
-    dripTile:bpy.types.Object = utils.copyObject(
-        aData.dripTile_source,singleUser=True)
-    # 根据斗口调整尺度
-    flatTile = utils.resizeObj(flatTile,
-        bData.DK / con.DEFAULT_DK)
-    circularTile = utils.resizeObj(circularTile,
-        bData.DK / con.DEFAULT_DK)
-    eaveTile = utils.resizeObj(eaveTile,
-        bData.DK / con.DEFAULT_DK)
-    dripTile = utils.resizeObj(dripTile,
-        bData.DK / con.DEFAULT_DK)
-    utils.applyTransfrom(flatTile,use_scale=True)
-    utils.applyTransfrom(circularTile,use_scale=True)
-    utils.applyTransfrom(eaveTile,use_scale=True)
-    utils.applyTransfrom(dripTile,use_scale=True)
-    # 应用所有的modifier，以免后续快速合并时丢失
-    utils.applyAllModifer(flatTile)
-    utils.applyAllModifer(circularTile)
-    utils.applyAllModifer(eaveTile)
-    utils.applyAllModifer(dripTile)
+    # 已按斗口缩放、应用修改器、设置琉璃颜色，并在会话中缓存复用
+    flatTile = assetCache.getTileArrays(
+        aData.flatTile_source,bData)
+    circularTile = assetCache.getTileArrays(
+        aData.circularTile_source,bData)
+    eaveTile = assetCache.getTileArrays(
+        aData.eaveTile_source,bData)
+    dripTile = assetCache.getTileArrays(
+        aData.dripTile_source,bData)
 
-    # 瓦垄宽度
-    tileWidth = bData.tile_width
     # 250116 不再以用户输入瓦垄长，以筒瓦为依据
     # # 瓦片长度
     # tileLength = bData.tile_length
-    tileLength = (aData.circularTile_source.dimensions.y 
+    tileLength = (utils.getDimensions(aData.circularTile_source).y 
                   * bData.DK 
                   / con.DEFAULT_DK)
-    tileHeight = (aData.circularTile_source.dimensions.z 
+    tileHeight = (utils.getDimensions(aData.circularTile_source).z 
                   * bData.DK 
                   / con.DEFAULT_DK)
     # 计算瓦垄的数量
@@ -886,192 +1137,174 @@ def __arrayTileGrid(buildingObj:bpy.types.Object,
     #GridCols = tileCols*2+1
     GridCols = tileCols*2-1
 
-    # 构造一个裁剪对象，做boolean
-    # 瓦面不适合像椽架那样做三个bisect面的切割
-    # 因为推山导致的由戗角度交叉，使得三个bisect面也有交叉，导致上下被裁剪的过多
-    tile_bool_obj = __drawTileBool(
-        buildingObj,rafter_pos,direction=direction)
-    
     # 檐面与山面的差异
     if direction=='X':
-        # boolean用difference，向外切
+        # 由戗裁剪保留范围外的瓦片（原boolean用difference，向外切）
         isBoolInside=False
         # 瓦片走向取第一条边
         dir_index = 0
     else:
         tileGrid = utils.flipNormal(tileGrid)
-        # boolean用intersec，向内切
+        # 由戗裁剪保留范围内的瓦片（原boolean用intersec，向内切）
         isBoolInside=True
         # 瓦片走向取第二条边
         dir_index = 1
 
-    # 在瓦面网格上依次排布瓦片
-    bm = bmesh.new()   # create an empty BMesh
-    bm.from_mesh(tileGrid.data)   # fill it in from a Mesh
-    tileList = []
-    for f in bm.faces:
-        # 基于edge，构造Matrix变换矩阵，用于瓦片的定位
-        # https://blender.stackexchange.com/questions/177218/make-bone-roll-match-a-face-vertex-normal/177331#177331
-        # 取面上第一条边（沿着坡面）
-        e = f.edges[dir_index]
-        # 边的向量(归一化)，做为Y轴
-        y = (e.verts[1].co - e.verts[0].co).normalized()
-        # # 平均相邻面的法线，做为边的法线，做为Z轴
-        # z = sum((f.normal for f in e.link_faces), Vector()).normalized()
-        z = f.normal.normalized()
-        # Y/Z轴做叉积，得到与之垂直的X轴
-        x = y.cross(z)
-        # 坐标系转置（行列互换，以复合blender的坐标系要求）
-        M = Matrix((x, y, z)).transposed().to_4x4()
-        # 250116 按照网格长度缩放筒板瓦
-        tileLength = aData.circularTile_source.dimensions.y 
-        tileLength = tileLength * bData.DK / con.DEFAULT_DK
-        cellLength = e.calc_length()
-        scale_factor = cellLength/tileLength
-        if direction=='X':
-            M = Matrix.Diagonal((1,scale_factor,1)).to_4x4() @ M
-        else:
-            M = Matrix.Diagonal((scale_factor,1,1)).to_4x4() @ M
-        # 坐标系原点放在几何面的中心
-        M.translation = f.calc_center_median()
-    
-        # 250116 瓦片布在网格几何中心，
-        # 并对齐筒瓦顶面，以避免卷棚顶筒瓦的间隙
-        if direction=='X':
-            offset_aside = Vector((
-                bData.tile_width_real/4,
-                -cellLength/2,
-                -tileHeight))
-            offset_head = Vector((
-                bData.tile_width_real/4,
-                cellLength/2,
-                -tileHeight))
-        else:
-            offset_aside = Vector((
-                -bData.tile_width_real/4,
-                -cellLength/2,
-                -tileHeight))
-            offset_head = Vector((
-                -bData.tile_width_real/4,
-                cellLength/2,
-                -tileHeight)) 
-        
-        # 241113 修正bug：原来的筒板瓦排布时从檐口的瓦面face开始计算，
-        # 实际上第一行应该是勾头滴水的normal，筒板瓦应该从第二行的face开始计算
-        # 排布板瓦，仅在偶数列排布
-        if ((f.index%GridCols) % 2 == 0
-            # 不做最后一列板瓦，以免与排山勾滴重叠
-            and f.index%GridCols != GridCols-1
-            and f.index >= GridCols):
-            tileObj = __setTile(
-                sourceObj=flatTile,
-                name='板瓦',
-                Matrix=M,
-                offset=offset_aside.copy(),
-                parent=tileGrid,
-            )
-            tileList.append(tileObj)
-
-        # 排布筒瓦，奇数列排布
-        if (f.index%GridCols) % 2 == 1 and f.index >= GridCols:
-            tileObj = __setTile(
-                sourceObj=circularTile,
-                name='筒瓦',
-                Matrix=M,
-                offset=offset_aside.copy(),
-                parent=tileGrid,
-            )
-            tileList.append(tileObj)
-
-        # 排布檐口瓦
-        if f.index < GridCols:# 第一行
-            # 排布滴水
-            if f.index % 2 == 0:
-                tileObj = __setTile(
-                    sourceObj=dripTile,
-                    name='滴水',
-                    Matrix=M,
-                    offset=offset_head.copy(),
-                    parent=tileGrid,
-                )
-                # 硬山、悬山（卷棚）最后一个滴水做斜切
-                if bData.roof_style in (
-                            con.ROOF_YINGSHAN,
-                            con.ROOF_YINGSHAN_JUANPENG,
-                            con.ROOF_XUANSHAN,
-                            con.ROOF_XUANSHAN_JUANPENG
-                        ):
-                    if f.index%GridCols == GridCols-1:
-                        utils.addBisect(
-                            object=tileObj,
-                            pStart=tileGrid.matrix_world @ Vector((0,0,0)),
-                            pEnd=tileGrid.matrix_world @ Vector((1,1,0)),
-                            pCut=tileGrid.matrix_world @ f.calc_center_median(),
-                            clear_inner=True
-                        )
-                tileList.append(tileObj) 
-
-            # 排布瓦当
-            if f.index % 2 == 1:
-                tileObj = __setTile(
-                    sourceObj=eaveTile,
-                    name='瓦当',
-                    Matrix=M,
-                    offset=offset_head.copy(),
-                    parent=tileGrid,
-                )
-                tileList.append(tileObj)
-    
-    # 合并所有的瓦片对象
+    # 批量计算瓦面网格上各个面的定位矩阵，以及摆放的瓦片类型
+    gridArrays = meshArray.getMeshArrays(tileGrid.data)
+    loopStart = gridArrays['loopStart']
+    edgeIndex = gridArrays['loopEdges'][loopStart + dir_index]
+    frames, tileClass = tileFrame.getTileFrames(
+        co=gridArrays['co'],
+        loopVerts=gridArrays['loopVerts'],
+        loopStart=loopStart,
+        loopTotal=gridArrays['loopTotal'],
+        gridCols=GridCols,
+        tileLength=tileLength,
+        tileWidth=bData.tile_width_real,
+        tileHeight=tileHeight,
+        dirIndex=dir_index,
+        direction=direction,
+        edgeVerts=gridArrays['edges'][edgeIndex])
+    buildTrace.count('tiles',
+        int(np.count_nonzero(tileClass != tileFrame.TILE_NONE)))
+    faceCol = np.arange(len(tileClass)) % GridCols
+    isFlat = tileClass == tileFrame.TILE_FLAT
+    isCircular = tileClass == tileFrame.TILE_CIRCULAR
+    isDrip = tileClass == tileFrame.TILE_DRIP
+    isEave = tileClass == tileFrame.TILE_EAVE
+
+    # 硬山、悬山（卷棚）最后一个滴水做斜切
+    dripBisect = None
+    if bData.roof_style in (
+                con.ROOF_YINGSHAN,
+                con.ROOF_YINGSHAN_JUANPENG,
+                con.ROOF_XUANSHAN,
+                con.ROOF_XUANSHAN_JUANPENG
+            ):
+        isDripCut = isDrip & (faceCol == GridCols-1)
+        isDrip = isDrip & ~isDripCut
+        if np.any(isDripCut):
+            # 裁切面原基于世界坐标，转换到瓦面网格的坐标系中
+            gridMatrix = tileGrid.matrix_world
+            pStart = gridMatrix @ Vector((0,0,0))
+            pEnd = gridMatrix @ Vector((1,1,0))
+            bisect_normal = Vector((pEnd.x-pStart.x,pEnd.y-pStart.y,0))
+            bisect_normal.rotate(Euler((0,0,math.radians(90)),'XYZ'))
+            bisect_normal = (gridMatrix.inverted().to_3x3() 
+                             @ bisect_normal).normalized()
+            center = tileFrame.getPolyCenters(
+                gridArrays['co'],
+                gridArrays['loopVerts'],
+                loopStart,
+                gridArrays['loopTotal'])
+            dripBisect = []
+            for n in np.flatnonzero(isDripCut):
+                tileArrays = meshArray.instanceArrays(
+                    dripTile, frames[n:n+1])
+                dripBisect.append(meshArray.bisectArrays(
+                    tileArrays,
+                    planeCo=Vector(center[n]),
+                    planeNo=bisect_normal,
+                    clearInner=True))
+
+    # 合并所有的瓦片
     # 可以极大的提高重新生成时的效率（海量对象删除太慢了）
-    if direction == 'X':
-        tileSetName = '前后檐'
-    else:
-        tileSetName = '两山'
-    tileSet = utils.joinObjects(
-        tileList,newName = '屋瓦.' + tileSetName)
-    # 将屋瓦绑定到根节点
-    utils.changeParent(tileSet,tileRootObj)
+    # 以滴水为首，与原来join时的材质顺序保持一致
+    tileGroups = [
+        (dripTile, frames[isDrip]),
+        (eaveTile, frames[isEave]),
+        (flatTile, frames[isFlat]),
+        (circularTile, frames[isCircular]),
+    ]
+    gridMatrix = np.array(tileGrid.matrix_local)
     # 庑殿、歇山做裁剪
+    # 原来在瓦面上添加boolean修改器，裁剪体还要细分三次，计算很慢
+    # 瓦面不适合像椽架那样做三个bisect面的切割
+    # 因为推山导致的由戗角度交叉，使得三个bisect面也有交叉，导致上下被裁剪的过多
+    # 现按由戗多边形逐片判断，仅对跨越裁剪线的瓦片，按所在的那段裁剪线做bisect
+    cutPolygon = None
     if bData.roof_style in (
                 con.ROOF_WUDIAN,
                 con.ROOF_XIESHAN,
                 con.ROOF_XIESHAN_JUANPENG,
                 con.ROOF_LUDING,):
-        mod:bpy.types.BooleanModifier = tileSet.modifiers.new("由戗裁剪","BOOLEAN")
-        mod.object = tile_bool_obj
-        mod.solver = con.BOOLEAN_TYPE # FAST / EXACT
-        if isBoolInside:
-            mod.operation = 'INTERSECT'
-        else:
-            mod.operation = 'DIFFERENCE'
-    # 添加镜像
-    utils.addModifierMirror(
-        object=tileSet,
-        mirrorObj=tileRootObj,
-        use_axis=(True,True,False),
-        use_bisect=(True,True,False),
-    )
+        cutPolygon = __getTileCutPolygon(buildingObj,rafter_pos)
+    # 实例化时，瓦面所在的象限，用于判断瓦片是否跨越镜像轴
+    if bData.use_tile_instance:
+        rootCenter = frames[:,:3,3] @ gridMatrix[:3,:3].T + gridMatrix[:3,3]
+        quadrant = np.where(rootCenter[:,:2].mean(axis=0) < 0, -1, 1)
+    tileArrayList = []
+    instanceMats = []
+    for n,(tile,mats) in enumerate(tileGroups):
+        cutList = []
+        if cutPolygon is not None:
+            mats,cutList = __trimTiles(
+                tile,mats,cutPolygon,gridMatrix,
+                keepInside=isBoolInside)
+        # 实例化时，完整的瓦片以实例摆放
+        # 被裁剪的、跨越镜像轴的瓦片，仍合并为网格，由镜像修改器裁切
+        if bData.use_tile_instance:
+            isWhole = np.all(
+                __getTileRootXY(tile,mats,gridMatrix)*quadrant >= 0,
+                axis=(1,2))
+            instanceMats.append(mats[isWhole])
+            mats = mats[~isWhole]
+        tileArrayList.append(meshArray.instanceArrays(tile,mats))
+        tileArrayList += cutList
+        # 斜切的滴水紧跟在滴水之后
+        if n == 0 and dripBisect != None:
+            tileArrayList += dripBisect
+    tileArrays = meshArray.joinArrays(tileArrayList)
+
+    if direction == 'X':
+        tileSetName = '前后檐'
+    else:
+        tileSetName = '两山'
+    tileSetName = '屋瓦.' + tileSetName
+    tileSet = None
+    if tileArrays != None and len(tileArrays['loopStart']) > 0:
+        tileMesh = meshArray.newMeshByArrays(tileArrays,tileSetName)
+        tileSet = bpy.data.objects.new(tileSetName,tileMesh)
+        bpy.context.collection.objects.link(tileSet)
+        # 将屋瓦绑定到根节点，网格坐标基于瓦面网格，所以沿用瓦面网格的定位
+        tileSet.parent = tileRootObj
+        tileSet.matrix_parent_inverse = tileGrid.matrix_parent_inverse.copy()
+        tileSet.matrix_basis = tileGrid.matrix_basis.copy()
+        # 添加镜像
+        utils.addModifierMirror(
+            object=tileSet,
+            mirrorObj=tileRootObj,
+            use_axis=(True,True,False),
+            use_bisect=(True,True,False),
+        )
 
-    # 250110 重展UV
-    # 实际在__setTile中已经做了setGlazeStyle，但仅基于单个瓦片
-    # 将active_material落在筒板瓦的瓦面上
-    # 250209 注意，瓦面同时使用琉璃和瓦当两个材质
-    # 所以计算active material时，需要乘2
-    tileSet.active_material_index = int(bData.tile_color)*2
-    # 这里在modifier的平铺范围上做全局的UV平铺
-    # 250209 使用cubeProject时有明显的横纹，改为smartProject
-    mat.setGlazeUV(tileSet,uvType=None)
+        # 250110 重展UV
+        # 瓦片资源中仅切换了材质编号，未展UV
+        # 将active_material落在筒板瓦的瓦面上
+        # 250209 注意，瓦面同时使用琉璃和瓦当两个材质
+        # 所以计算active material时，需要乘2
+        tileSet.active_material_index = int(bData.tile_color)*2
+        # 这里在modifier的平铺范围上做全局的UV平铺
+        # 一次展开瓦面和剪边（滴水/勾头）两种琉璃材质
+        # 250209 使用cubeProject时有明显的横纹，改为smartProject
+        mat.setGlazeUV(tileSet,uvType=None,matIndex=[
+            int(bData.tile_color)*2,
+            int(bData.tile_alt_color)*2])
+
+    # 实例化的瓦片
+    if bData.use_tile_instance:
+        __buildTileInstances(
+            buildingObj,
+            [dripTile,eaveTile,flatTile,circularTile],
+            instanceMats,
+            gridMatrix,
+            tileSetName + '.实例',
+            tileSet)
 
     # 隐藏辅助对象
-    utils.hideObj(tile_bool_obj)
     utils.hideObj(tileGrid)
 
-    bpy.data.objects.remove(flatTile)
-    bpy.data.objects.remove(circularTile)
-    bpy.data.objects.remove(eaveTile)
-    bpy.data.objects.remove(dripTile)
-
 # 计算正脊长度
 # 并且可以在硬山、悬山、歇山的垂脊、排山勾滴等复用
 def __getTopRidgeLength(buildingObj: bpy.types.Object,
@@ -1161,20 +1394,17 @@ def __buildTopRidge(buildingObj: bpy.types.Object,
         return
     
     # 载入正脊资产对象
-    roofRidgeObj = utils.copyObject(
+    roofRidgeObj = assetCache.copyAsset(
         sourceObj=aData.ridgeTop_source,
         name="正脊",
         location=(0,0,zhengji_z),
         parentObj=tileRootObj,
-        singleUser=True)
-    # 根据斗口调整尺度
-    utils.resizeObj(roofRidgeObj,
-        bData.DK / con.DEFAULT_DK)
+        dk=bData.DK)
     # 与瓦垄宽度匹配
-    roofRidgeObj.dimensions.x = bData.tile_width_real
+    utils.setDimensions(roofRidgeObj,x=bData.tile_width_real)
     utils.applyTransfrom(roofRidgeObj,use_scale=True)
     # 脊筒坐中
-    roofRidgeObj.location.x = - roofRidgeObj.dimensions.x/2
+    roofRidgeObj.location.x = - utils.getDimensions(roofRidgeObj).x/2
     
     # 横向平铺
     modArray:bpy.types.ArrayModifier = \
@@ -1243,22 +1473,19 @@ def __buildSurroundRidge(buildingObj:bpy.types.Object,
     
     #------------------------
     # 1、横向围脊
-    roofRidgeObj = utils.copyObject(
+    roofRidgeObj = assetCache.copyAsset(
         sourceObj=aData.ridgeBack_source,
         name="围脊",
         location=(0,
                   ridgeCross.y,
                   ridgeCross.z),
         parentObj=tileRootObj,
-        singleUser=True)
-    # 根据斗口调整尺度
-    utils.resizeObj(roofRidgeObj,
-        bData.DK / con.DEFAULT_DK)
+        dk=bData.DK)
     # 与瓦垄宽度匹配
-    roofRidgeObj.dimensions.x = bData.tile_width_real
+    utils.setDimensions(roofRidgeObj,x=bData.tile_width_real)
     utils.applyTransfrom(roofRidgeObj,use_scale=True)
     # 脊筒坐中
-    roofRidgeObj.location.x = - roofRidgeObj.dimensions.x/2
+    roofRidgeObj.location.x = - utils.getDimensions(roofRidgeObj).x/2
     # 横向平铺
     # 适当延长，保证转角处能紧密对接（在45度镜像时，超出的部分被裁剪）
     zhengji_length = ridgeCross.x + 0.5
@@ -1279,7 +1506,7 @@ def __buildSurroundRidge(buildingObj:bpy.types.Object,
 
     #------------------------
     # 2、纵向围脊
-    roofRidgeObj = utils.copyObject(
+    roofRidgeObj = assetCache.copyAsset(
         sourceObj=aData.ridgeBack_source,
         name="围脊",
         location=(ridgeCross.x,
@@ -1287,15 +1514,12 @@ def __buildSurroundRidge(buildingObj:bpy.types.Object,
                   ridgeCross.z),
         rotation=(0,0,math.radians(90)),
         parentObj=tileRootObj,
-        singleUser=True)
-    # 根据斗口调整尺度
-    utils.resizeObj(roofRidgeObj,
-        bData.DK / con.DEFAULT_DK)
+        dk=bData.DK)
     # 与瓦垄宽度匹配
-    roofRidgeObj.dimensions.x = bData.tile_width_real
+    utils.setDimensions(roofRidgeObj,x=bData.tile_width_real)
     utils.applyTransfrom(roofRidgeObj,use_scale=True)
     # 脊筒坐中
-    roofRidgeObj.location.y = - roofRidgeObj.dimensions.x/2
+    roofRidgeObj.location.y = - utils.getDimensions(roofRidgeObj).x/2
     # 横向平铺
     # 适当延长，保证转角处能紧密对接（在45度镜像时，超出的部分被裁剪）
     zhengji_length = ridgeCross.y + 0.5
@@ -1476,7 +1700,7 @@ def __drawFrontRidgeCurve(buildingObj:bpy.types.Object,
         r = abs((pNeg1.y - pNeg2.y)/(pNeg1.z - pNeg2.z))
         # Y方向延伸2个垂脊筒的长度，多余的会在镜像时裁剪掉
         ridgeFrontObj:bpy.types.Object = aData.ridgeFront_source
-        offset_y = ridgeFrontObj.dimensions.x * 2
+        offset_y = utils.getDimensions(ridgeFrontObj).x * 2
         pNeg1.y -= offset_y
         # Z方向按尾端斜率延伸
         pNeg1.z += offset_y / r
@@ -1607,18 +1831,12 @@ def __arrayRidgeByCurve(buildingObj: bpy.types.Object,
     )
     
     # 复制垂脊对象
-    frontRidgeObj = utils.copyObject(
+    frontRidgeObj = assetCache.copyAsset(
         sourceObj=sourceObj,
         name=ridgeName,
         location=ridgeCurve.location,
         parentObj=tileRootObj,
-        singleUser=True)
-    # 根据斗口调整尺度
-    utils.resizeObj(frontRidgeObj,
-        bData.DK / con.DEFAULT_DK)
-    # 应用缩放，以便平铺到曲线长度
-    utils.applyTransfrom(
-        frontRidgeObj,use_scale=True)
+        dk=bData.DK)
     
     # 沿垂脊曲线平铺
     modArray:bpy.types.ArrayModifier = \
@@ -1659,16 +1877,12 @@ def __arraySideTile(buildingObj: bpy.types.Object,
     )
     
     # 复制勾滴对象
-    tileObj = utils.copyObject(
+    tileObj = assetCache.copyAsset(
         sourceObj=sourceObj,
         name=tileName,
         location=ridgeCurve.location,
         parentObj=tileRootObj,
-        singleUser=True)
-    # 根据斗口调整尺度
-    tileObj = utils.resizeObj(tileObj,
-        bData.DK / con.DEFAULT_DK)
-    utils.applyTransfrom(tileObj,use_scale=True)
+        dk=bData.DK)
     # 旋转
     tileObj.rotation_euler.x = math.radians(90)
     
@@ -1769,11 +1983,11 @@ def __buildPaoshou(buildingObj: bpy.types.Object,
 
     # 以一个脊筒长度为单位距离
     ridgeObj:bpy.types.Object = aData.ridgeFront_source
-    ridgeLength = ridgeObj.dimensions.x * (bData.DK/con.DEFAULT_DK)
-    ridgeHeight = ridgeObj.dimensions.z * (bData.DK/con.DEFAULT_DK)
+    ridgeLength = utils.getDimensions(ridgeObj).x * (bData.DK/con.DEFAULT_DK)
+    ridgeHeight = utils.getDimensions(ridgeObj).z * (bData.DK/con.DEFAULT_DK)
     # 端头盘子长度
     ridgeEndObj:bpy.types.Object = aData.ridgeEnd_source
-    ridgeEnd_Length = ridgeEndObj.dimensions.x * (bData.DK/con.DEFAULT_DK)
+    ridgeEnd_Length = utils.getDimensions(ridgeEndObj).x * (bData.DK/con.DEFAULT_DK)
 
     for n in range(count):
         #跑兽沿垂脊方向间隔一个脊筒，且坐在脊筒中间
@@ -1817,8 +2031,8 @@ def __buildFrontRidge(buildingObj: bpy.types.Object,
         buildingObj,con.ACA_TYPE_TILE_ROOT
     )
     eaveTile:bpy.types.Object = aData.eaveTile_source
-    eaveTileWidth = eaveTile.dimensions.x
-    eaveTileLength = eaveTile.dimensions.y
+    eaveTileWidth = utils.getDimensions(eaveTile).x
+    eaveTileLength = utils.getDimensions(eaveTile).y
     
     # 绘制垂脊曲线，其中自动判断了垂脊起点：
     # 歇山仅做到正心桁位置
@@ -1843,7 +2057,7 @@ def __buildFrontRidge(buildingObj: bpy.types.Object,
                         ridgeName='垂脊兽后')
         # 获取脊筒长度
         ridgeObj:bpy.types.Object = aData.ridgeBack_source
-        ridgeLength = ridgeObj.dimensions.x * (bData.DK/con.DEFAULT_DK)
+        ridgeLength = utils.getDimensions(ridgeObj).x * (bData.DK/con.DEFAULT_DK)
         # 摆放垂兽
         chuishouObj = utils.copyObject(
             sourceObj=aData.chuishou_source,
@@ -1888,19 +2102,13 @@ def __buildFrontRidge(buildingObj: bpy.types.Object,
                 and bData.paoshou_count == 0) 
         ):
         # 构造端头盘子
-        ridgeEndObj = utils.copyObject(
+        ridgeEndObj = assetCache.copyAsset(
             sourceObj=aData.ridgeEnd_source,
             name='端头盘子',
             location=frontRidgeCurve.location,
             parentObj=tileRootObj,
-            singleUser=True)
-        # 根据斗口调整尺度
-        utils.resizeObj(ridgeEndObj,
-            bData.DK / con.DEFAULT_DK)
-        # 应用缩放，以便平铺到曲线长度
-        utils.applyTransfrom(
-            ridgeEndObj,use_scale=True)
-        ridgeEnd_Length = ridgeEndObj.dimensions.x
+            dk=bData.DK)
+        ridgeEnd_Length = utils.getDimensions(ridgeEndObj).x
         # 沿垂脊曲线变形，适配曲线仰角
         modCurve: bpy.types.CurveModifier = \
             ridgeEndObj.modifiers.new('曲线变形','CURVE')
@@ -1933,7 +2141,7 @@ def __buildFrontRidge(buildingObj: bpy.types.Object,
 
             # 给垂脊兽后留出跑兽的空间
             ridgeUnit: bpy.types.Object= aData.ridgeFront_source
-            ridgeUnit_Length = (ridgeUnit.dimensions.x 
+            ridgeUnit_Length = (utils.getDimensions(ridgeUnit).x 
                 * (bData.DK/con.DEFAULT_DK))
             paoLength = (ridgeEnd_Length 
                 + ridgeUnit_Length * bData.paoshou_count)
@@ -1965,8 +2173,8 @@ def __buildSideTile(buildingObj: bpy.types.Object,
         buildingObj,con.ACA_TYPE_TILE_ROOT
     )
     eaveTile:bpy.types.Object = aData.eaveTile_source
-    eaveTileWidth = eaveTile.dimensions.x
-    eaveTileLength = eaveTile.dimensions.y
+    eaveTileWidth = utils.getDimensions(eaveTile).x
+    eaveTileLength = utils.getDimensions(eaveTile).y
     
     # 构造排山滴水
     sideRidgeCurve = __drawSideRidgeCurve(
@@ -2008,7 +2216,7 @@ def __buildSideTile(buildingObj: bpy.types.Object,
                 0,
                 (
                 sideRidgeCurve.location.z 
-                + sideRidgeCurve.dimensions.z)
+                + utils.getDimensions(sideRidgeCurve).z)
             ),
         parentObj=tileRootObj,
         singleUser=True)
@@ -2086,7 +2294,7 @@ def __buildSideTile(buildingObj: bpy.types.Object,
     # 与山花板类似，裁剪到博脊上皮
     # 即，从正心桁上推瓦面+收山加斜+博脊高
     ridgeObj:bpy.types.Object = aData.ridgeFront_source
-    ridgeHeight = ridgeObj.dimensions.z * dk/con.DEFAULT_DK
+    ridgeHeight = utils.getDimensions(ridgeObj).z * dk/con.DEFAULT_DK
     cutPoint = rafter_pos[0] \
         + Vector((0,0,
             + bData.shoushan/2         # 收山按五举加斜
@@ -2249,19 +2457,13 @@ def __buildCornerRidge(buildingObj:bpy.types.Object,
         buildingObj,rafter_pos,cornerRidgeName+'线')
     
     # 垂脊兽前摆放端头盘子
-    ridgeEndObj = utils.copyObject(
+    ridgeEndObj = assetCache.copyAsset(
             sourceObj=aData.ridgeEnd_source,
             name='端头盘子',
             location=cornerRidgeCurve.location,
             parentObj=tileRootObj,
-            singleUser=True)
-    # 根据斗口调整尺度
-    utils.resizeObj(ridgeEndObj,
-        bData.DK / con.DEFAULT_DK)
-    # 应用缩放，以便平铺到曲线长度
-    utils.applyTransfrom(
-        ridgeEndObj,use_scale=True)
-    ridgeEnd_Length = ridgeEndObj.dimensions.x
+            dk=bData.DK)
+    ridgeEnd_Length = utils.getDimensions(ridgeEndObj).x
     # 沿垂脊曲线变形，适配曲线仰角
     modCurve: bpy.types.CurveModifier = \
         ridgeEndObj.modifiers.new('曲线变形','CURVE')
@@ -2299,7 +2501,7 @@ def __buildCornerRidge(buildingObj:bpy.types.Object,
                         ridgeName=cornerRidgeName+'兽后')
         # 留出跑兽的空间
         ridgeUnit: bpy.types.Object= aData.ridgeFront_source
-        ridgeUnit_Length = ridgeUnit.dimensions.x * (bData.DK/con.DEFAULT_DK)
+        ridgeUnit_Length = utils.getDimensions(ridgeUnit).x * (bData.DK/con.DEFAULT_DK)
         paoLength = (ridgeEnd_Length
             + ridgeUnit_Length * bData.paoshou_count)
         cornerRidgeAfterObj.location.x += paoLength +ridgeUnit_Length
@@ -2396,7 +2598,7 @@ def __buildSideRidge(buildingObj:bpy.types.Object,
         buildingObj,con.ACA_TYPE_TILE_ROOT
     )
     ridgeObj:bpy.types.Object = aData.ridgeFront_source
-    ridgeLength = ridgeObj.dimensions.x * dk/con.DEFAULT_DK
+    ridgeLength = utils.getDimensions(ridgeObj).x * dk/con.DEFAULT_DK
     
     # 博脊定位
     # X坐标：从山花中线，向外山花板厚度
@@ -2506,6 +2708,7 @@ def __buildRidge(buildingObj: bpy.types.Object,
 
 # 对外的统一调用接口
 # 一次性重建所有的瓦做
+@buildTrace.traced()
 def buildTile(buildingObj: bpy.types.Object):
     # 添加或清空根节点
     __setTileRoot(buildingObj)
@@ -2516,11 +2719,11 @@ def buildTile(buildingObj: bpy.types.Object):
 
     # 自动计算瓦垄长宽，不再需要用户输入
     bData['tile_width'] = (
-        aData.dripTile_source.dimensions.x
+        utils.getDimensions(aData.dripTile_source).x
         * (bData.DK / con.DEFAULT_DK)
     )
     bData['tile_length'] = (
-        aData.circularTile_source.dimensions.y
+        utils.getDimensions(aData.circularTile_source).y
         * (bData.DK / con.DEFAULT_DK)
     )
 
@@ -2573,6 +2776,10 @@ def buildTile(buildingObj: bpy.types.Object):
     utils.outputMsg("Building Ridge...")
     __buildRidge(buildingObj,rafter_pos)
 
+    # 记录瓦作层的参数，用于后续的分层重建
+    buildLayers.markBuilt(buildingObj,
+        buildLayers.getLayerProps((buildLayers.LAYER_TILES,)))
+
     # 重新聚焦根节点
     utils.focusObj(buildingObj)
 
@@ -0,0 +1,205 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   营造过程的分阶段计时
+#   原来仅能通过outputMsg的时间戳估算耗时，无法看到嵌套的子过程
+#   这里以span记录每个阶段（柱网、额枋、台基、装修、斗栱、梁架、椽望、瓦作等）
+#   及其子阶段的耗时、新增/删除的对象数量、新增网格的顶点数和面数
+#   结果可输出为JSON，以及chrome://tracing或Perfetto可直接打开的trace_event格式
+#   默认关闭，关闭时装饰器直接调用原函数，不产生额外开销
+import bpy
+import os
+import json
+import time
+import pathlib
+import functools
+from contextlib import contextmanager
+
+from . import utils
+
+# 是否记录
+__enabled = False
+# 已完成的顶层span
+__spans = []
+# 正在执行的span
+__stack = []
+# 计时起点
+__origin = [0.0]
+
+# 开启或关闭记录
+def enable(isEnable=True):
+    global __enabled
+    __enabled = isEnable
+    return
+
+def isEnabled():
+    return __enabled
+
+# 清空记录，开始新的一次计时
+def reset():
+    __spans.clear()
+    __stack.clear()
+    __origin[0] = time.perf_counter()
+    return
+
+# 场景中对象的快照，用于统计新增和删除的对象
+def __snapshot():
+    return {obj.as_pointer():obj for obj in bpy.data.objects}
+
+# 统计新增对象的网格规模
+def __countMesh(objList):
+    verts = faces = 0
+    for obj in objList:
+        if obj.type == 'MESH' and obj.data != None:
+            verts += len(obj.data.vertices)
+            faces += len(obj.data.polygons)
+    return verts,faces
+
+# 记录一个阶段
+# 用法：with buildTrace.span('buildTile'): ...
+# args为附加信息，如建筑名称，会一并输出
+@contextmanager
+def span(name,**args):
+    if not __enabled:
+        yield None
+        return
+
+    before = __snapshot()
+    record = {
+        'name' : name,
+        'start' : time.perf_counter() - __origin[0],
+        'duration' : 0.0,
+        'objects_created' : 0,
+        'objects_removed' : 0,
+        'verts' : 0,
+        'faces' : 0,
+        'args' : args,
+        'counters' : {},
+        'children' : [],
+    }
+    __stack.append(record)
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = str(e)
+        raise
+    finally:
+        __stack.pop()
+        record['duration'] = (time.perf_counter() - __origin[0]
+                              - record['start'])
+        after = __snapshot()
+        created = [after[key] for key in after.keys() - before.keys()]
+        record['objects_created'] = len(created)
+        record['objects_removed'] = len(before.keys() - after.keys())
+        # 新增对象可能在后续阶段被删除，需在快照时立即统计
+        record['verts'],record['faces'] = __countMesh(created)
+        if len(__stack) > 0:
+            __stack[-1]['children'].append(record)
+        else:
+            __spans.append(record)
+
+# 累加计数，如瓦片数量、柱子数量
+# 计入当前阶段及所有上层阶段，顶层阶段即为整次营造的合计
+def count(key,n=1):
+    if not __enabled:
+        return
+    for record in __stack:
+        record['counters'][key] = record['counters'].get(key,0) + n
+    return
+
+# 装饰器，以函数名记录阶段
+# 用法：@buildTrace.traced()
+def traced(name=None):
+    def decorator(func):
+        spanName = name if name != None else func.__name__
+        @functools.wraps(func)
+        def wrapper(*args,**kwargs):
+            if not __enabled:
+                return func(*args,**kwargs)
+            with span(spanName):
+                return func(*args,**kwargs)
+        return wrapper
+    return decorator
+
+# 获取记录结果
+def getSpans():
+    return list(__spans)
+
+# 转换为chrome的trace_event格式
+# https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+def __toTraceEvents(spans,events):
+    for record in spans:
+        args = dict(record['args'])
+        args.update(record['counters'])
+        for key in ('objects_created','objects_removed','verts','faces'):
+            args[key] = record[key]
+        if 'error' in record:
+            args['error'] = record['error']
+        events.append({
+            'name' : record['name'],
+            'cat' : 'build',
+            'ph' : 'X',
+            'ts' : round(record['start']*1e6,1),
+            'dur' : round(record['duration']*1e6,1),
+            'pid' : 1,
+            'tid' : 1,
+            'args' : args,
+        })
+        __toTraceEvents(record['children'],events)
+    return events
+
+# 默认输出目录，与日志文件在同一目录
+def getTraceFolder():
+    USER = pathlib.Path(
+        bpy.utils.resource_path('USER'))
+    return str(USER / "scripts/addons/ACA Builder")
+
+# 输出JSON，保留span的嵌套层次
+def writeJson(path):
+    with open(path,'w',encoding='utf-8') as f:
+        json.dump({'spans':__spans},f,ensure_ascii=False,indent=1)
+    return
+
+# 输出chrome的trace_event格式
+def writeChromeTrace(path):
+    events = __toTraceEvents(__spans,[])
+    with open(path,'w',encoding='utf-8') as f:
+        json.dump({'traceEvents':events,
+                   'displayTimeUnit':'ms'},
+                  f,ensure_ascii=False)
+    return
+
+# 在控制台输出各阶段的耗时汇总
+def __outputSummary(spans,depth=0):
+    for record in spans:
+        utils.outputMsg("%s%s: %.3fs, +%d/-%d obj, %d verts" % (
+            '  '*depth,
+            record['name'],
+            record['duration'],
+            record['objects_created'],
+            record['objects_removed'],
+            record['verts']))
+        # 仅汇总到第二层，详细内容见输出文件
+        if depth < 1:
+            __outputSummary(record['children'],depth+1)
+    return
+
+# 营造结束后输出记录
+# 返回输出的文件路径，输出失败时返回None
+def finish(folder=None,name='aca_trace'):
+    if not __enabled or len(__spans) == 0:
+        return None
+    if folder == None:
+        folder = getTraceFolder()
+    jsonPath = os.path.join(folder,name + '.json')
+    chromePath = os.path.join(folder,name + '.chrome.json')
+    __outputSummary(__spans)
+    # 在营造的finally中调用，输出失败不能影响营造的结果
+    try:
+        writeJson(jsonPath)
+        writeChromeTrace(chromePath)
+    except OSError as e:
+        utils.outputMsg("营造计时输出失败：" + str(e))
+        return None
+    utils.outputMsg("营造计时已输出：" + chromePath)
+    return jsonPath,chromePath
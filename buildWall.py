@@ -11,6 +11,7 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import buildDoor
 from . import buildFloor
 from . import texture as mat
@@ -209,7 +210,7 @@ def __drawWall(wallProxy:bpy.types.Object):
     bData:acaData = buildingObj.ACA_data
     aData:tmpData = bpy.context.scene.ACA_temp
     dk = bData.DK
-    (wallLength,wallDeepth,wallHeight) = wallProxy.dimensions
+    (wallLength,wallDeepth,wallHeight) = utils.getDimensions(wallProxy)
     # 覆盖墙体厚度
     wallDeepth = con.WALL_DEPTH * bData.piller_diameter
     # 退花碱厚度
@@ -502,6 +503,7 @@ def delWall(buildingObj:bpy.types.Object,
 # 用户的个性化设置丢失
 # 按照默认设计参数生成
 # todo：后续可以按照模板中的设置生成（包含预设的个性化设置）
+@buildTrace.traced()
 def buildWallLayout(buildingObj:bpy.types.Object):
     # 载入数据
     bData:acaData = buildingObj.ACA_data
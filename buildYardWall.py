@@ -11,6 +11,7 @@ from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import buildTrace
 from . import template
 from . import texture as mat
 
@@ -44,16 +45,16 @@ def __arrayTile(
     bData:acaData = buildingObj.ACA_data
     aData:tmpData = bpy.context.scene.ACA_temp
     # 墙体的长宽高，以wallproxy为依据
-    (wallLength,wallDeepth,wallHeight) = wallProxy.dimensions
+    (wallLength,wallDeepth,wallHeight) = utils.getDimensions(wallProxy)
 
     # 瓦件缩放，当前设置的斗口与默认斗口
     tileScale = bData.DK / con.DEFAULT_DK
     # 垄距，以最宽的滴水瓦为参考
-    colWidth = aData.dripTile_source.dimensions.x * tileScale
+    colWidth = utils.getDimensions(aData.dripTile_source).x * tileScale
     # 取可以整数排布的垄距
     colWidth = wallLength/math.floor(wallLength/colWidth)
     # 行距，以筒瓦长度为参考
-    rowHeight = aData.circularTile_source.dimensions.y * tileScale
+    rowHeight = utils.getDimensions(aData.circularTile_source).y * tileScale
 
     # 导入瓦片对象
     tileObj = utils.copyObject(
@@ -112,10 +113,10 @@ def buildSingleWall(
     # 如果要四角融合，则适当延长瓦面
     if use_cut:
         cutExtend = 0.22    # 改变这个值，可以看到转角合并的瓦的变化
-        wallProxy.dimensions.x += cutExtend*2
+        utils.setDimensions(wallProxy,x=utils.getDimensions(wallProxy).x + cutExtend*2)
         utils.applyTransfrom(wallProxy,use_scale=True)
     # 墙体的长宽高，以wallproxy为依据
-    (wallLength,wallDeepth,wallHeight) = wallProxy.dimensions
+    (wallLength,wallDeepth,wallHeight) = utils.getDimensions(wallProxy)
 
     # 1、创建下碱对象
     height = wallHeight * con.WALL_BOTTOM_RATE
@@ -156,7 +157,7 @@ def buildSingleWall(
     # 瓦件缩放
     tileScale = bData.DK / con.DEFAULT_DK
     # 垄距
-    colWidth = aData.dripTile_source.dimensions.x * tileScale
+    colWidth = utils.getDimensions(aData.dripTile_source).x * tileScale
     # 取可以整数排布的垄距
     colWidth = wallLength / math.floor(wallLength/colWidth)
     
@@ -231,7 +232,7 @@ def buildSingleWall(
 
     # 5、正脊 
     # 正脊长度，与瓦顶的出梢匹配
-    bofengWidth = aData.bofeng_source.dimensions.y\
+    bofengWidth = utils.getDimensions(aData.bofeng_source).y\
                      * tileScale*0.5
     ridgeLength = wallLength + bofengWidth
     # 正脊高度，根据瓦顶斜率计算，略作微调
@@ -246,13 +247,13 @@ def buildSingleWall(
     utils.resizeObj(ridgeObj,
         bData.DK / con.DEFAULT_DK)
     # 脊筒在正脊长度上整数排布，微调其长度
-    ridgeWidth = ridgeObj.dimensions.x
+    ridgeWidth = utils.getDimensions(ridgeObj).x
     # 计算墙的长度，至少铺几片正脊
     count = math.floor(ridgeLength/ridgeWidth)
     # 每段平铺长度
     span = ridgeLength / count
     # 缩放墙檐宽度
-    ridgeObj.dimensions.x = span
+    utils.setDimensions(ridgeObj,x=span)
     utils.applyTransfrom(ridgeObj,use_scale=True)
     # 定位正脊排布起点
     ridgeObj.location = (
@@ -272,23 +273,23 @@ def buildSingleWall(
         name="墙檐",
         parentObj=wallProxy,
         singleUser=True)
-    walleaveWidth = walleaveObj.dimensions.x
+    walleaveWidth = utils.getDimensions(walleaveObj).x
     # 墙檐宽度默认按1米厚度制作的模板asset，这里根据墙厚度缩放
     walleaveObj.scale.y = bData.yardwall_depth
     # 墙檐定位，从墙顶部，下移一个瓦当取斜，再下移一个墙檐
     eaveTileOffset = (
-        aData.eaveTile_source.dimensions.y
+        utils.getDimensions(aData.eaveTile_source).y
         * bData.DK / con.DEFAULT_DK) * math.sin(tileAngle)
     walleaveZ = (wallHeight/2 
                  - eaveTileOffset
-                 - walleaveObj.dimensions.z)
+                 - utils.getDimensions(walleaveObj).z)
     # 计算平铺
     # 计算墙的长度，至少铺几片墙檐
     count = math.floor(wallLength/walleaveWidth)
     # 每段平铺长度
     span = wallLength/count
     # 缩放墙檐宽度
-    walleaveObj.dimensions.x = span*0.99    #留出一些间隙
+    utils.setDimensions(walleaveObj,x=span*0.99)    #留出一些间隙
     utils.applyTransfrom(walleaveObj,use_scale=True)
     # 根据缩放结果，摆放起始位置
     walleaveObj.location = (
@@ -333,6 +334,7 @@ def buildSingleWall(
 
     return
 
+@buildTrace.traced()
 def buildYardWall(buildingObj:bpy.types.Object,
                   templateName = None,
                   reloadAssets = False):
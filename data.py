@@ -10,6 +10,7 @@ from functools import partial
 
 from .const import ACA_Consts as con
 from . import utils
+from . import updateScheduler
 
 # 初始化自定义属性
 def initprop():
@@ -49,10 +50,11 @@ def update_building(self, context:bpy.types.Context):
     buildingObj,bdata,odata = utils.getRoot(context.object)
     if buildingObj != None:
         from . import build
-        funproxy = partial(
+        # 250402 拖动滑块时合并连续的修改，停止后仅重建一次
+        # 仅重建修改参数影响的构件层
+        updateScheduler.schedule(buildingObj,
                 build.updateBuilding,
-                buildingObj=buildingObj)
-        utils.fastRun(funproxy)
+                incremental=True)
     else:
         utils.outputMsg("updated building failed, context.object should be buildingObj")
     return
@@ -133,10 +135,8 @@ def update_piller(self, context:bpy.types.Context):
         # 缩放柱形
         from . import buildFloor
         # buildFloor.resizePiller(buildingObj)
-        funproxy = partial(
-                buildFloor.resizePiller,
-                buildingObj=buildingObj)
-        utils.fastRun(funproxy)
+        updateScheduler.schedule(buildingObj,
+                buildFloor.resizePiller)
     else:
         utils.outputMsg("updated piller failed, context should be pillerObj")
     return
@@ -237,10 +237,10 @@ def update_dougong(self, context:bpy.types.Context):
         
         # 241125 修改斗栱时，涉及到柱高的变化，最好是全屋更新
         from . import build
-        funproxy = partial(
+        # 仅重建修改参数影响的构件层
+        updateScheduler.schedule(buildingObj,
                 build.updateBuilding,
-                buildingObj=buildingObj)
-        utils.fastRun(funproxy)
+                incremental=True)
     else:
         utils.outputMsg("updated dougong failed, context.object should be buildingObj")
     return
@@ -251,18 +251,16 @@ def update_roof(self, context:bpy.types.Context):
     if not isRebuild:
         return
     
-    # 手动将操作添加到撤销栈
-    bpy.ops.ed.undo_push(message="Float Property Update")
-    
     # 确认选中为building节点
     buildingObj,bData,oData = utils.getRoot(context.object)
     if buildingObj != None:
         from . import build
         # 重新生成屋顶
-        funproxy = partial(
+        # 250402 原来每次回调都手动添加撤销栈，拖动滑块时会产生大量撤销步骤
+        # 改为在合并后的重建完成后，仅添加一次
+        updateScheduler.schedule(buildingObj,
             build.resetRoof,
-            buildingObj=buildingObj)
-        utils.fastRun(funproxy)
+            undoMsg="Float Property Update")
     else:
         utils.outputMsg("updated platform failed, context.object should be buildingObj")
     return
@@ -296,10 +294,8 @@ def update_rooftile(self, context:bpy.types.Context):
     if buildingObj != None:
         from . import buildRooftile
         # 重新生成屋顶
-        funproxy = partial(
-            buildRooftile.buildTile,
-            buildingObj=buildingObj)
-        utils.fastRun(funproxy)
+        updateScheduler.schedule(buildingObj,
+            buildRooftile.buildTile)
     else:
         utils.outputMsg("updated platform failed, context.object should be buildingObj")
     return
@@ -787,6 +783,12 @@ class ACA_data_obj(bpy.types.PropertyGroup):
                # ("2","紫琉璃",""),
             ],
         ) # type: ignore
+    use_tile_instance : bpy.props.BoolProperty(
+            default=False,
+            name="瓦片实例化",
+            description="以几何节点实例方式摆放瓦片，可大幅减少场景中的顶点数量，合并或导出时自动实体化",
+            update=update_rooftile,
+        ) # type: ignore
     tile_width : bpy.props.FloatProperty(
             name="瓦垄宽度", 
             default=0.4,
@@ -895,6 +897,13 @@ class ACA_data_scene(bpy.types.PropertyGroup):
             name = "是否实时重绘",
             description = "取消后，生成过程中不进行刷新，直到全部生成后才显示",
         ) # type: ignore
+    redraw_rate : bpy.props.IntProperty(
+            default = 4,
+            min = 1,
+            max = 30,
+            name = "每秒刷新次数",
+            description = "生成过程中每秒最多刷新界面的次数，次数越少生成越快",
+        ) # type: ignore
     is_auto_viewall : bpy.props.BoolProperty(
             default = True,
             name = "是否设置视角",
@@ -905,6 +914,24 @@ class ACA_data_scene(bpy.types.PropertyGroup):
             name = "是否实时重建",
             description = "取消后，在大部分参数修改时，不会自动重建，直到手工点击更新建筑",
         ) # type: ignore
+    is_build_trace : bpy.props.BoolProperty(
+            default = False,
+            name = "是否记录营造耗时",
+            description = "开启后，记录各阶段的耗时和对象数量，输出到插件目录的aca_trace.json",
+        ) # type: ignore
+    is_ops_trace : bpy.props.BoolProperty(
+            default = False,
+            name = "是否统计bpy.ops",
+            description = "开启后，统计营造过程中各个bpy.ops的调用次数和耗时，输出到插件目录的aca_ops.json",
+        ) # type: ignore
+    update_delay : bpy.props.FloatProperty(
+            default = 0.3,
+            min = 0.0,
+            max = 3.0,
+            precision = 2,
+            name = "重建延迟(秒)",
+            description = "拖动滑块时，停止修改该时间后才重建，期间的连续修改合并为一次重建，设为0则每次修改立即重建",
+        ) # type: ignore
     # template原来提供给模板下拉框使用，现在改为列表，则不再使用该属性
     # template : bpy.props.EnumProperty(
     #         name = "样式列表",
@@ -0,0 +1,137 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   反复重建时的数据泄漏检测
+#   同一个建筑在会话中反复重建后，blender会越来越慢、文件越来越大
+#   这里以build.updateBuilding重复重建K次，每次记录各类数据块的数量
+#   和python内存分配（tracemalloc），找出随重建次数持续增长的数据类型，
+#   并列出泄漏的数据块名称和python分配位置
+#   第一次重建会填充资产缓存等，视为预热，不计入增长
+import bpy
+import tracemalloc
+
+from . import utils
+from . import build
+
+# 检查的数据块类型
+DATA_TYPES = (
+    'objects',
+    'meshes',
+    'materials',
+    'curves',
+    'images',
+    'node_groups',
+    'collections',
+)
+# python内存每次重建增长超过该字节数时视为泄漏
+MALLOC_THRESHOLD = 64*1024
+# 列出的python分配位置条数
+MALLOC_TOP = 10
+# 列出的泄漏数据块名称条数
+NAME_TOP = 20
+
+# 记录当前的数据块名称和python内存
+def __snapshot():
+    snapshot = {}
+    for dataType in DATA_TYPES:
+        collection = getattr(bpy.data,dataType)
+        snapshot[dataType] = set(item.name for item in collection)
+    snapshot['malloc'] = tracemalloc.take_snapshot()
+    return snapshot
+
+# 是否持续增长：预热后每次都不减少，且最终多于预热后
+def __isGrowing(counts):
+    if len(counts) < 3:
+        return False
+    counts = counts[1:]
+    for n in range(1,len(counts)):
+        if counts[n] < counts[n-1]:
+            return False
+    return counts[-1] > counts[0]
+
+# 重复重建并检测泄漏
+# 返回报告dict
+def runLeakCheck(buildingObj:bpy.types.Object,cycles=5):
+    buildingName = buildingObj.name
+    isTracing = tracemalloc.is_tracing()
+    if not isTracing:
+        tracemalloc.start()
+
+    snapshots = []
+    history = {dataType:[] for dataType in DATA_TYPES}
+    history['malloc'] = []
+    try:
+        for n in range(cycles):
+            # 重建后，原对象引用可能失效，按名称重新获取
+            buildingObj = bpy.data.objects[buildingName]
+            result = utils.fastRun(
+                lambda:build.updateBuilding(buildingObj))
+            if 'FINISHED' not in result:
+                raise Exception(str(result.get('CANCELLED')))
+            snapshot = __snapshot()
+            snapshots.append(snapshot)
+            for dataType in DATA_TYPES:
+                history[dataType].append(len(snapshot[dataType]))
+            current,peak = tracemalloc.get_traced_memory()
+            history['malloc'].append(current)
+            utils.outputMsg("泄漏检测：第%d次重建，%s" % (n+1,
+                ', '.join('%s=%d' % (t,history[t][-1])
+                          for t in DATA_TYPES)))
+    finally:
+        if not isTracing:
+            tracemalloc.stop()
+
+    report = {
+        'building' : buildingName,
+        'cycles' : cycles,
+        'history' : history,
+        'leaks' : {},
+        'malloc' : None,
+    }
+    if cycles < 3:
+        return report
+
+    # 数据块：预热后新增、且在最后仍存在的名称
+    warm = snapshots[0]
+    last = snapshots[-1]
+    for dataType in DATA_TYPES:
+        if __isGrowing(history[dataType]):
+            names = sorted(last[dataType] - warm[dataType])
+            report['leaks'][dataType] = {
+                'perCycle' : round((history[dataType][-1]
+                                    - history[dataType][1])
+                                   / (cycles-2),2),
+                'names' : names[:NAME_TOP],
+            }
+
+    # python内存：预热后的平均每次增长
+    mallocGrowth = ((history['malloc'][-1] - history['malloc'][1])
+                    / (cycles-2))
+    if mallocGrowth > MALLOC_THRESHOLD:
+        stats = last['malloc'].compare_to(
+            snapshots[1]['malloc'],'lineno')
+        report['malloc'] = {
+            'perCycle' : int(mallocGrowth),
+            'top' : [{
+                'location' : str(stat.traceback),
+                'sizeDiff' : stat.size_diff,
+                'countDiff' : stat.count_diff,
+            } for stat in stats[:MALLOC_TOP] if stat.size_diff > 0],
+        }
+    return report
+
+# 输出检测报告
+def outputReport(report):
+    if len(report['leaks']) == 0 and report['malloc'] == None:
+        utils.outputMsg("泄漏检测：%d次重建后未发现持续增长" % report['cycles'])
+        return
+    for dataType,leak in report['leaks'].items():
+        utils.outputMsg("泄漏检测：%s 每次重建增加%.1f个：%s" % (
+            dataType,leak['perCycle'],', '.join(leak['names'])))
+    if report['malloc'] != None:
+        utils.outputMsg("泄漏检测：python内存每次重建增加%.1fKB" % (
+            report['malloc']['perCycle']/1024))
+        for item in report['malloc']['top']:
+            utils.outputMsg("  %s: +%.1fKB" % (
+                item['location'],item['sizeDiff']/1024))
+    return
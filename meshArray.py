@@ -0,0 +1,574 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   基于numpy数组的网格批量读写
+#   通过foreach_get/foreach_set一次性读写整个网格，
+#   避免逐个复制对象、再用bpy.ops.object.join合并的开销
+#   网格数据以dict传递，包括以下键值：
+#   co          (V,3)   顶点坐标
+#   edges       (E,2)   边的顶点索引
+#   loopVerts   (L,)    loop的顶点索引
+#   loopEdges   (L,)    loop的边索引
+#   loopStart   (P,)    面的起始loop
+#   loopTotal   (P,)    面的loop数量
+#   matIndex    (P,)    面的材质编号
+#   smooth      (P,)    面是否平滑
+#   uv          (L,2)   UV坐标，可能为None
+#   sharpEdge   (E,)    锐边标记，可能为None
+#   seam        (E,)    UV缝合边标记，可能为None
+#   materials   []      材质列表，与matIndex对应
+#   另提供圆柱、平面、棱柱、放样等基本几何体的网格数组，
+#   替代bpy.ops.mesh.primitive_*_add
+
+import bpy
+import bmesh
+import numpy as np
+
+# 从mesh中读取网格数组
+def getMeshArrays(mesh:bpy.types.Mesh):
+    vCount = len(mesh.vertices)
+    eCount = len(mesh.edges)
+    lCount = len(mesh.loops)
+    pCount = len(mesh.polygons)
+
+    co = np.empty(vCount*3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    edges = np.empty(eCount*2, dtype=np.int32)
+    mesh.edges.foreach_get('vertices', edges)
+    loopVerts = np.empty(lCount, dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loopVerts)
+    loopEdges = np.empty(lCount, dtype=np.int32)
+    mesh.loops.foreach_get('edge_index', loopEdges)
+    loopStart = np.empty(pCount, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', loopStart)
+    loopTotal = np.empty(pCount, dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', loopTotal)
+    matIndex = np.empty(pCount, dtype=np.int32)
+    mesh.polygons.foreach_get('material_index', matIndex)
+    smooth = np.empty(pCount, dtype=bool)
+    mesh.polygons.foreach_get('use_smooth', smooth)
+
+    # UV仅取活跃的UV层
+    uv = None
+    uvLayer = mesh.uv_layers.active
+    if uvLayer != None:
+        uv = np.empty(lCount*2, dtype=np.float32)
+        uvLayer.data.foreach_get('uv', uv)
+        uv = uv.reshape((-1,2))
+
+    # 锐边标记，在4.1以后以属性保存
+    sharpEdge = None
+    attr = mesh.attributes.get('sharp_edge')
+    if attr != None and attr.domain == 'EDGE':
+        sharpEdge = np.empty(eCount, dtype=bool)
+        attr.data.foreach_get('value', sharpEdge)
+
+    # UV缝合边，仅在有标记时保留
+    seam = np.empty(eCount, dtype=bool)
+    mesh.edges.foreach_get('use_seam', seam)
+    if not seam.any():
+        seam = None
+
+    return {
+        'co' : co.reshape((-1,3)).astype(np.float64),
+        'edges' : edges.reshape((-1,2)),
+        'loopVerts' : loopVerts,
+        'loopEdges' : loopEdges,
+        'loopStart' : loopStart,
+        'loopTotal' : loopTotal,
+        'matIndex' : matIndex,
+        'smooth' : smooth,
+        'uv' : uv,
+        'sharpEdge' : sharpEdge,
+        'seam' : seam,
+        'materials' : list(mesh.materials),
+    }
+
+# 将网格数组写入一个新的mesh
+def newMeshByArrays(arrays,name='mesh'):
+    mesh = bpy.data.meshes.new(name)
+    co = arrays['co']
+    edges = arrays['edges']
+    loopVerts = arrays['loopVerts']
+    loopStart = arrays['loopStart']
+
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set(
+        'co', np.ascontiguousarray(co,dtype=np.float32).ravel())
+    mesh.edges.add(len(edges))
+    mesh.edges.foreach_set(
+        'vertices', np.ascontiguousarray(edges,dtype=np.int32).ravel())
+    mesh.loops.add(len(loopVerts))
+    mesh.loops.foreach_set(
+        'vertex_index', np.ascontiguousarray(loopVerts,dtype=np.int32))
+    mesh.loops.foreach_set(
+        'edge_index', np.ascontiguousarray(
+            arrays['loopEdges'],dtype=np.int32))
+    # 4.0以后loop_total由loop_start推算，为只读属性
+    mesh.polygons.add(len(loopStart))
+    mesh.polygons.foreach_set(
+        'loop_start', np.ascontiguousarray(loopStart,dtype=np.int32))
+    mesh.polygons.foreach_set(
+        'material_index', np.ascontiguousarray(
+            arrays['matIndex'],dtype=np.int32))
+    mesh.polygons.foreach_set(
+        'use_smooth', np.ascontiguousarray(arrays['smooth'],dtype=bool))
+
+    if arrays['uv'] is not None:
+        uvLayer = mesh.uv_layers.new(name='UVMap')
+        uvLayer.data.foreach_set(
+            'uv', np.ascontiguousarray(
+                arrays['uv'],dtype=np.float32).ravel())
+
+    if arrays['sharpEdge'] is not None:
+        attr = mesh.attributes.new('sharp_edge','BOOLEAN','EDGE')
+        attr.data.foreach_set(
+            'value', np.ascontiguousarray(arrays['sharpEdge'],dtype=bool))
+
+    if arrays.get('seam') is not None:
+        mesh.edges.foreach_set(
+            'use_seam', np.ascontiguousarray(arrays['seam'],dtype=bool))
+
+    for mat in arrays['materials']:
+        mesh.materials.append(mat)
+
+    mesh.update()
+    return mesh
+
+# 以一组4x4矩阵，批量复制网格
+# 返回合并后的网格数组，所有复制体依次排列
+def instanceArrays(arrays, mats):
+    count = len(mats)
+    co = arrays['co']
+    vCount = len(co)
+    eCount = len(arrays['edges'])
+    lCount = len(arrays['loopVerts'])
+    # 批量坐标变换，(N,V,3)
+    coNew = (np.einsum('nij,vj->nvi', mats[:,:3,:3], co)
+             + mats[:,None,:3,3])
+    # 索引偏移
+    step = np.arange(count)[:,None]
+    edges = (arrays['edges'][None,:,:]
+             + (step*vCount)[:,:,None])
+    loopVerts = arrays['loopVerts'][None,:] + step*vCount
+    loopEdges = arrays['loopEdges'][None,:] + step*eCount
+    loopStart = arrays['loopStart'][None,:] + step*lCount
+
+    uv = arrays['uv']
+    if uv is not None:
+        uv = np.tile(uv,(count,1))
+    sharpEdge = arrays['sharpEdge']
+    if sharpEdge is not None:
+        sharpEdge = np.tile(sharpEdge,count)
+    seam = arrays.get('seam')
+    if seam is not None:
+        seam = np.tile(seam,count)
+
+    return {
+        'co' : coNew.reshape((-1,3)),
+        'edges' : edges.reshape((-1,2)),
+        'loopVerts' : loopVerts.ravel(),
+        'loopEdges' : loopEdges.ravel(),
+        'loopStart' : loopStart.ravel(),
+        'loopTotal' : np.tile(arrays['loopTotal'],count),
+        'matIndex' : np.tile(arrays['matIndex'],count),
+        'smooth' : np.tile(arrays['smooth'],count),
+        'uv' : uv,
+        'sharpEdge' : sharpEdge,
+        'seam' : seam,
+        'materials' : list(arrays['materials']),
+    }
+
+# 合并多个网格数组
+# 材质按出现的先后合并去重，与bpy.ops.object.join的规则一致
+def joinArrays(arraysList):
+    # 空的网格数组也参与材质排序，以保证材质顺序稳定
+    arraysList = [a for a in arraysList if a is not None]
+    materials = []
+    for arrays in arraysList:
+        for mat in arrays['materials']:
+            if mat not in materials:
+                materials.append(mat)
+    arraysList = [a for a in arraysList if len(a['loopStart']) > 0]
+
+    hasUV = any(a['uv'] is not None for a in arraysList)
+    hasSharp = any(a['sharpEdge'] is not None for a in arraysList)
+    hasSeam = any(a.get('seam') is not None for a in arraysList)
+    result = {key:[] for key in (
+        'co','edges','loopVerts','loopEdges','loopStart',
+        'loopTotal','matIndex','smooth','uv','sharpEdge','seam')}
+    vOffset = eOffset = lOffset = 0
+    for arrays in arraysList:
+        result['co'].append(arrays['co'])
+        result['edges'].append(arrays['edges'] + vOffset)
+        result['loopVerts'].append(arrays['loopVerts'] + vOffset)
+        result['loopEdges'].append(arrays['loopEdges'] + eOffset)
+        result['loopStart'].append(arrays['loopStart'] + lOffset)
+        result['loopTotal'].append(arrays['loopTotal'])
+        # 材质编号映射到合并后的材质列表
+        if len(arrays['materials']) > 0:
+            matMap = np.array([materials.index(mat)
+                               for mat in arrays['materials']])
+            matIndex = matMap[np.clip(
+                arrays['matIndex'],0,len(matMap)-1)]
+        else:
+            matIndex = arrays['matIndex']
+        result['matIndex'].append(matIndex)
+        result['smooth'].append(arrays['smooth'])
+        lCount = len(arrays['loopVerts'])
+        eCount = len(arrays['edges'])
+        if hasUV:
+            uv = arrays['uv']
+            if uv is None:
+                uv = np.zeros((lCount,2))
+            result['uv'].append(uv)
+        if hasSharp:
+            sharpEdge = arrays['sharpEdge']
+            if sharpEdge is None:
+                sharpEdge = np.zeros(eCount,dtype=bool)
+            result['sharpEdge'].append(sharpEdge)
+        if hasSeam:
+            seam = arrays.get('seam')
+            if seam is None:
+                seam = np.zeros(eCount,dtype=bool)
+            result['seam'].append(seam)
+        vOffset += len(arrays['co'])
+        eOffset += eCount
+        lOffset += lCount
+
+    if len(arraysList) == 0:
+        return None
+    joined = {}
+    for key,value in result.items():
+        if len(value) == 0:
+            joined[key] = None
+        else:
+            joined[key] = np.concatenate(value)
+    joined['materials'] = materials
+    return joined
+
+# 用平面裁切网格数组，与bpy.ops.mesh.bisect的参数一致
+# 坐标与法线基于网格数组所在的坐标系
+def bisectArrays(arrays,
+                 planeCo,
+                 planeNo,
+                 clearInner=False,
+                 clearOuter=False,
+                 useFill=True):
+    # 借用临时mesh在bmesh中裁切，不产生任何对象
+    mesh = newMeshByArrays(arrays,'bisect.temp')
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    geom = bm.verts[:] + bm.edges[:] + bm.faces[:]
+    result = bmesh.ops.bisect_plane(
+        bm,
+        geom=geom,
+        dist=0.0001,
+        plane_co=planeCo,
+        plane_no=planeNo,
+        clear_inner=clearInner,
+        clear_outer=clearOuter)
+    if useFill:
+        cutEdges = [e for e in result['geom_cut']
+                    if isinstance(e, bmesh.types.BMEdge)
+                    and e.is_valid and e.is_boundary]
+        if cutEdges:
+            fill = bmesh.ops.holes_fill(bm, edges=cutEdges, sides=0)
+            # 封口面沿用相邻面的材质
+            for face in fill['faces']:
+                for edge in face.edges:
+                    linked = [f for f in edge.link_faces if f != face]
+                    if linked:
+                        face.material_index = linked[0].material_index
+                        face.smooth = linked[0].smooth
+                        break
+    bm.to_mesh(mesh)
+    bm.free()
+    result = getMeshArrays(mesh)
+    result['materials'] = list(arrays['materials'])
+    bpy.data.meshes.remove(mesh)
+    return result
+
+# 批量判断平面上的点是否在多边形内（奇偶射线法）
+# points为(N,2)的点集，polygon为(K,2)的多边形顶点
+def pointsInPolygon(points, polygon):
+    x = points[:,0]
+    y = points[:,1]
+    inside = np.zeros(len(points),dtype=bool)
+    xj,yj = polygon[-1]
+    for xi,yi in polygon:
+        # 射线与该边相交
+        isCross = (yi > y) != (yj > y)
+        with np.errstate(divide='ignore',invalid='ignore'):
+            xCross = (xj-xi)*(y-yi)/(yj-yi) + xi
+        inside ^= isCross & (x < xCross)
+        xj,yj = xi,yi
+    return inside
+
+# 对网格数组做一次坐标变换，matrix为4x4矩阵
+def transformArrays(arrays, matrix):
+    mat = np.array(matrix,dtype=np.float64).reshape((1,4,4))
+    return instanceArrays(arrays, mat)
+
+# 按面的顶点列表生成网格数组
+# faces为各个面的顶点索引，边由面推算
+# uv为各loop的UV坐标，与faces展开后的顺序一致
+# seamPairs为需要标记UV缝合的边，以两端的顶点索引表示
+def faceArrays(co,
+               faces,
+               uv=None,
+               seamPairs=None,
+               smooth=False):
+    co = np.asarray(co,dtype=np.float64).reshape((-1,3))
+    loopTotal = np.array([len(face) for face in faces],dtype=np.int32)
+    loopStart = np.zeros(len(faces),dtype=np.int32)
+    loopStart[1:] = np.cumsum(loopTotal)[:-1]
+    loopVerts = np.concatenate(
+        [np.asarray(face,dtype=np.int32) for face in faces])
+    # 每个loop与下一个loop连成一条边，面的最后一个loop回到起点
+    nextLoop = np.arange(len(loopVerts),dtype=np.int32) + 1
+    nextLoop[loopStart + loopTotal - 1] = loopStart
+    pairs = np.sort(np.stack(
+        (loopVerts,loopVerts[nextLoop]),axis=1),axis=1)
+    edges,loopEdges = np.unique(pairs,axis=0,return_inverse=True)
+
+    seam = None
+    if seamPairs is not None and len(seamPairs) > 0:
+        seamPairs = np.sort(np.asarray(seamPairs,dtype=np.int64),axis=1)
+        vCount = len(co)
+        seam = np.isin(edges[:,0].astype(np.int64)*vCount + edges[:,1],
+                       seamPairs[:,0]*vCount + seamPairs[:,1])
+    if uv is not None:
+        uv = np.asarray(uv,dtype=np.float64).reshape((-1,2))
+
+    return {
+        'co' : co,
+        'edges' : edges.astype(np.int32),
+        'loopVerts' : loopVerts,
+        'loopEdges' : loopEdges.reshape(-1).astype(np.int32),
+        'loopStart' : loopStart,
+        'loopTotal' : loopTotal,
+        'matIndex' : np.zeros(len(faces),dtype=np.int32),
+        'smooth' : np.full(len(faces),smooth,dtype=bool),
+        'uv' : uv,
+        'sharpEdge' : None,
+        'seam' : seam,
+        'materials' : [],
+    }
+
+# 将网格平移，使origin成为新的原点
+def __moveOrigin(arrays, origin):
+    if origin is not None:
+        arrays['co'] = arrays['co'] - np.asarray(origin,dtype=np.float64)
+    return arrays
+
+# 各边数的单位圆柱，半径1，高1
+__cylinderCache = {}
+
+# 单位圆柱的网格数组
+# 借用bmesh的create_cone生成，与primitive_cylinder_add的拓扑和UV完全一致，
+# 槫头等从资产中按loop顺序传递UV(join_uvs)，必须保持相同的loop顺序
+def __getUnitCylinder(edgeNum):
+    arrays = __cylinderCache.get(edgeNum)
+    if arrays != None:
+        return arrays
+    bm = bmesh.new()
+    bm.loops.layers.uv.new('UVMap')
+    bmesh.ops.create_cone(bm,
+        cap_ends=True,
+        cap_tris=False,
+        segments=edgeNum,
+        radius1=1,
+        radius2=1,
+        depth=1,
+        calc_uvs=True)
+    mesh = bpy.data.meshes.new('cylinder.temp')
+    bm.to_mesh(mesh)
+    bm.free()
+    arrays = getMeshArrays(mesh)
+    bpy.data.meshes.remove(mesh)
+
+    # 缝合边：上下两圈的边，以及起始点的一条竖边
+    co = arrays['co']
+    edges = arrays['edges']
+    isRing = np.isclose(co[edges[:,0],2],co[edges[:,1],2])
+    firstVert = np.argmax(co[:,1])
+    isFirst = (np.isclose(co[edges[:,0],0],co[firstVert,0])
+               & np.isclose(co[edges[:,1],0],co[firstVert,0])
+               & np.isclose(co[edges[:,0],1],co[firstVert,1])
+               & np.isclose(co[edges[:,1],1],co[firstVert,1]))
+    arrays['seam'] = isRing | isFirst
+    __cylinderCache[edgeNum] = arrays
+    return arrays
+
+# 圆柱，沿Z轴直立，默认原点在几何中心
+# origin为新原点在圆柱坐标系中的位置，如底面中心(0,0,-depth/2)
+# uvSeam为True时，标记上下两圈和一条竖边为缝合边
+def cylinderArrays(radius,
+                   depth,
+                   edgeNum=16,
+                   origin=None,
+                   uvSeam=False):
+    unit = __getUnitCylinder(edgeNum)
+    arrays = dict(unit)
+    arrays['co'] = unit['co'] * (radius,radius,depth)
+    if not uvSeam:
+        arrays['seam'] = None
+    return __moveOrigin(arrays,origin)
+
+# 平面，位于XY平面，法线朝向+Z
+# 顶点、UV与primitive_plane_add一致
+def planeArrays(width,
+                height,
+                origin=None,
+                uvSeam=False):
+    x = width/2
+    y = height/2
+    co = [(-x,-y,0),(x,-y,0),(-x,y,0),(x,y,0)]
+    faces = [(0,1,3,2)]
+    uv = [(0,0),(1,0),(1,1),(0,1)]
+    seamPairs = None
+    if uvSeam:
+        seamPairs = [(0,1),(1,3),(3,2),(2,0)]
+    arrays = faceArrays(co,faces,uv=uv,seamPairs=seamPairs)
+    return __moveOrigin(arrays,origin)
+
+# 直棱柱，底面为XY平面上的多边形，沿Z轴拉伸到zMin~zMax
+# outline为(N,2)的多边形顶点，顺时针、逆时针均可
+# 侧面UV按周长和高度展开，上下底面按XY坐标平铺
+def prismArrays(outline,
+                zMin,
+                zMax,
+                origin=None,
+                uvSeam=False):
+    outline = np.asarray(outline,dtype=np.float64).reshape((-1,2))
+    # 统一为逆时针，保证面的朝向向外
+    x = outline[:,0]
+    y = outline[:,1]
+    area = np.sum(x*np.roll(y,-1) - np.roll(x,-1)*y)
+    if area < 0:
+        outline = outline[::-1]
+    count = len(outline)
+    co = np.concatenate((
+        np.column_stack((outline,np.full(count,zMin))),
+        np.column_stack((outline,np.full(count,zMax)))))
+
+    # 各顶点沿周长的位置
+    segLength = np.linalg.norm(
+        np.roll(outline,-1,axis=0) - outline,axis=1)
+    perimeter = np.concatenate(([0],np.cumsum(segLength)))
+
+    faces = []
+    uv = []
+    # 侧面
+    for n in range(count):
+        m = (n+1) % count
+        faces.append((n,m,count+m,count+n))
+        uv += [(perimeter[n],zMin),(perimeter[n+1],zMin),
+               (perimeter[n+1],zMax),(perimeter[n],zMax)]
+    # 底面，法线朝下
+    faces.append(tuple(range(count-1,-1,-1)))
+    uv += [tuple(outline[n]) for n in range(count-1,-1,-1)]
+    # 顶面，法线朝上
+    faces.append(tuple(range(count,count*2)))
+    uv += [tuple(outline[n]) for n in range(count)]
+
+    seamPairs = None
+    if uvSeam:
+        seamPairs = [(n,(n+1)%count) for n in range(count)]
+        seamPairs += [(count+n,count+(n+1)%count) for n in range(count)]
+        seamPairs.append((0,count))
+    arrays = faceArrays(co,faces,uv=uv,seamPairs=seamPairs)
+    return __moveOrigin(arrays,origin)
+
+# 放样：截面沿路径扫掠
+# path为(N,3)的路径点，应位于以normal为法线的平面内
+# profile为(M,2)的截面，坐标为(路径平面内的侧向,normal方向)
+# 转角处截面沿角平分线放大，保持构件的宽度一致
+# closed为True时路径首尾相接，否则两端封口
+def sweepArrays(path,
+                profile,
+                normal=(0,0,1),
+                closed=False,
+                origin=None,
+                uvSeam=False,
+                smooth=False):
+    path = np.asarray(path,dtype=np.float64).reshape((-1,3))
+    profile = np.asarray(profile,dtype=np.float64).reshape((-1,2))
+    normal = np.asarray(normal,dtype=np.float64)
+    normal = normal/np.linalg.norm(normal)
+    # 截面统一为逆时针，保证面的朝向向外
+    x = profile[:,0]
+    y = profile[:,1]
+    if np.sum(x*np.roll(y,-1) - np.roll(x,-1)*y) < 0:
+        profile = profile[::-1]
+    pCount = len(path)
+    sCount = len(profile)
+
+    # 各段的方向
+    if closed:
+        segments = np.roll(path,-1,axis=0) - path
+    else:
+        segments = path[1:] - path[:-1]
+    segLength = np.linalg.norm(segments,axis=1)
+    tangents = segments/segLength[:,None]
+    # 各点前后两段的方向，开放路径的端点取相邻段
+    if closed:
+        tIn = np.roll(tangents,1,axis=0)
+        tOut = tangents
+    else:
+        tIn = np.concatenate((tangents[:1],tangents))
+        tOut = np.concatenate((tangents,tangents[-1:]))
+    sideIn = np.cross(normal,tIn)
+    sideOut = np.cross(normal,tOut)
+    miter = sideIn + sideOut
+    miter = miter/np.linalg.norm(miter,axis=1)[:,None]
+    # 转角处的放大系数
+    miter = miter/np.sum(miter*sideIn,axis=1)[:,None]
+
+    # (N,M,3)的截面顶点
+    co = (path[:,None,:]
+          + profile[None,:,0,None]*miter[:,None,:]
+          + profile[None,:,1,None]*normal[None,None,:])
+    co = co.reshape((-1,3))
+
+    # UV：U沿路径长度，V沿截面周长
+    pathPos = np.concatenate(([0],np.cumsum(segLength)))
+    profileLength = np.linalg.norm(
+        np.roll(profile,-1,axis=0) - profile,axis=1)
+    profilePos = np.concatenate(([0],np.cumsum(profileLength)))
+
+    faces = []
+    uv = []
+    segCount = pCount if closed else pCount-1
+    for i in range(segCount):
+        i2 = (i+1) % pCount
+        for j in range(sCount):
+            j2 = (j+1) % sCount
+            faces.append((i*sCount+j, i*sCount+j2,
+                          i2*sCount+j2, i2*sCount+j))
+            uv += [(pathPos[i],profilePos[j]),
+                   (pathPos[i],profilePos[j+1]),
+                   (pathPos[i+1],profilePos[j+1]),
+                   (pathPos[i+1],profilePos[j])]
+    if not closed:
+        # 起点封口，法线朝后
+        last = (pCount-1)*sCount
+        faces.append(tuple(range(sCount-1,-1,-1)))
+        uv += [tuple(profile[j]) for j in range(sCount-1,-1,-1)]
+        # 终点封口，法线朝前
+        faces.append(tuple(range(last,last+sCount)))
+        uv += [tuple(profile[j]) for j in range(sCount)]
+
+    seamPairs = None
+    if uvSeam:
+        # 沿路径的一条边，以及起点的一圈截面
+        seamPairs = [(i*sCount,((i+1)%pCount)*sCount)
+                     for i in range(segCount)]
+        seamPairs += [(j,(j+1)%sCount) for j in range(sCount)]
+        if not closed:
+            last = (pCount-1)*sCount
+            seamPairs += [(last+j,last+(j+1)%sCount)
+                          for j in range(sCount)]
+    arrays = faceArrays(co,faces,uv=uv,seamPairs=seamPairs,smooth=smooth)
+    return __moveOrigin(arrays,origin)
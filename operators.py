@@ -14,6 +14,10 @@ from . import build
 from . import buildWall
 from . import buildFloor
 from . import buildDougong
+from . import buildRooftile
+from . import leakCheck
+from . import updateScheduler
+from . import orphanCleanup
 
 # 根据当前选中的对象，聚焦建筑根节点
 class ACA_OT_focusBuilding(bpy.types.Operator):
@@ -31,16 +35,89 @@ class ACA_OT_focusBuilding(bpy.types.Operator):
 
         return {'FINISHED'}
 
+# 分步营造的modal执行
+# 从界面调用时（invoke），每个timer事件执行一层，期间界面保持刷新，
+# 按Esc取消，已完成的层保持完整
+# 从脚本调用时（execute），仍一次执行完成
+# 子类实现getSteps，返回build.buildSteps等生成器，
+# 以及onFinished，输出完成的提示
+class ACA_StepBuildMixin:
+    def invoke(self, context, event):
+        if not build.isFinished:
+            self.report({'WARNING'},"正在营造中，请稍候")
+            return {'CANCELLED'}
+        self._steps = self.getSteps(context)
+        if self._steps == None:
+            return {'FINISHED'}
+        self._timeStart = time.time()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.01,window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            # 关闭生成器，恢复排除的其他建筑和进度状态
+            self._steps.close()
+            self._end(context)
+            message = "营造已取消，已完成的部分保留"
+            utils.outputMsg(message)
+            self.report({'WARNING'},message)
+            # 保留已完成的部分，可以撤销
+            return {'FINISHED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        # 执行一层
+        result = utils.fastRun(lambda:next(self._steps,None))
+        # 发生异常，fastRun已提示
+        if isinstance(result,dict):
+            self._steps.close()
+            self._end(context)
+            return {'CANCELLED'}
+        # 全部完成
+        if result == None:
+            self._end(context)
+            self.onFinished(time.time() - self._timeStart)
+            return {'FINISHED'}
+        # 刷新面板上的进度条
+        for area in context.screen.areas:
+            area.tag_redraw()
+        return {'RUNNING_MODAL'}
+
+    def _end(self, context):
+        context.window_manager.event_timer_remove(self._timer)
+        self._timer = None
+        for area in context.screen.areas:
+            area.tag_redraw()
+        return
+
 # 生成新建筑
 # 所有自动生成的建筑统一放置在项目的“ACA”collection中
 # 每个建筑用一个empty做为parent，进行树状结构的管理
 # 各个建筑之间的设置参数数据隔离，互不影响
 # 用户在场景中选择时，可自动回溯到该建筑
-class ACA_OT_add_building(bpy.types.Operator):
+class ACA_OT_add_building(ACA_StepBuildMixin,bpy.types.Operator):
     bl_idname="aca.add_newbuilding"
     bl_label = "添加新建筑"
     bl_options = {'REGISTER', 'UNDO'}
-    bl_description = '根据选择的样式，自动生成建筑的各个构件'
+    bl_description = '根据选择的样式，自动生成建筑的各个构件，按Esc可中途取消'
+
+    def getSteps(self, context):
+        return build.buildSteps()
+
+    def onFinished(self, runTime):
+        from . import data
+        scnData : data.ACA_data_scene = bpy.context.scene.ACA_data
+        templateList = scnData.templateItem
+        templateIndex = scnData.templateIndex
+        templateName = templateList[templateIndex].name
+
+        message = "从模板样式新建完成！|建筑样式：【%s】 |运行时间：【%.1f秒】" \
+                    % (templateName,runTime)
+        utils.popMessageBox(message)
+        self.report({'INFO'},message)
+        return
 
     def execute(self, context):  
         timeStart = time.time()
@@ -49,37 +126,42 @@ class ACA_OT_add_building(bpy.types.Operator):
         funproxy = partial(build.build)
         result = utils.fastRun(funproxy)
 
-        message=''
-        type = {'INFO'}
         if 'FINISHED' in result:
-            from . import data
-            scnData : data.ACA_data_scene = bpy.context.scene.ACA_data
-            templateList = scnData.templateItem
-            templateIndex = scnData.templateIndex
-            templateName = templateList[templateIndex].name
-
-            runTime = time.time() - timeStart
-            message = "从模板样式新建完成！|建筑样式：【%s】 |运行时间：【%.1f秒】" \
-                        % (templateName,runTime)
-        
-        if message != '':
-            utils.popMessageBox(message)
-            self.report(type,message)
+            self.onFinished(time.time() - timeStart)
         return {'FINISHED'}
 
-# 更新建筑
-class ACA_OT_update_building(bpy.types.Operator):
+class ACA_OT_update_building(ACA_StepBuildMixin,bpy.types.Operator):
     bl_idname="aca.update_building"
     bl_label = "添加新建筑"
     bl_options = {'REGISTER', 'UNDO'}
-    bl_description = '根据参数的修改，重新生成建筑'
+    bl_description = '根据参数的修改，重新生成建筑，按Esc可中途取消'
+
+    def getSteps(self, context):
+        buildingObj,bData,objData = utils.getRoot(context.object)
+        if buildingObj == None:
+            utils.popMessageBox("此对象并非插件生成，或已经合并，无法操作。")
+            return None
+        self.buildingName = buildingObj.name
+        # 整体重建已包括等待中的重建
+        updateScheduler.cancel(buildingObj)
+        return build.updateBuildingSteps(buildingObj,
+                    reloadAssets=True)
+
+    def onFinished(self, runTime):
+        message = "更新建筑完成！|建筑样式：【%s】 |运行时间：【%.1f秒】" \
+                    % (self.buildingName,runTime)
+        utils.popMessageBox(message)
+        self.report({'INFO'},message)
+        return
 
     def execute(self, context):  
         buildingObj,bData,objData = utils.getRoot(context.object)
         if buildingObj == None:
             utils.popMessageBox("此对象并非插件生成，或已经合并，无法操作。")
             return {'FINISHED'}
-        buildingName = buildingObj.name
+        self.buildingName = buildingObj.name
+        # 整体重建已包括等待中的重建
+        updateScheduler.cancel(buildingObj)
         # 更新新建筑
         timeStart = time.time()
         funproxy = partial(build.updateBuilding,
@@ -87,17 +169,8 @@ class ACA_OT_update_building(bpy.types.Operator):
                     reloadAssets=True)
         result = utils.fastRun(funproxy)
 
-        message=''
-        type = {'INFO'}
         if 'FINISHED' in result:
-            runTime = time.time() - timeStart
-            message = "更新建筑完成！|建筑样式：【%s】 |运行时间：【%.1f秒】" \
-                        % (buildingName,runTime)
-
-        if message != '':
-            utils.popMessageBox(message)
-            self.report(type,message)
-
+            self.onFinished(time.time() - timeStart)
         return {'FINISHED'}
     
 # 删除建筑
@@ -795,6 +868,52 @@ class ACA_OT_PROFILE(bpy.types.Operator):
 
         return {'FINISHED'}
 
+# 清理整个文件中的孤立数据
+# 营造过程中仅清理本次营造产生的垃圾数据，其他的孤立数据由用户手动清理
+class ACA_OT_purge_orphans(bpy.types.Operator):
+    bl_idname="aca.purge_orphans"
+    bl_label = "清理孤立数据"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = '清理整个文件中无用户的网格、材质等数据，场景较大时较慢'
+
+    def execute(self, context):  
+        count = sum(len(getattr(bpy.data,dataType)) 
+                    for dataType,idType in orphanCleanup.DATA_TYPES)
+        utils.delOrphan()
+        count -= sum(len(getattr(bpy.data,dataType)) 
+                    for dataType,idType in orphanCleanup.DATA_TYPES)
+        self.report({'INFO'},"已清理%d个孤立数据" % count)
+        return {'FINISHED'}
+
+# 反复重建选中的建筑，检测数据块和python内存的持续增长
+class ACA_OT_LEAK_CHECK(bpy.types.Operator):
+    bl_idname="aca.leak_check"
+    bl_label = "泄漏检测"
+    bl_options = {'REGISTER'}
+    bl_description = '反复重建当前建筑，检测随重建次数持续增长的数据'
+
+    cycles: bpy.props.IntProperty(
+        name="重建次数",
+        default=5,
+        min=3,
+        )# type: ignore
+
+    def execute(self, context):  
+        buildingObj,bData,objData = utils.getRoot(context.object)
+        if buildingObj == None:
+            self.report({'INFO'},'请选择一个建筑。')
+            return {'CANCELLED'}
+        report = leakCheck.runLeakCheck(buildingObj,self.cycles)
+        leakCheck.outputReport(report)
+        if len(report['leaks']) == 0 and report['malloc'] == None:
+            self.report({'INFO'},'未发现持续增长的数据。')
+        else:
+            self.report({'WARNING'},
+                '发现持续增长的数据：%s，详见控制台' % 
+                ','.join(list(report['leaks'].keys())
+                         + (['python'] if report['malloc'] else [])))
+        return {'FINISHED'}
+
 class ACA_OT_JOIN(bpy.types.Operator):
     bl_idname="aca.join"
     bl_label = "合并模型"
@@ -810,6 +929,9 @@ class ACA_OT_JOIN(bpy.types.Operator):
             self.report({'INFO'},'合并失败，请选择一个建筑。')
             return {'CANCELLED'}
         
+        # 瓦片实例先实体化，才能合并
+        buildRooftile.realizeTileInstances(buildingObj)
+
         # 选择所有下级层次对象
         partObjList = []
         def addChild(buildingObj):
@@ -855,6 +977,36 @@ class ACA_OT_JOIN(bpy.types.Operator):
 
         return {'FINISHED'}
 
+# 将选中建筑中的瓦片实例实体化
+def realizeSelected(context):
+    buildingList = []
+    for obj in context.selected_objects:
+        buildingObj,bData,objData = utils.getRoot(obj)
+        if (buildingObj != None 
+            and buildingObj not in buildingList):
+            buildingList.append(buildingObj)
+    count = 0
+    for buildingObj in buildingList:
+        count += buildRooftile.realizeTileInstances(buildingObj)
+    return count
+
+# 瓦片实例实体化
+class ACA_OT_REALIZE_TILE(bpy.types.Operator):
+    bl_idname="aca.realize_tile"
+    bl_label = "瓦片实体化"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = '将几何节点实例的瓦片转换为实际网格'
+
+    def execute(self, context):  
+        buildingObj,bData,objData = utils.getRoot(context.object)
+        if buildingObj == None:
+            self.report({'INFO'},'请选择一个建筑。')
+            return {'CANCELLED'}
+        count = buildRooftile.realizeTileInstances(buildingObj)
+        if count == 0:
+            self.report({'INFO'},'该建筑中没有瓦片实例。')
+        return {'FINISHED'}
+
 # 导出FBX模型
 # https://docs.blender.org/api/current/bpy.ops.export_scene.html#module-bpy.ops.export_scene
 class ACA_OT_EXPORT_FBX(bpy.types.Operator):
@@ -877,6 +1029,8 @@ class ACA_OT_EXPORT_FBX(bpy.types.Operator):
     filename: bpy.props.StringProperty()# type: ignore
 
     def execute(self, context):          
+        # 瓦片实例先实体化，导出器不能可靠的导出几何节点实例
+        realizeSelected(context)
         # 导出fbx
         filePath = self.filepath
         absPath = bpy.path.abspath(filePath)
@@ -934,6 +1088,8 @@ class ACA_OT_EXPORT_GLB(bpy.types.Operator):
     filename: bpy.props.StringProperty()# type: ignore
 
     def execute(self, context):        
+        # 瓦片实例先实体化，导出器不能可靠的导出几何节点实例
+        realizeSelected(context)
         # 导出fbx
         filePath = self.filepath
         absPath = bpy.path.abspath(filePath)
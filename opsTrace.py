@@ -0,0 +1,154 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   bpy.ops调用的次数和耗时统计
+#   营造过程中大量使用bpy.ops（模式切换、convert、transform_apply、
+#   primitive_*_add、bisect、uv投射、orphans_purge等），是重建耗时的主要来源
+#   这里在utils.fastRun执行期间临时替换bpy.ops的调用入口，
+#   按operator和调用的ACA函数分别累计次数和耗时，营造结束后输出排名
+#   默认关闭，在场景属性is_ops_trace开启后生效
+import bpy
+import os
+import sys
+import json
+import time
+
+from . import utils
+
+# 插件目录，用于在调用栈中查找ACA函数
+ADDON_FOLDER = os.path.dirname(os.path.abspath(__file__))
+# 输出的排名条数
+REPORT_TOP = 30
+
+# 统计状态
+__state = {
+    'depth' : 0,        # fastRun的嵌套层数，仅最外层开始和结束统计
+    'call' : None,      # 被替换的bpy.ops调用入口
+    'start' : 0.0,
+    'stack' : [],       # 嵌套调用的operator，用于计算自身耗时
+    'ops' : {},         # {operator:[次数,总耗时,自身耗时]}
+    'sites' : {},       # {(operator,ACA函数):[次数,总耗时,自身耗时]}
+}
+
+# 查找调用operator的ACA函数
+# 取调用栈中最近的一个插件内函数，格式为“模块.函数”
+def __getCaller():
+    frame = sys._getframe(2)
+    while frame != None:
+        fileName = frame.f_code.co_filename
+        if (os.path.dirname(os.path.abspath(fileName)) == ADDON_FOLDER
+                and not fileName.endswith('opsTrace.py')):
+            module = os.path.splitext(os.path.basename(fileName))[0]
+            return module + '.' + frame.f_code.co_name
+        frame = frame.f_back
+    return '<blender>'
+
+def __accumulate(table,key,elapsed,selfTime):
+    item = table.get(key)
+    if item == None:
+        item = table[key] = [0,0.0,0.0]
+    item[0] += 1
+    item[1] += elapsed
+    item[2] += selfTime
+    return
+
+# 替换后的bpy.ops调用入口
+def __tracedCall(op,*args,**kw):
+    opName = op.idname_py()
+    caller = __getCaller()
+    stack = __state['stack']
+    # 记录子调用的耗时，以计算自身耗时
+    stack.append(0.0)
+    timeStart = time.perf_counter()
+    try:
+        return __state['call'](op,*args,**kw)
+    finally:
+        elapsed = time.perf_counter() - timeStart
+        childTime = stack.pop()
+        if len(stack) > 0:
+            stack[-1] += elapsed
+        selfTime = elapsed - childTime
+        __accumulate(__state['ops'],opName,elapsed,selfTime)
+        __accumulate(__state['sites'],(opName,caller),elapsed,selfTime)
+
+# 开始统计
+# 返回是否需要在结束时调用finish
+def begin():
+    scnData = bpy.context.scene.ACA_data
+    if not scnData.is_ops_trace:
+        return False
+    __state['depth'] += 1
+    if __state['depth'] > 1:
+        return True
+
+    from bpy.ops import _BPyOpsSubModOp
+    __state['call'] = _BPyOpsSubModOp.__call__
+    __state['start'] = time.perf_counter()
+    __state['stack'] = []
+    __state['ops'] = {}
+    __state['sites'] = {}
+    _BPyOpsSubModOp.__call__ = __tracedCall
+    return True
+
+# 结束统计，恢复bpy.ops的调用入口，并输出报告
+def finish():
+    __state['depth'] -= 1
+    if __state['depth'] > 0:
+        return None
+
+    from bpy.ops import _BPyOpsSubModOp
+    _BPyOpsSubModOp.__call__ = __state['call']
+    __state['call'] = None
+    report = getReport(time.perf_counter() - __state['start'])
+    __outputReport(report)
+    return report
+
+# 按总耗时排名
+def __rank(table,total):
+    rows = []
+    for key,(count,elapsed,selfTime) in table.items():
+        rows.append({
+            'key' : key,
+            'count' : count,
+            'total' : round(elapsed,4),
+            'self' : round(selfTime,4),
+            'mean' : round(elapsed/count,5),
+            'percent' : round(selfTime/total*100,1) if total > 0 else 0,
+        })
+    rows.sort(key=lambda row:row['self'],reverse=True)
+    return rows
+
+# 获取统计结果
+def getReport(total):
+    sites = __rank(__state['sites'],total)
+    for row in sites:
+        row['operator'],row['caller'] = row.pop('key')
+    return {
+        'total' : round(total,4),
+        'ops' : __rank(__state['ops'],total),
+        'sites' : sites,
+    }
+
+# 输出排名表，并写入插件目录的aca_ops.json
+def __outputReport(report):
+    utils.outputMsg("bpy.ops统计：总耗时%.2fs" % report['total'])
+    utils.outputMsg("%-40s %6s %9s %9s %6s" % (
+        'operator','count','self(s)','mean(ms)','%'))
+    for row in report['ops'][:REPORT_TOP]:
+        utils.outputMsg("%-40s %6d %9.3f %9.2f %5.1f%%" % (
+            row['key'],row['count'],row['self'],
+            row['mean']*1000,row['percent']))
+    utils.outputMsg("%-60s %6s %9s" % ('operator @ caller','count','self(s)'))
+    for row in report['sites'][:REPORT_TOP]:
+        utils.outputMsg("%-60s %6d %9.3f" % (
+            row['operator'] + ' @ ' + row['caller'],
+            row['count'],row['self']))
+
+    from . import buildTrace
+    path = os.path.join(buildTrace.getTraceFolder(),'aca_ops.json')
+    try:
+        with open(path,'w',encoding='utf-8') as f:
+            json.dump(report,f,ensure_ascii=False,indent=1)
+    except OSError as e:
+        print(e)
+    return
@@ -0,0 +1,87 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   营造过程中的垃圾数据清理
+#   原来在fastRun前后、每次deleteHierarchy、每次joinObjects后都调用
+#   orphans_purge，每次都遍历整个文件的所有数据，场景中建筑越多越慢
+#   这里在营造开始时记录已有的数据块，营造过程中登记被删除对象的网格等数据，
+#   营造结束时仅检查营造中新建的、以及登记的数据块，
+#   无用户的一次性以batch_remove释放
+#   全局的orphans_purge改为用户手动执行（aca.purge_orphans）
+import bpy
+
+# 检查的数据块类型，按依赖顺序排列
+# 先释放对象和网格，材质、节点组的用户数才会归零
+DATA_TYPES = (
+    ('objects',bpy.types.Object),
+    ('meshes',bpy.types.Mesh),
+    ('curves',bpy.types.Curve),
+    ('materials',bpy.types.Material),
+    ('node_groups',bpy.types.NodeTree),
+    ('images',bpy.types.Image),
+)
+
+__state = {
+    'depth' : 0,        # 嵌套层数，仅最外层开始和结束记录
+    'existing' : {},    # {数据类型:set(指针)}，营造开始时已有的数据块
+    'released' : [],    # 营造过程中登记的数据块
+}
+
+# 开始记录
+def begin():
+    __state['depth'] += 1
+    if __state['depth'] > 1:
+        return
+    existing = {}
+    for dataType,idType in DATA_TYPES:
+        existing[dataType] = set(
+            item.as_pointer() for item in getattr(bpy.data,dataType))
+    __state['existing'] = existing
+    __state['released'] = []
+    return
+
+# 登记被删除对象的网格、曲线等数据，营造结束时检查
+# 不在营造过程中时，立即释放
+def release(idList):
+    if __state['depth'] > 0:
+        __state['released'].extend(idList)
+    else:
+        freeUnused(idList)
+    return
+
+# 结束记录，释放营造中新建的、以及登记的无用户数据块
+# 返回释放的数量
+def finish():
+    __state['depth'] -= 1
+    if __state['depth'] > 0:
+        return 0
+    existing = __state['existing']
+    released = __state['released']
+    __state['existing'] = {}
+    __state['released'] = []
+
+    candidates = []
+    for dataType,idType in DATA_TYPES:
+        known = existing.get(dataType,set())
+        candidates += [item for item in getattr(bpy.data,dataType)
+                       if item.as_pointer() not in known]
+    return freeUnused(candidates + released)
+
+# 一次性释放无用户的数据块
+# 按DATA_TYPES的顺序逐类释放，上一类释放后，下一类的用户数才准确
+def freeUnused(idList):
+    count = 0
+    for dataType,idType in DATA_TYPES:
+        unused = {}
+        for item in idList:
+            try:
+                if (isinstance(item,idType)
+                        and item.users == 0):
+                    unused[item.as_pointer()] = item
+            except ReferenceError:
+                # 数据块已被删除
+                continue
+        if len(unused) > 0:
+            bpy.data.batch_remove(list(unused.values()))
+            count += len(unused)
+    return count
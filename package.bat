@@ -29,8 +29,9 @@ if not exist "!destination!" (
     md "!destination!"
 )
 
-rem 拷贝文件，排除指定目录、所有 .blend 后缀的文件、aca_log.txt、.gitignore 以及 package.bat 文件
-robocopy "!source!" "!destination!" /E /XF *.blend aca_log.txt .gitignore package.bat /XD __pycache__ .vscode .git
+rem 拷贝文件，排除指定目录、所有 .blend 后缀的文件、aca_log.txt、.gitignore、package.bat 以及测试文件
+rem 同时排除模板库的编译缓存、写入中的临时文件，以及分片存储的模板目录，发布时仅使用template.xml
+robocopy "!source!" "!destination!" /E /XF *.blend aca_log.txt .gitignore package.bat pytest.ini *.compiled.json .aca.*.tmp /XD __pycache__ .vscode .git .pytest_cache tests "!source!\template\templates"
 if %errorlevel% leq 3 (
     echo 拷贝成功。
 ) else (
@@ -128,6 +128,19 @@ class ACA_PT_basic(bpy.types.Panel):
                     icon='FF',
                     text=text
                 )
+                # 自动刷新时，连续修改合并重建的等待时间
+                if scnData.is_auto_rebuild:
+                    col.prop(
+                        data=bpy.context.scene.ACA_data,
+                        property='update_delay',
+                        text='延迟'
+                    )
+                # 生成过程中每秒刷新界面的次数
+                col.prop(
+                    data=bpy.context.scene.ACA_data,
+                    property='redraw_rate',
+                    text='刷新'
+                )
 
                 toolBox = box.column(align=True)
                 # 合并按钮
@@ -140,6 +153,28 @@ class ACA_PT_basic(bpy.types.Panel):
                 col.operator("aca.export_fbx",icon='EXPORT')
                 col = toolBar.column(align=True)
                 col.operator("aca.export_glb",icon='EXPORT')   
+                # 清理孤立数据
+                toolBar = toolBox.grid_flow(columns=1, align=True)
+                col = toolBar.column(align=True)
+                col.operator("aca.purge_orphans",icon='ORPHAN_DATA')
+                # 性能分析：营造计时、bpy.ops统计，输出到插件目录
+                toolBar = toolBox.grid_flow(columns=2, align=True)
+                col = toolBar.column(align=True)
+                col.prop(
+                    data=bpy.context.scene.ACA_data,
+                    property='is_build_trace',
+                    toggle=True,
+                    icon='TIME',
+                    text='营造计时'
+                )
+                col = toolBar.column(align=True)
+                col.prop(
+                    data=bpy.context.scene.ACA_data,
+                    property='is_ops_trace',
+                    toggle=True,
+                    icon='CONSOLE',
+                    text='ops统计'
+                )
 
         # 运行中提示
         if not build.isFinished:
@@ -1008,6 +1043,9 @@ class ACA_PT_tiles(bpy.types.Panel):
             row.prop(bData, "tile_color") # 瓦面颜色
             row = box.row()
             row.prop(bData, "tile_alt_color") # 瓦面剪边颜色
+            row = box.row()
+            row.prop(bData, "use_tile_instance") # 瓦片实例化
+            row.operator("aca.realize_tile",icon='OUTLINER_OB_GROUP_INSTANCE',text='')
 
             if not bData.is_showTiles:
                 layout.enabled = False
@@ -4,11 +4,14 @@
 #   管理模板
 import bpy
 import pathlib
+import time
+import logging
 import xml.etree.ElementTree as ET
 from .const import ACA_Consts as con
 from .data import ACA_data_obj as acaData
 from .data import ACA_data_template as tmpData
 from . import utils
+from . import templateStore
 
 
 xmlFileName = 'template.xml'
@@ -25,52 +28,34 @@ def __getPath(fileName):
     srcPath = USER / "scripts/addons" / addonName / templateFolder / fileName
     return str(srcPath)
 
+# 模板库文件的路径
+def getTemplatePath():
+    return __getPath(xmlFileName)
+
 # 解析XML，获取模板列表
 def getTemplateList(onlyname=False):
     # 载入XML
     # 这个结果打包发布后出现错误，改为绝对路径
     # path = os.path.join(templateFolder, xmlFileName)
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
-    root = tree.getroot()
-    templates = root.findall('template')
+    # 250320 模板解析结果在内存中索引，不再每次重新解析
+    templateNames = templateStore.getTemplateNames(path)
 
     template_list = []
-    for template in templates:
-        tname = template.find('template_name')
-        if  tname != None:
-            template_name = tname.text
-            if onlyname:
-                template_list.append(template_name)
-            else:
-                template_list.append(
-                    (template_name,template_name,template_name))
+    for template_name in templateNames:
+        if onlyname:
+            template_list.append(template_name)
+        else:
+            template_list.append(
+                (template_name,template_name,template_name))
             
     return template_list
 
 # 根据选择的模板，获取模板类型（房屋、院墙）
 def getBuildingType(templateName):
-    # 载入XML
-    # 这个结果打包发布后出现错误，改为绝对路径
-    # path = os.path.join(templateFolder, xmlFileName)
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
-    root = tree.getroot()
-    templates = root.findall('template')
-
     # 有些模板没有这个类型值，默认置为普通building
-    typeName = con.ACA_TYPE_BUILDING
-
-    template_list = []
-    for template in templates:
-        tname = template.find('template_name')
-        if  tname.text == templateName:
-            typeNode = template.find('aca_type')
-            if typeNode != None:
-                typeName = typeNode.text
-            break
-            
-    return typeName
+    return templateStore.getTemplateType(path,templateName)
 
 # 解析XML，获取斗栱样式列表
 # 配置如下
@@ -122,18 +107,29 @@ def updateDougongData(buildingObj:bpy.types.Object):
         bData['dg_style'] = '0'
     
     # 1.2、更新aData中的斗栱样式
-    __updateAssetStyle(
-        buildingObj,'dg_piller_source',
-        parent=dgrootObj)
-    __updateAssetStyle(
-        buildingObj,'dg_fillgap_source',
-        parent=dgrootObj)
-    __updateAssetStyle(
-        buildingObj,'dg_fillgap_alt_source',
-        parent=dgrootObj)
-    __updateAssetStyle(
-        buildingObj,'dg_corner_source',
-        parent=dgrootObj)
+    # 先解析出各个斗栱资产的名称，再一次性载入
+    dgAssetKeys = ('dg_piller_source',
+                   'dg_fillgap_source',
+                   'dg_fillgap_alt_source',
+                   'dg_corner_source')
+    root = ET.parse(__getPath(assetsFileName)).getroot()
+    styleNames = {}
+    for assetKey in dgAssetKeys:
+        styleName = __getAssetStyleName(buildingObj,assetKey,root)
+        if styleName != None:
+            styleNames[assetKey] = styleName
+    # 个性化样式资产，不采用link方式，而是复制到各个建筑内
+    assetMap = loadAssetsBatch(styleNames.values(),link=False)
+    for assetKey,styleName in styleNames.items():
+        # 250104 为了解决以下报错，做的安全性验证
+        # 似乎是4.2中做了一个Breaking changes：Statically Typed IDProperties
+        # https://developer.blender.org/docs/release_notes/4.2/python_api/#statically-typed-idproperties
+        # TypeError: Cannot assign a 'Object' value to the existing 'dg_piller_source' Group IDProperty
+        if assetKey in aData:  
+            del aData[assetKey]
+        if styleName in assetMap:
+            aData[assetKey] = __copyAsset(
+                assetMap[styleName],parent=dgrootObj)
     if (aData.dg_piller_source == None
             or aData.dg_fillgap_source == None
             or aData.dg_fillgap_alt_source == None
@@ -167,53 +163,37 @@ def updateDougongData(buildingObj:bpy.types.Object):
 
     return
 
-# 更新资产样式
-def __updateAssetStyle(buildingObj:bpy.types.Object,
-                     assetName='',
-                     parent=None): 
+# 查找资产样式
+# 根据bData中的样式设置，在资产索引中查找对应的资产名称
+def __getAssetStyleName(buildingObj:bpy.types.Object,
+                        assetName,
+                        root): 
     # 载入数据
     bData:acaData = buildingObj.ACA_data  
-    aData : tmpData = bpy.context.scene.ACA_temp
-    # 载入XML
-    path = __getPath(assetsFileName)
-    tree = ET.parse(path)
-    # 根节点<assets>
-    root = tree.getroot()
     # 查找配置
     assetNode = root.find(assetName)
-    if assetNode != None:
-        # 判断type属性
-        type = assetNode.attrib['type']
-        if type == 'List':
-            # 获取样式定义，是指bData中定义的变量名称
-            styleKey = assetNode.attrib['key']
-            # 有些配置可能太老，导致部分styleKey缺失
-            if styleKey in bData:
-                # styleValue为了样式下拉框能自动选中，
-                # 在载入样式时自动转为了int，这里要转为str与xml比较
-                styleValue = int(bData[styleKey])
-                # 查找“item”子节点
-                items = assetNode.findall('item')
-                for n,item in enumerate(items):
-                    if n == styleValue:
-                        # 250104 为了解决以下报错，做的安全性验证
-                        # 似乎是4.2中做了一个Breaking changes：Statically Typed IDProperties
-                        # https://developer.blender.org/docs/release_notes/4.2/python_api/#statically-typed-idproperties
-                        # TypeError: Cannot assign a 'Object' value to the existing 'dg_piller_source' Group IDProperty
-                        if assetName in aData:  
-                            del aData[assetName]
-                        # 个性化样式资产，不采用link方式，而是复制到各个建筑内
-                        aData[assetName] = loadAssets(
-                            item.text,link=False,parent=parent)
-    return
-
-# 载入Blender中的资产
-# 参考教程：https://b3d.interplanety.org/en/appending-all-objects-from-the-external-blend-file-to-the-scene-with-blender-python-api/
-# 参考文档：https://docs.blender.org/api/current/bpy.types.BlendDataLibraries.html
-def loadAssets(assetName : str,
-               parent:bpy.types.Object=None,
-               hide=True,
-               link=True):   
+    if assetNode == None:
+        return None
+    # 判断type属性
+    type = assetNode.attrib['type']
+    if type != 'List':
+        return None
+    # 获取样式定义，是指bData中定义的变量名称
+    styleKey = assetNode.attrib['key']
+    # 有些配置可能太老，导致部分styleKey缺失
+    if styleKey not in bData:
+        return None
+    # styleValue为了样式下拉框能自动选中，
+    # 在载入样式时自动转为了int，这里要转为str与xml比较
+    styleValue = int(bData[styleKey])
+    # 查找“item”子节点
+    items = assetNode.findall('item')
+    if styleValue < len(items):
+        return items[styleValue].text
+    return None
+
+# 查找资产库文件
+def __getAssetLibPath():
     import os
     # 查找默认插件目录下的素材库
     filepath = __getPath(blenderFileName)
@@ -226,43 +206,81 @@ def loadAssets(assetName : str,
         filepath = addon_prefs.filepath    
     if not os.path.exists(filepath):
         raise FileNotFoundError(f"无法打开资产库，请确认已经按照使用手册，关联了acaAssets.blend文件。")   
+    return filepath
+
+# 批量载入Blender中的资产
+# 原来每个资产都要打开一次资产库，现在一次打开，载入所有资产
+# 返回资产名称与对象的字典，未找到的资产不在字典中
+def loadAssetsBatch(assetNames,link=True):
+    timeStart = time.time()
+    filepath = __getAssetLibPath()
+    # 去重，保持顺序
+    assetNames = list(dict.fromkeys(assetNames))
 
     # 简化做法，效率更高，但没有关联子对象
     try:
         with bpy.data.libraries.load(filepath,link=link) as (data_from, data_to):
-            data_to.objects = [name for name in data_from.objects if name==assetName]
+            nameSet = set(assetNames)
+            loadNames = [name for name in data_from.objects 
+                         if name in nameSet]
+            data_to.objects = loadNames
     except OSError:
         raise Exception('无法打开资产库，请确认acaAssets.blend文件已经放入插件目录')
-    # 验证找到的资产是否唯一
-    if len(data_to.objects) == 0:
-        utils.outputMsg("未找到指定载入的资产:" + assetName)
+    
+    # 载入后data_to.objects中为对象，与loadNames一一对应
+    assetMap = {}
+    for name,obj in zip(loadNames,data_to.objects):
+        if obj != None:
+            assetMap[name] = obj
+    # 验证找到的资产
+    for name in assetNames:
+        if name not in assetMap:
+            utils.outputMsg("未找到指定载入的资产:" + name)
+    
+    logger = logging.getLogger('ACA')
+    logger.info("载入资产%d个，耗时%.3f秒" 
+                % (len(assetMap),time.time()-timeStart))
+    return assetMap
+
+# 将载入的资产复制到建筑中
+def __copyAsset(sourceObj:bpy.types.Object,
+                parent:bpy.types.Object=None,
+                hide=True):
+    # 返回一个复制的新对象
+    newobj = utils.copyObject(
+        sourceObj=sourceObj,
+        parentObj=parent,
+        singleUser=True
+    )
+    if hide:
+        utils.hideObj(newobj)
+    else:
+        utils.showObj(newobj)
+    for child in newobj.children:
+        if hide:
+            utils.hideObj(child)
+        else:
+            utils.showObj(child)
+    return newobj
+
+# 载入Blender中的资产
+# 参考教程：https://b3d.interplanety.org/en/appending-all-objects-from-the-external-blend-file-to-the-scene-with-blender-python-api/
+# 参考文档：https://docs.blender.org/api/current/bpy.types.BlendDataLibraries.html
+def loadAssets(assetName : str,
+               parent:bpy.types.Object=None,
+               hide=True,
+               link=True):   
+    assetMap = loadAssetsBatch([assetName],link=link)
+    if assetName not in assetMap:
         return
-    if len(data_to.objects) > 1:
-        utils.outputMsg("无法定位唯一的资产:" + assetName)
-        return 
     
-    sourceObj = data_to.objects[0]
+    sourceObj = assetMap[assetName]
     if link:
         # 直接返回引用
         # bpy.context.collection.objects.link(sourceObj)
         return sourceObj
     else:
-        # 返回一个复制的新对象
-        newobj = utils.copyObject(
-            sourceObj=sourceObj,
-            parentObj=parent,
-            singleUser=True
-        )
-        if hide:
-            utils.hideObj(newobj)
-        else:
-            utils.showObj(newobj)
-        for child in newobj.children:
-            if hide:
-                utils.hideObj(child)
-            else:
-                utils.showObj(child)
-        return newobj
+        return __copyAsset(sourceObj,parent,hide)
 
 # 用const填充XML中未定义的属性
 def __loadDefaultData(buildingObj:bpy.types.Object):
@@ -324,22 +342,25 @@ def loadAssetByBuilding(buildingObj:bpy.types.Object):
     tree = ET.parse(path)
     root = tree.getroot()
     
+    # 静态的模板对象声明为Object
+    # 动态的模板对象声明为List，
+    # 不在这里处理，而拆分到类似updateDougongData的定制方法中处理
+    assetNodes = [node for node in root 
+                  if node.attrib['type'] == 'Object']
+    # 一次性载入所有资产
+    assetMap = loadAssetsBatch(
+        [node.text for node in assetNodes])
+
     # 填充
-    for node in root:
+    for node in assetNodes:
         tag = node.tag
-        type = node.attrib['type']
-        value = node.text
-        # 静态的模板对象声明为Object
-        # 动态的模板对象声明为List，
-        # 不在这里处理，而拆分到类似updateDougongData的定制方法中处理
-        if type == 'Object':
-            # 241224 为了解决以下报错，做的安全性验证
-            # 似乎是4.2中做了一个Breaking changes：Statically Typed IDProperties
-            # https://developer.blender.org/docs/release_notes/4.2/python_api/#statically-typed-idproperties
-            # TypeError: Cannot assign a 'Object' value to the existing 'mat_wood' Group IDProperty
-            if tag in aData:  
-                del aData[tag]  
-            aData[tag] = loadAssets(value)
+        # 241224 为了解决以下报错，做的安全性验证
+        # 似乎是4.2中做了一个Breaking changes：Statically Typed IDProperties
+        # https://developer.blender.org/docs/release_notes/4.2/python_api/#statically-typed-idproperties
+        # TypeError: Cannot assign a 'Object' value to the existing 'mat_wood' Group IDProperty
+        if tag in aData:  
+            del aData[tag]  
+        aData[tag] = assetMap.get(node.text)
 
     # # 3、其他个性化处理
     # # 提取斗栱自定义属性，填充入bData
@@ -350,90 +371,28 @@ def loadAssetByBuilding(buildingObj:bpy.types.Object):
 
 def getTemplateChild(templateName):
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
-    root = tree.getroot()
-    templates = root.findall('template')
-
-    tempChildren = []
-    for template in templates:
-        tname = template.find('template_name')
-        if tname == None: 
-            continue
-        if tname.text == templateName:
-            children = template.findall('template')
-            for child in children:
-                tname = child.find('template_name')
-                ttype = child.find('aca_type')
-                tempChildren.append(
-                    {
-                        'templateName': tname.text,
-                        'acaType' : ttype.text,
-                    }
-                )
-    return tempChildren
+    return templateStore.getTemplateChildren(path,templateName)
 
 def __loadTemplateSingle(
         buildingObj:bpy.types.Object,
-        template,
+        params,
     ):    
     # 载入数据
     bData:acaData = buildingObj.ACA_data
     
     # 初始化bData默认值，根据DK/PD实时刷新一次
     # 斗口
-    dk = template.find('DK')
-    if dk != None: 
-        bData['DK'] = round(float(dk.text),3)
+    if 'DK' in params: 
+        bData['DK'] = round(float(params['DK']),3)
     # 柱径
-    pd = template.find('piller_diameter')
-    if pd != None:
-        bData['piller_diameter'] = round(float(pd.text),3)
+    if 'piller_diameter' in params:
+        bData['piller_diameter'] = round(float(params['piller_diameter']),3)
     # 刷新bData默认值
     bData = __loadDefaultData(buildingObj)
 
-    # 遍历所有子节点，并绑定到对应属性
-    for node in template:
-        tag = node.tag
-        type = node.attrib['type']
-        value = node.text
-        # 类型转换
-        # 20250209 老版本的模板通过数据类型进行判断
-        if type == 'str':
-            # 特殊处理下拉框
-            if tag in ('roof_style',
-                        'juzhe',
-                        'dg_style'):
-                bData[tag] = int(value)
-            else:
-                bData[tag] = value
-        elif type == 'float':
-            bData[tag] = round(float(value),3)
-        elif type == 'int':
-            bData[tag] = int(value)
-        elif type == 'bool':
-            # 注意这里的True/False是str，用bool()强制转换时都为True，
-            # 所以以下手工进行了判断
-            if value == 'True':
-                bData[tag] = True
-            if value == 'False':
-                bData[tag] = False
-        # 20250209 新版本的模板通过bdata数据属性进行判断
-        elif type =='StringProperty':
-            bData[tag] = value
-        elif type == 'IntProperty':
-            bData[tag] = int(value)
-        elif type == 'FloatProperty':
-            bData[tag] = round(float(value),3)
-        elif type == 'BoolProperty':
-            if value == 'True':
-                bData[tag] = True
-            if value == 'False':
-                bData[tag] = False
-        elif type == 'EnumProperty':
-            bData[tag] = int(value)
-        else:
-            print("can't convert:",node.tag, 
-                    node.attrib['type'],node.text)
+    # 一次性写入所有参数
+    # 类型转换和参数校验已在模板编译时完成
+    templateStore.applyParams(bData,params)
 
     # 填充建筑使用的资产对象，根据其中的dg_style等不同，载入不同的资产样式
     loadAssetByBuilding(buildingObj)
@@ -448,42 +407,14 @@ def loadTemplate(buildingObj:bpy.types.Object):
     bData:acaData = buildingObj.ACA_data
     templateName = bData.template_name
     
-    # 解析XML配置模板
+    # 在模板索引中查找对应名称的模板，包括组合模板中的子模板
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
-    root = tree.getroot()
-    
-    # 读取所有根节点模板
-    templates = root.findall('template')
-    if templates == None:
-        utils.outputMsg("模板解析失败")
+    params = templateStore.getTemplateParams(path,templateName)
+    if params != None:
+        __loadTemplateSingle(buildingObj,params)
         return
-    
-    # 在根层次中查找对应名称的那个模板
-    for template in templates:
-        # 查看是否有子模版
-        tType = template.find('aca_type')
-        if tType != None:
-            # 如果 aca_type=combo，则继续查找子模板
-            if tType.text == con.ACA_TYPE_COMBO:
-                # 查找子模板XML节点
-                tempChildren = template.findall('template')
-                for tempChild in tempChildren:
-                    nameNode = tempChild.find('template_name')
-                    if nameNode != None:
-                        if nameNode.text == templateName:
-                            __loadTemplateSingle(
-                                buildingObj,tempChild)
-                            return
-            else:
-                nameNode = template.find('template_name')
-                if nameNode != None:
-                    if nameNode.text == templateName:
-                        __loadTemplateSingle(
-                            buildingObj,template)
-                        return
                     
-    # 经过经过以上循环，没有符合条件的模板，抛出异常
+    # 经过经过以上查找，没有符合条件的模板，抛出异常
     raise Exception('无法载入模板')
 
 # 保存模板修改
@@ -504,38 +435,27 @@ def saveTemplate(buildingObj:bpy.types.Object):
         'dg_scale',
     }
     
-    # 解析XML配置模板
+    # 从模板索引中获取XML
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
+    store = templateStore.getStore(path)
+    tree = store['tree']
     root = tree.getroot()   # <templates>根节点
-    # 验证根节点
-    templateNodeList = root.findall('template')
-    if templateNodeList == None:
-        utils.outputMsg("模板解析失败")
-        return
     
-    # 遍历查找对应模板
-    isNewTemplate = True
-    for templateNode in templateNodeList:
-        nameNode = templateNode.find('template_name')
-        if nameNode != None:
-            if nameNode.text == templateName:
-                # 找到对应模板
-                isNewTemplate = False
-                break
+    # 查找对应模板
+    templateNode = store['nodes'].get(templateName)
     # 如果没有找到，则新建模板节点
-    if isNewTemplate:
+    if templateNode == None:
         templateNode = ET.SubElement(root,'template')
 
     # 遍历bData，保存所有的键值
     # https://blender.stackexchange.com/questions/72402/how-to-iterate-through-a-propertygroup
-    for key in bData.__annotations__.keys():
+    # 20250209 数据类型改为从data定义中获取，可以明确区分enum类型
+    # 从而更好的处理下拉列表
+    # 250325 属性定义在模板库中缓存，不再逐个查询bl_rna
+    schema = templateStore.getSchema()
+    for key,keyType in schema.items():
         # 提取键值，并保存
         value = getattr(bData, key)
-        # 20250209 数据类型改为从data定义中获取，可以明确区分enum类型
-        # 从而更好的处理下拉列表
-        # keyType = type(value).__name__
-        keyType = bData.bl_rna.properties[key].rna_type.identifier
 
         # 数据验证和预处理
         # 忽略无需保存的键值
@@ -562,28 +482,22 @@ def saveTemplate(buildingObj:bpy.types.Object):
         keyNode.text = str(value)
         keyNode.attrib['type'] = keyType
 
-    # 缩进美化
-    # https://stackoverflow.com/questions/28813876/how-do-i-get-pythons-elementtree-to-pretty-print-to-an-xml-file
-    ET.indent(tree, space="\t", level=0)
-    # 保存
-    tree.write(path, encoding='UTF-8',xml_declaration=True)
+    # 保存，仅重新序列化该模板，并原子写入
+    templateStore.saveTemplateNode(path,templateNode)
 
     return {'FINISHED'}
 
 # 删除模板
 def delTemplate(templateName):
-    # 解析XML配置模板
+    # 从模板索引中获取XML
     path = __getPath(xmlFileName)
-    tree = ET.parse(path)
+    tree = templateStore.getStore(path)['tree']
     root = tree.getroot()   # <templates>根节点
-    # 验证根节点
     templateNodeList = root.findall('template')
-    if templateNodeList == None:
-        utils.outputMsg("模板解析失败")
-        return
     
     # 遍历查找对应模板
     bFind = False
+    delNode = None
     nextTemplateName = ''
     preTemplateName = ''
     for templateNode in templateNodeList:
@@ -596,8 +510,8 @@ def delTemplate(templateName):
                     preTemplateName = nameNode.text
                 else:
                     # 如果找到了对应名称
-                    # 删除模板
-                    root.remove(templateNode)
+                    # 暂存待删除的模板
+                    delNode = templateNode
                     # 更新标志位，进入下一次循环
                     # 以便填充nextTemplateName
                     bFind = True
@@ -606,10 +520,8 @@ def delTemplate(templateName):
                 nextTemplateName = nameNode.text
                 break
 
-    # 缩进美化
-    # https://stackoverflow.com/questions/28813876/how-do-i-get-pythons-elementtree-to-pretty-print-to-an-xml-file
-    ET.indent(tree, space="\t", level=0)
-    # 保存
-    tree.write(path, encoding='UTF-8',xml_declaration=True)
+    # 删除模板，并原子写入
+    if delNode != None:
+        templateStore.removeTemplateNode(path,delNode)
 
     return {'FINISHED'}
\ No newline at end of file
@@ -0,0 +1,495 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   模板库的内存索引
+#   原来每次查询模板列表、模板类型、子模板、载入模板时，
+#   都要重新解析整个template.xml，并逐个遍历查找
+#   这里仅解析一次，建立模板名称到XML节点的索引，
+#   并缓存类型转换后的模板参数
+#   仅在文件的修改时间或大小变化时重新解析
+#   保存、删除模板时直接更新索引，不再重新解析
+#   250322 新增编译缓存：
+#   XML仍为可编辑的模板源文件，首次使用时按ACA_data_obj的属性定义
+#   完成类型转换，编译为template.compiled.json，
+#   之后直接读取编译结果，无需解析XML、无需逐个节点类型转换
+#   XML的修改时间、大小，或属性定义变化时，自动重新编译
+#   250325 模板保存改为增量、原子写入：
+#   每个根模板的序列化结果单独缓存，保存时仅重新序列化修改的模板，
+#   先写入临时文件，再整体替换，避免中途崩溃损坏模板库
+#   同时支持分片存储，template/templates/目录下每个模板一个文件，
+#   由index.json记录模板顺序，此时保存仅写入修改的模板文件
+import os
+import json
+import hashlib
+import xml.etree.ElementTree as ET
+from .const import ACA_Consts as con
+from .data import ACA_data_obj as acaData
+from . import utils
+from . import atomicFile
+
+# 编译缓存的格式版本，格式变化时递增，以废弃旧的缓存
+COMPILED_VERSION = 1
+# 编译缓存的文件名后缀，与XML放在同一目录
+COMPILED_SUFFIX = '.compiled.json'
+# 分片存储的目录和索引文件，与XML放在同一目录
+# 索引文件存在时，优先使用分片存储
+SHARD_FOLDER = 'templates'
+SHARD_INDEX = 'index.json'
+
+# 模板库缓存
+__store = {
+    'path' : None,      # 模板文件路径
+    'stat' : None,      # 文件的修改时间和大小，用于判断是否需要重新解析
+    'tree' : None,      # XML树，仅在保存、删除模板时解析
+    'nodes' : {},       # 模板名称到XML节点的索引，包括组合模板的子模板
+    'compiled' : None,  # 编译结果，包括模板名称、类型、子模板、参数
+    'chunks' : {},      # 根模板节点到序列化结果的缓存
+    'files' : {},       # 分片存储时，根模板节点到文件名的索引
+}
+
+# 属性定义的缓存
+__schema = {}
+
+# 分片存储的目录
+def __getShardFolder(path):
+    return os.path.join(os.path.dirname(path),SHARD_FOLDER)
+
+# 分片存储的索引文件
+def __getShardIndex(path):
+    return os.path.join(__getShardFolder(path),SHARD_INDEX)
+
+# 是否为分片存储
+def isSharded(path):
+    return os.path.exists(__getShardIndex(path))
+
+# 读取分片索引，返回按顺序排列的模板文件名
+def __readShardIndex(path):
+    with open(__getShardIndex(path),'r',encoding='utf-8') as f:
+        return json.load(f)['files']
+
+# 获取文件的修改时间和大小
+# 分片存储时，取索引和所有模板文件的修改时间和大小
+def __getStat(path):
+    if not isSharded(path):
+        st = os.stat(path)
+        return [st.st_mtime_ns,st.st_size]
+    folder = __getShardFolder(path)
+    stat = []
+    for fileName in [SHARD_INDEX] + __readShardIndex(path):
+        st = os.stat(os.path.join(folder,fileName))
+        stat += [st.st_mtime_ns,st.st_size]
+    return stat
+
+# 编译缓存的路径
+def __getCompiledPath(path):
+    root,ext = os.path.splitext(path)
+    return root + COMPILED_SUFFIX
+
+# 获取属性定义
+# 返回{属性名:属性类型}，如{'DK':'FloatProperty'}
+def getSchema():
+    if len(__schema) > 0:
+        return __schema
+    props = acaData.bl_rna.properties
+    for key in acaData.__annotations__.keys():
+        if key in props:
+            __schema[key] = props[key].rna_type.identifier
+    return __schema
+
+# 属性定义的签名，属性增减或类型变化时缓存失效
+def __getSchemaHash(schema):
+    text = json.dumps(schema,sort_keys=True)
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+# 获取模板名称
+def __getName(templateNode):
+    nameNode = templateNode.find('template_name')
+    if nameNode == None:
+        return None
+    return nameNode.text
+
+# 建立模板名称到XML节点的索引
+def __indexNodes(tree):
+    nodes = {}
+    root = tree.getroot()
+    for templateNode in root.findall('template'):
+        templateName = __getName(templateNode)
+        if templateName == None:
+            continue
+        nodes[templateName] = templateNode
+    # 组合模板的子模板
+    # 与原来的查找顺序一致，根层次的模板优先
+    for templateNode in root.findall('template'):
+        for childNode in templateNode.findall('template'):
+            childName = __getName(childNode)
+            if childName == None:
+                continue
+            if childName not in nodes:
+                nodes[childName] = childNode
+    return nodes
+
+# 模板参数的类型转换
+# 返回转换后的值，无法转换时返回None
+def convertValue(tag,type,value):
+    # 20250209 老版本的模板通过数据类型进行判断
+    if type == 'str':
+        # 特殊处理下拉框
+        if tag in ('roof_style',
+                    'juzhe',
+                    'dg_style'):
+            return int(value)
+        else:
+            return value
+    elif type == 'float':
+        return round(float(value),3)
+    elif type == 'int':
+        return int(value)
+    elif type == 'bool':
+        # 注意这里的True/False是str，用bool()强制转换时都为True，
+        # 所以以下手工进行了判断
+        if value == 'True':
+            return True
+        if value == 'False':
+            return False
+        return None
+    # 20250209 新版本的模板通过bdata数据属性进行判断
+    elif type =='StringProperty':
+        return value
+    elif type == 'IntProperty':
+        return int(value)
+    elif type == 'FloatProperty':
+        return round(float(value),3)
+    elif type == 'BoolProperty':
+        if value == 'True':
+            return True
+        if value == 'False':
+            return False
+        return None
+    elif type == 'EnumProperty':
+        return int(value)
+    print("can't convert:",tag,type,value)
+    return None
+
+# 编译单个模板的参数
+# 以属性定义中的类型为准，不再依赖XML中记录的type
+# 未定义的属性、无法转换的值记入invalid，不写入编译结果
+def __compileParams(templateNode,schema,invalid):
+    params = {}
+    for node in templateNode:
+        # 组合模板中的子模板不是参数
+        if node.tag == 'template':
+            continue
+        keyType = schema.get(node.tag)
+        if keyType == None:
+            invalid.add(node.tag)
+            continue
+        # 对象引用无法以参数保存，与原来的处理一致
+        if keyType == 'PointerProperty':
+            continue
+        try:
+            value = convertValue(node.tag,keyType,node.text)
+        except (TypeError,ValueError):
+            value = None
+        if value == None:
+            invalid.add(node.tag)
+            continue
+        params[node.tag] = value
+    return params
+
+# 将XML树编译为模板库
+# oldParams/dirtyNodes：保存模板后，未修改的模板直接沿用原来的编译结果
+def __compileTree(tree,stat,oldParams=None,dirtyNodes=()):
+    schema = getSchema()
+    names = []
+    types = {}
+    children = {}
+    params = {}
+    invalid = set()
+    nodes = __indexNodes(tree)
+    for templateNode in tree.getroot().findall('template'):
+        templateName = __getName(templateNode)
+        if templateName == None:
+            continue
+        names.append(templateName)
+        childList = []
+        for childNode in templateNode.findall('template'):
+            childName = __getName(childNode)
+            if childName == None:
+                continue
+            typeNode = childNode.find('aca_type')
+            childList.append({
+                'templateName': childName,
+                'acaType' : typeNode.text if typeNode != None else None,
+            })
+        if len(childList) > 0:
+            children[templateName] = childList
+    for templateName,templateNode in nodes.items():
+        typeNode = templateNode.find('aca_type')
+        if typeNode != None:
+            types[templateName] = typeNode.text
+        if (oldParams != None
+            and templateName in oldParams
+            and templateNode not in dirtyNodes):
+            params[templateName] = oldParams[templateName]
+            continue
+        params[templateName] = __compileParams(
+            templateNode,schema,invalid)
+    # 未定义的参数仅在编译时提示一次
+    if len(invalid) > 0:
+        utils.outputMsg("模板中存在无效的参数，已忽略："
+                        + ",".join(sorted(invalid)))
+    return {
+        'version' : COMPILED_VERSION,
+        'source' : stat,
+        'schema' : __getSchemaHash(schema),
+        'names' : names,
+        'types' : types,
+        'children' : children,
+        'params' : params,
+    }
+
+# 写入编译缓存
+# 插件目录可能只读，写入失败时仅保留在内存中
+def __writeCompiled(path,compiled):
+    data = json.dumps(compiled,ensure_ascii=False).encode('utf-8')
+    try:
+        atomicFile.writeAtomic(__getCompiledPath(path),data)
+    except OSError as e:
+        utils.outputMsg("模板编译缓存写入失败：" + str(e))
+    return
+
+# 读取编译缓存，缓存过期或损坏时返回None
+def __readCompiled(path,stat):
+    compiledPath = __getCompiledPath(path)
+    if not os.path.exists(compiledPath):
+        return None
+    try:
+        with open(compiledPath,'r',encoding='utf-8') as f:
+            compiled = json.load(f)
+    except (OSError,ValueError):
+        return None
+    if (not isinstance(compiled,dict)
+        or compiled.get('version') != COMPILED_VERSION
+        or compiled.get('source') != stat
+        or compiled.get('schema') != __getSchemaHash(getSchema())):
+        return None
+    return compiled
+
+# 解析XML树，并建立节点索引
+# 分片存储时，将各个模板文件合并为一棵XML树
+def __parseTree(path):
+    __store['chunks'] = {}
+    __store['files'] = {}
+    if isSharded(path):
+        folder = __getShardFolder(path)
+        root = ET.Element('templates')
+        for fileName in __readShardIndex(path):
+            templateNode = ET.parse(
+                os.path.join(folder,fileName)).getroot()
+            root.append(templateNode)
+            __store['files'][templateNode] = fileName
+        tree = ET.ElementTree(root)
+    else:
+        tree = ET.parse(path)
+    __store['tree'] = tree
+    __store['nodes'] = __indexNodes(tree)
+    return tree
+
+# 获取编译后的模板库
+# 依次从内存、编译缓存、XML中获取，XML变化时自动重新编译
+def __getCompiled(path):
+    stat = __getStat(path)
+    if (__store['path'] == path
+        and __store['stat'] == stat
+        and __store['compiled'] != None):
+        return __store['compiled']
+
+    # 文件发生变化，原来的XML树失效
+    __store['path'] = path
+    __store['stat'] = stat
+    __store['tree'] = None
+    __store['nodes'] = {}
+    compiled = __readCompiled(path,stat)
+    if compiled == None:
+        tree = __parseTree(path)
+        compiled = __compileTree(tree,stat)
+        __writeCompiled(path,compiled)
+    __store['compiled'] = compiled
+    return compiled
+
+# 获取模板库，包括可编辑的XML树
+# 用于保存、删除模板
+def getStore(path):
+    __getCompiled(path)
+    if __store['tree'] == None:
+        __parseTree(path)
+    return __store
+
+# 获取模板名称列表
+def getTemplateNames(path):
+    return list(__getCompiled(path)['names'])
+
+# 获取模板的XML节点
+def getTemplateNode(path,templateName):
+    return getStore(path)['nodes'].get(templateName)
+
+# 获取组合模板的子模板列表
+def getTemplateChildren(path,templateName):
+    children = __getCompiled(path)['children']
+    return list(children.get(templateName,[]))
+
+# 获取模板类型
+def getTemplateType(path,templateName):
+    # 有些模板没有这个类型值，默认置为普通building
+    types = __getCompiled(path)['types']
+    return types.get(templateName,con.ACA_TYPE_BUILDING)
+
+# 获取类型转换后的模板参数
+# 返回{属性名:值}，保持XML中的顺序
+# 返回的dict为共享的缓存，调用方不应修改
+def getTemplateParams(path,templateName):
+    return __getCompiled(path)['params'].get(templateName)
+
+# 序列化单个根模板
+# 仅在模板修改后重新序列化，其他模板沿用缓存
+def __serialize(templateNode):
+    chunk = __store['chunks'].get(templateNode)
+    if chunk != None:
+        return chunk
+    # 缩进美化，与整个模板库缩进时的格式一致
+    ET.indent(templateNode, space="\t", level=1)
+    tail = templateNode.tail
+    templateNode.tail = None
+    chunk = ET.tostring(templateNode,encoding='unicode').encode('utf-8')
+    templateNode.tail = tail
+    __store['chunks'][templateNode] = chunk
+    return chunk
+
+# 写入整个模板库文件
+# 每个模板的序列化结果已缓存，仅做拼接
+def __writeSingleFile(path):
+    root = __store['tree'].getroot()
+    parts = [b"<?xml version='1.0' encoding='UTF-8'?>\n",
+             b'<' + root.tag.encode('utf-8') + b'>\n']
+    for templateNode in root:
+        parts.append(b'\t' + __serialize(templateNode) + b'\n')
+    parts.append(b'</' + root.tag.encode('utf-8') + b'>')
+    atomicFile.writeAtomic(path,b''.join(parts))
+    return
+
+# 写入分片索引
+def __writeShardIndex(path):
+    root = __store['tree'].getroot()
+    files = [__store['files'][templateNode] for templateNode in root]
+    data = json.dumps({'files':files},ensure_ascii=False,indent='\t')
+    atomicFile.writeAtomic(__getShardIndex(path),data.encode('utf-8'))
+    return
+
+# 为模板分配分片文件名
+# 去除文件名中的非法字符，重名时加序号
+def __newShardName(templateNode):
+    name = __getName(templateNode) or 'template'
+    for char in '\\/:*?"<>|':
+        name = name.replace(char,'_')
+    used = set(__store['files'].values())
+    fileName = name + '.xml'
+    n = 1
+    while fileName in used:
+        fileName = '%s.%03d.xml' % (name,n)
+        n += 1
+    return fileName
+
+# 写入单个模板的分片文件
+def __writeShard(path,templateNode):
+    data = (b"<?xml version='1.0' encoding='UTF-8'?>\n"
+            + __serialize(templateNode))
+    fileName = __store['files'][templateNode]
+    atomicFile.writeAtomic(os.path.join(__getShardFolder(path),fileName),data)
+    return
+
+# 查找模板所在的根模板
+# 组合模板的子模板，保存时需要写入整个组合模板
+def __getRootNode(templateNode):
+    for rootNode in __store['tree'].getroot():
+        if rootNode is templateNode:
+            return rootNode
+        for childNode in rootNode.iter('template'):
+            if childNode is templateNode:
+                return rootNode
+    return None
+
+# 保存修改后的模板
+# templateNode为已在XML树中修改或新增的模板节点
+def saveTemplateNode(path,templateNode):
+    rootNode = __getRootNode(templateNode)
+    # 仅该模板需要重新序列化
+    __store['chunks'].pop(rootNode,None)
+    if isSharded(path):
+        if rootNode in __store['files']:
+            __writeShard(path,rootNode)
+        else:
+            # 新增模板，先写入模板文件，再更新索引
+            __store['files'][rootNode] = __newShardName(rootNode)
+            __writeShard(path,rootNode)
+            __writeShardIndex(path)
+    else:
+        __writeSingleFile(path)
+    refresh(path,rootNode)
+    return
+
+# 删除模板
+def removeTemplateNode(path,templateNode):
+    root = __store['tree'].getroot()
+    root.remove(templateNode)
+    __store['chunks'].pop(templateNode,None)
+    if isSharded(path):
+        # 先更新索引，再删除模板文件
+        fileName = __store['files'].pop(templateNode)
+        __writeShardIndex(path)
+        os.remove(os.path.join(__getShardFolder(path),fileName))
+    else:
+        __writeSingleFile(path)
+    refresh(path)
+    return
+
+# 将模板库拆分为分片存储
+# 拆分后template.xml不再使用，仅做备份
+def splitTemplates(path):
+    store = getStore(path)
+    folder = __getShardFolder(path)
+    os.makedirs(folder,exist_ok=True)
+    for templateNode in store['tree'].getroot():
+        store['files'][templateNode] = __newShardName(templateNode)
+        __writeShard(path,templateNode)
+    # 最后写入索引，此前中断时仍使用template.xml
+    __writeShardIndex(path)
+    refresh(path)
+    return
+
+# 将模板参数一次性写入bData
+# 替代逐个属性的bData[tag]=value
+def applyParams(bData:acaData,params):
+    bData.id_properties_ensure().update(params)
+    return
+
+# 模板修改后更新索引
+# 在保存、删除模板，并写入文件后调用
+# dirtyNode为修改的根模板，其他模板沿用原来的编译结果
+# 删除模板时不传入，所有剩余模板均沿用原来的编译结果
+def refresh(path,dirtyNode=None):
+    tree = __store['tree']
+    stat = __getStat(path)
+    __store['path'] = path
+    __store['stat'] = stat
+    __store['nodes'] = __indexNodes(tree)
+    # 直接从内存中的XML树重新编译，无需重新解析
+    oldParams = None
+    dirtyNodes = set()
+    if __store['compiled'] != None:
+        oldParams = __store['compiled']['params']
+    if dirtyNode != None:
+        dirtyNodes = set(dirtyNode.iter('template'))
+    compiled = __compileTree(tree,stat,oldParams,dirtyNodes)
+    __writeCompiled(path,compiled)
+    __store['compiled'] = compiled
+    return
@@ -0,0 +1,12 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   pytest插件，由pytest.ini载入
+#   插件目录带有__init__.py，pytest会将其作为包收集，
+#   并在运行测试前导入插件包，而插件包需要bpy，脱离blender时无法导入
+#   这里将插件目录作为普通目录收集，测试仅按文件载入不依赖bpy的模块
+import pytest
+
+def pytest_collect_directory(path, parent):
+    if path == parent.config.rootpath:
+        return pytest.Dir.from_parent(parent, path=path)
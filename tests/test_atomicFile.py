@@ -0,0 +1,57 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   原子写入的测试
+#   atomicFile仅依赖标准库，直接按文件载入，不经过插件包（插件包需要bpy）
+#   用法：在插件目录下运行python -m pytest，或直接python tests/test_atomicFile.py
+import os
+import stat
+import tempfile
+import importlib.util
+
+__path = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'atomicFile.py')
+__spec = importlib.util.spec_from_file_location('atomicFile',__path)
+atomicFile = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(atomicFile)
+
+def __getMode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_write_content():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,'template.xml')
+        atomicFile.writeAtomic(path,b'<templates/>')
+        with open(path,'rb') as f:
+            assert f.read() == b'<templates/>'
+        # 不残留临时文件
+        assert os.listdir(folder) == ['template.xml']
+
+def test_mode_survives_save():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,'template.xml')
+        with open(path,'wb') as f:
+            f.write(b'old')
+        os.chmod(path,0o664)
+        atomicFile.writeAtomic(path,b'new')
+        assert __getMode(path) == 0o664
+        os.chmod(path,0o640)
+        atomicFile.writeAtomic(path,b'newer')
+        assert __getMode(path) == 0o640
+
+def test_new_file_follows_umask():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder,'template.compiled.json')
+        umask = os.umask(0o022)
+        try:
+            atomicFile.writeAtomic(path,b'{}')
+        finally:
+            os.umask(umask)
+        assert __getMode(path) == 0o644
+
+if __name__ == "__main__":
+    for name,func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print("passed: " + name)
@@ -0,0 +1,71 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   瓦片定位计算的测试
+#   tileFrame仅依赖numpy，直接按文件载入，不经过插件包（插件包需要bpy）
+#   用法：在插件目录下运行python -m pytest，或直接python tests/test_tileFrame.py
+import os
+import importlib.util
+import numpy as np
+
+__path = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tileFrame.py')
+__spec = importlib.util.spec_from_file_location('tileFrame',__path)
+tileFrame = importlib.util.module_from_spec(__spec)
+__spec.loader.exec_module(tileFrame)
+
+# 瓦片长、宽、高
+TILE_ARGS = (0.3,0.4,0.05)
+
+def __compare(rows,cols,**kwargs):
+    co,loopVerts,loopStart,loopTotal = tileFrame.makeGrid(rows,cols)
+    args = (co,loopVerts,loopStart,loopTotal,cols) + TILE_ARGS
+    frames,tileClass = tileFrame.getTileFrames(*args,**kwargs)
+    framesLoop = tileFrame.getTileFramesLoop(*args,**kwargs)
+    assert frames.shape == (rows*cols,4,4)
+    assert np.allclose(frames,framesLoop)
+    return frames,tileClass
+
+def test_frames_match_loop():
+    __compare(5,7)
+    __compare(12,31)
+
+def test_frames_match_loop_gable():
+    # 两山的瓦面，瓦片走向取第二条边，沿X轴缩放
+    __compare(5,7,dirIndex=1,direction='Y')
+
+def test_frames_match_loop_edge_verts():
+    # 定位边的顶点顺序可能与面的顶点顺序相反
+    rows,cols = 5,7
+    co,loopVerts,loopStart,loopTotal = tileFrame.makeGrid(rows,cols)
+    edgeVerts = np.stack((
+        loopVerts[loopStart+1],loopVerts[loopStart]),axis=1)
+    __compare(rows,cols,edgeVerts=edgeVerts)
+
+def test_shear_is_dropped():
+    # 起翘的瓦面上，按网格长度缩放后的矩阵带有剪切
+    # 定位矩阵应为旋转乘以缩放，各列相互正交
+    frames,tileClass = __compare(5,7)
+    mats = frames[:,:3,:3]
+    gram = np.einsum('nki,nkj->nij',mats,mats)
+    offDiag = gram - np.einsum('nii->ni',gram)[:,:,None]*np.eye(3)
+    assert np.allclose(offDiag,0)
+
+def test_tile_class():
+    rows,cols = 5,7
+    frames,tileClass = __compare(rows,cols)
+    first = tileClass[:cols]
+    assert list(first) == [tileFrame.TILE_DRIP,tileFrame.TILE_EAVE]*3 \
+                          + [tileFrame.TILE_DRIP]
+    body = tileClass[cols:].reshape((rows-1,cols))
+    assert np.all(body[:,1::2] == tileFrame.TILE_CIRCULAR)
+    assert np.all(body[:,0:-1:2] == tileFrame.TILE_FLAT)
+    # 最后一列不摆放板瓦
+    assert np.all(body[:,-1] == tileFrame.TILE_NONE)
+
+if __name__ == "__main__":
+    for name,func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print("passed: " + name)
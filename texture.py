@@ -5,6 +5,7 @@
 import bpy
 import bmesh
 import math
+import numpy as np
 from mathutils import Vector
 
 from . import utils
@@ -93,6 +94,7 @@ def UvUnwrap(object:bpy.types.Object,
              scaleToBounds = False,
              remainSelect = False,
              onlyActiveMat = False,
+             onlyMatIndex = None,
              ):   
     # 隐藏对象不重新展UV
     if (object.hide_viewport 
@@ -121,20 +123,20 @@ def UvUnwrap(object:bpy.types.Object,
 
     # 仅针对活跃材质active material
     if onlyActiveMat:
-        bm = bmesh.new()
-        bm.from_mesh(object.data)
-        for face in bm.faces:
-            face.select = False
-            if face.material_index == object.active_material_index:
-                face.select = True
-        bm.to_mesh(object.data)
-        bm.free()
+        onlyMatIndex = [object.active_material_index]
+    # 仅针对指定的材质，直接批量写入面的选择状态
+    if onlyMatIndex != None:
+        mesh = object.data
+        matIndex = np.empty(len(mesh.polygons),dtype=np.int32)
+        mesh.polygons.foreach_get('material_index',matIndex)
+        mesh.polygons.foreach_set('select',
+            np.isin(matIndex,onlyMatIndex))
 
     # 进入编辑模式
     bpy.ops.object.mode_set(mode = 'EDIT') 
     bpy.ops.mesh.select_mode(type = 'FACE')
     if (not remainSelect
-        and not onlyActiveMat):
+        and onlyMatIndex == None):
         bpy.ops.mesh.select_all(action='SELECT')
 
     if type == None:
@@ -491,7 +493,7 @@ def __setPillerHead(pillerObj:bpy.types.Object,
             + con.EFANG_SMALL_H*dk)
     # 裁切柱头
     pCut = pillerObj.matrix_world @ Vector((
-        0,0,pillerObj.dimensions.z-fangHeight))
+        0,0,utils.getDimensions(pillerObj).z-fangHeight))
     utils.addBisect(
         object=pillerBodyObj,
         pCut=pCut,
@@ -509,7 +511,7 @@ def __setPillerHead(pillerObj:bpy.types.Object,
 
     # 裁切柱顶（剪掉顶面，只保留圆筒形状，做贴图）
     pCut = pillerObj.matrix_world @ Vector((
-        0,0,pillerObj.dimensions.z-0.02))
+        0,0,utils.getDimensions(pillerObj).z-0.02))
     utils.addBisect(
         object=pillerTopObj,
         pCut=pCut,
@@ -636,7 +638,7 @@ def __setFangMat(fangObj:bpy.types.Object,
         matID = 0
 
     # 判断额枋长度
-    fangLength = fangObj.dimensions.x
+    fangLength = utils.getDimensions(fangObj).x
     if fangLength < 1.8:
         # 超短款
         matID += 3
@@ -717,8 +719,8 @@ def __setYOUE(youeObj:bpy.types.Object,
 
     # 3、中段的mesh缩放
     a = 0.463       # 箍头长度
-    l1 = mat.dimensions.x
-    l2 = youeNewObj.dimensions.x
+    l1 = utils.getDimensions(mat).x
+    l2 = utils.getDimensions(youeNewObj).x
     x1 = l1 - a*2
     x2 = l2 - a*2
     scale = (x2/l2)/(x1/l1)
@@ -759,7 +761,7 @@ def __setDgBoard(dgBoardObj:bpy.types.Object,
     bData:acaData = buildingObj.ACA_data
     
     # 计算斗栱攒数
-    totalLength = dgBoardObj.dimensions.x
+    totalLength = utils.getDimensions(dgBoardObj).x
     # 补偿float精度
     totalLength += 0.001
     # 向下取整，宜疏不宜密（与builddougong.__buildDougong方法统一）
@@ -771,10 +773,10 @@ def __setDgBoard(dgBoardObj:bpy.types.Object,
     for n in range(count):
         newDgBoard = utils.copySimplyObject(mat)
         # 适配原栱垫板的尺寸（可能斗口不同）
-        newDgBoard.dimensions = (
+        utils.setDimensions(newDgBoard,(
             boardLength,
-            dgBoardObj.dimensions.y,
-            dgBoardObj.dimensions.z)
+            utils.getDimensions(dgBoardObj).y,
+            utils.getDimensions(dgBoardObj).z))
         # 后续会将新的栱垫板替换旧的栱垫板
         # 所以location应该是相对旧的栱垫板的定位
         # 所以y=z=0
@@ -819,7 +821,7 @@ def __paintFrontBack(paintObj:bpy.types.Object,
     bm.free()
 
     # 更新UV，适配对象高度的满铺
-    cubeHeight = paintObj.dimensions.z
+    cubeHeight = utils.getDimensions(paintObj).z
     UvUnwrap(paintObj,
              type=uvType.CUBE,
              cubesize=cubeHeight)
@@ -849,7 +851,7 @@ def __paintAround(fangObj:bpy.types.Object,
     bm.free()
 
     # 更新UV，适配对象高度的满铺
-    cubeHeight = fangObj.dimensions.z
+    cubeHeight = utils.getDimensions(fangObj).z
     UvUnwrap(fangObj,
              type=uvType.CUBE,
              cubesize=cubeHeight)
@@ -925,7 +927,7 @@ def __setShanhua(shanhuaObj:bpy.types.Object,
     aData:tmpData = bpy.context.scene.ACA_temp
     dk = bData.DK
     scale = dk / con.DEFAULT_DK
-    ridgeHeight = aData.ridgeFront_source.dimensions.z * scale
+    ridgeHeight = utils.getDimensions(aData.ridgeFront_source).z * scale
     # 裁剪一个博脊高度，并调整1/4桁径
     offset = (
             con.ROOFMUD_H*dk      # 灰泥
@@ -992,18 +994,15 @@ def __replaceSlot(obj:bpy.types.Object,
     bm.free()
     return
 
-# 根据琉璃瓦作配色
-# 根据用户从panel上选择的bData.tile_style，切换obj的材质slot
-# 0-黄琉璃
-# 1-黄琉璃绿剪边
-# 2-绿琉璃
-# 3-绿琉璃黄剪边
-def setGlazeStyle(paintObj:bpy.types.Object,
-                  resetUV=True):
+# 计算琉璃瓦作配色的材质slot切换
+# 根据对象网格名称，判断属于哪一类琉璃构件
+# 返回依次执行的slot切换列表[(原slot,新slot),...]，以及活跃材质编号
+def __getGlazeSlots(paintName:str,
+                    bData:acaData):
     # 载入数据
     aData:tmpData = bpy.context.scene.ACA_temp
-    buildingObj,bData,objData = utils.getRoot(paintObj)
-    paintName = paintObj.data.name
+    slotList = []
+    activeIndex = None
 
     # 1、瓦面（筒瓦/板瓦）颜色
     tileColorIndex = int(bData.tile_color) 
@@ -1014,8 +1013,8 @@ def setGlazeStyle(paintObj:bpy.types.Object,
     for obj in glazeMain:
         if obj.data.name in paintName:
             # 配色从slot0切换到slot1
-            __replaceSlot(paintObj,0,tileColorIndex)
-            paintObj.active_material_index = tileColorIndex
+            slotList.append((0,tileColorIndex))
+            activeIndex = tileColorIndex
 
     # 2、剪边/屋脊的颜色
     # 2.1、单一材质
@@ -1041,9 +1040,8 @@ def setGlazeStyle(paintObj:bpy.types.Object,
     for obj in glazeList1:
         if obj.data.name in paintName:
             # 配色从slot0切换到slot1
-            __replaceSlot(
-                paintObj,0,tileAltColorIndex)
-            paintObj.active_material_index = tileAltColorIndex
+            slotList.append((0,tileAltColorIndex))
+            activeIndex = tileAltColorIndex
     # 2.2、两个材质
     glazeList2 = [
         aData.dripTile_source,      # 滴水
@@ -1054,24 +1052,127 @@ def setGlazeStyle(paintObj:bpy.types.Object,
     for obj in glazeList2:
         if obj.data.name in paintName:
             # 两个材质切换到绿色
-            __replaceSlot(
-                paintObj,0,tileAltColorIndex*2)
-            __replaceSlot(
-                paintObj,1,tileAltColorIndex*2+1)
-            paintObj.active_material_index = tileAltColorIndex*2
+            slotList.append((0,tileAltColorIndex*2))
+            slotList.append((1,tileAltColorIndex*2+1))
+            activeIndex = tileAltColorIndex*2
+
+    return slotList,activeIndex
+
+# 根据琉璃瓦作配色
+# 根据用户从panel上选择的bData.tile_style，切换obj的材质slot
+# 0-黄琉璃
+# 1-黄琉璃绿剪边
+# 2-绿琉璃
+# 3-绿琉璃黄剪边
+def setGlazeStyle(paintObj:bpy.types.Object,
+                  resetUV=True):
+    # 载入数据
+    buildingObj,bData,objData = utils.getRoot(paintObj)
+    slotList,activeIndex = __getGlazeSlots(
+        paintObj.data.name,bData)
+    for fromSlot,toSlot in slotList:
+        __replaceSlot(paintObj,fromSlot,toSlot)
+    if activeIndex != None:
+        paintObj.active_material_index = activeIndex
 
     # 重新展UV，在modifier的基础上平铺
     if resetUV:
         setGlazeUV(paintObj)
     return
 
+# 琉璃瓦作配色的数组版本
+# 仅切换面的材质编号，不涉及UV，也不需要对象
+# 用于瓦面等批量生成的网格，在合并后统一展UV
+def setGlazeSlots(matIndex,
+                  paintName:str,
+                  bData:acaData):
+    matIndex = matIndex.copy()
+    slotList,activeIndex = __getGlazeSlots(paintName,bData)
+    for fromSlot,toSlot in slotList:
+        matIndex[matIndex == fromSlot] = toSlot
+    return matIndex
+
+# 计算网格各个面的UV面积
+# 按鞋带公式，对每个面的loop逐边累加
+def __getPolyUVArea(mesh:bpy.types.Mesh):
+    uv = np.empty(len(mesh.loops)*2,dtype=np.float64)
+    mesh.uv_layers.active.data.foreach_get('uv',uv)
+    uv = uv.reshape(-1,2)
+    loopStart = np.empty(len(mesh.polygons),dtype=np.int64)
+    mesh.polygons.foreach_get('loop_start',loopStart)
+    loopTotal = np.empty(len(mesh.polygons),dtype=np.int64)
+    mesh.polygons.foreach_get('loop_total',loopTotal)
+    # 每个loop的下一个loop，面的最后一个loop回到第一个
+    nextLoop = np.arange(len(uv)) + 1
+    nextLoop[loopStart+loopTotal-1] = loopStart
+    cross = (uv[:,0]*uv[nextLoop,1] 
+             - uv[nextLoop,0]*uv[:,1])
+    return np.abs(np.add.reduceat(cross,loopStart))/2
+
+# 指定材质的面，matIndex为None时为所有的面
+def __getMatSelect(mesh:bpy.types.Mesh,matIndex=None):
+    if matIndex == None:
+        return np.ones(len(mesh.polygons),dtype=bool)
+    polyMat = np.empty(len(mesh.polygons),dtype=np.int32)
+    mesh.polygons.foreach_get('material_index',polyMat)
+    return np.isin(polyMat,matIndex)
+
+# 计算指定材质面的几何面积
+def getFaceArea(mesh:bpy.types.Mesh,
+                matIndex = None):
+    polyArea = np.empty(len(mesh.polygons),dtype=np.float64)
+    mesh.polygons.foreach_get('area',polyArea)
+    return polyArea[__getMatSelect(mesh,matIndex)].sum()
+
+# 计算指定材质面的UV密度，即单位长度对应的UV长度
+# 以UV面积与几何面积之比的平方根计算
+# 没有对应的面，或没有UV时返回None
+def getUVDensity(mesh:bpy.types.Mesh,
+                 matIndex = None):
+    if (len(mesh.polygons) == 0
+        or mesh.uv_layers.active == None):
+        return None
+    area = getFaceArea(mesh,matIndex)
+    uvArea = __getPolyUVArea(mesh)[
+        __getMatSelect(mesh,matIndex)].sum()
+    if area <= 0 or uvArea <= 0:
+        return None
+    return math.sqrt(uvArea/area)
+
+# 将指定材质面的UV缩放到给定的密度
+# smart project会将所有的UV岛缩放到0~1范围内，
+# 导致UV密度随网格大小变化：单片瓦与合并的整个瓦面密度不同
+# 用于将瓦片实例的资源对象缩放到与合并瓦面一致
+def setUVDensity(mesh:bpy.types.Mesh,
+                 density,
+                 matIndex = None):
+    current = getUVDensity(mesh,matIndex)
+    if current == None or density == None:
+        return
+    loopTotal = np.empty(len(mesh.polygons),dtype=np.int64)
+    mesh.polygons.foreach_get('loop_total',loopTotal)
+    # loop与面一一对应展开
+    isSelect = np.repeat(__getMatSelect(mesh,matIndex),loopTotal)
+    uvLayer = mesh.uv_layers.active
+    uv = np.empty(len(mesh.loops)*2,dtype=np.float32)
+    uvLayer.data.foreach_get('uv',uv)
+    uv = uv.reshape(-1,2)
+    uv[isSelect] *= density/current
+    uvLayer.data.foreach_set('uv',uv.ravel())
+    mesh.update()
+    return
+
 # 对琉璃对象重展开UV
 # 在对象应用了modifier的基础上，进行材质的平铺
+# 默认仅处理活跃材质，也可以通过matIndex指定多个材质
 def setGlazeUV(paintObj:bpy.types.Object,
-    uvType = uvType.CUBE):
+    uvType = uvType.CUBE,
+    matIndex = None):
+    if matIndex == None:
+        matIndex = [paintObj.active_material_index]
     UvUnwrap(
         object=paintObj,
         type=uvType,
         cubesize=200,
-        onlyActiveMat=True)
+        onlyMatIndex=matIndex)
     return
\ No newline at end of file
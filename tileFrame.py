@@ -0,0 +1,320 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   瓦面网格上的瓦片定位计算
+#   仅依赖numpy，不依赖bpy，可以脱离blender做测试和性能比较
+#   输入瓦面网格的顶点坐标和面索引，一次性批量计算每个面上瓦片的变换矩阵，
+#   以及该面摆放的瓦片类型（板瓦、筒瓦、滴水、瓦当）
+#   直接运行本文件，可以对比逐面循环与批量计算的耗时：
+#   python tileFrame.py [面数]
+import numpy as np
+
+# float32的机器精度，与blender的FLT_EPSILON一致
+FLT_EPSILON = 1.1920929e-07
+
+# 瓦片类型
+TILE_NONE = 0       # 不摆放
+TILE_FLAT = 1       # 板瓦
+TILE_CIRCULAR = 2   # 筒瓦
+TILE_DRIP = 3       # 滴水
+TILE_EAVE = 4       # 瓦当（勾头）
+
+# 计算各个面的法线（Newell算法，与bmesh的face.normal一致）
+def getPolyNormals(co,loopVerts,loopStart,loopTotal):
+    # 每个loop的下一个loop，面的最后一个loop回到起点
+    nextLoop = np.arange(len(loopVerts)) + 1
+    lastLoop = loopStart + loopTotal - 1
+    nextLoop[lastLoop] = loopStart
+    cross = np.cross(co[loopVerts], co[loopVerts[nextLoop]])
+    normals = np.add.reduceat(cross, loopStart, axis=0)
+    length = np.linalg.norm(normals, axis=1)
+    length[length == 0] = 1
+    return normals / length[:,None]
+
+# 计算各个面的几何中心（与bmesh的calc_center_median一致）
+def getPolyCenters(co,loopVerts,loopStart,loopTotal):
+    total = np.add.reduceat(
+        co[loopVerts], loopStart, axis=0)
+    return total / loopTotal[:,None]
+
+# 由XYZ欧拉角生成旋转矩阵
+def eulerToMatrix(euler):
+    cx,cy,cz = np.cos(euler).T
+    sx,sy,sz = np.sin(euler).T
+    rot = np.empty((len(euler),3,3))
+    rot[:,0,0] = cy*cz
+    rot[:,0,1] = sx*sy*cz - cx*sz
+    rot[:,0,2] = cx*sy*cz + sx*sz
+    rot[:,1,0] = cy*sz
+    rot[:,1,1] = sx*sy*sz + cx*cz
+    rot[:,1,2] = cx*sy*sz - sx*cz
+    rot[:,2,0] = -sy
+    rot[:,2,1] = sx*cy
+    rot[:,2,2] = cx*cy
+    return rot
+
+# 批量分解3x3矩阵为XYZ欧拉角和缩放
+# 与对象赋值matrix_local/matrix_basis时的分解方式一致，
+# 即缩放取各轴长度，剪切被丢弃
+def matrixToEuler(mats):
+    size = np.linalg.norm(mats, axis=1)
+    m = mats / size[:,None,:]
+    # 参考blender的mat3_normalized_to_eul2，取两组解中较小的一组
+    cy = np.hypot(m[:,0,0], m[:,1,0])
+    eul1 = np.stack((
+        np.arctan2(m[:,2,1], m[:,2,2]),
+        np.arctan2(-m[:,2,0], cy),
+        np.arctan2(m[:,1,0], m[:,0,0])),axis=1)
+    eul2 = np.stack((
+        np.arctan2(-m[:,2,1], -m[:,2,2]),
+        np.arctan2(-m[:,2,0], -cy),
+        np.arctan2(-m[:,1,0], -m[:,0,0])),axis=1)
+    degenerate = cy <= 16*FLT_EPSILON
+    if np.any(degenerate):
+        eulD = np.stack((
+            np.arctan2(-m[:,1,2], m[:,1,1]),
+            np.arctan2(-m[:,2,0], cy),
+            np.zeros(len(m))),axis=1)
+        eul1[degenerate] = eulD[degenerate]
+        eul2[degenerate] = eulD[degenerate]
+    useEul2 = (np.abs(eul1).sum(axis=1)
+               > np.abs(eul2).sum(axis=1))
+    euler = np.where(useEul2[:,None], eul2, eul1)
+    return euler, size
+
+# 批量分解3x3矩阵为旋转和缩放
+# 旋转经过一次XYZ欧拉角转换，与blender的处理一致
+def decomposeMatrix(mats):
+    euler, size = matrixToEuler(mats)
+    return eulerToMatrix(euler), size
+
+# 由位置、旋转、缩放组合4x4矩阵
+def composeMatrix(loc, rot, size):
+    mats = np.zeros((len(loc),4,4))
+    mats[:,:3,:3] = rot * size[:,None,:]
+    mats[:,:3,3] = loc
+    mats[:,3,3] = 1
+    return mats
+
+# 按网格面的编号区分瓦片类型
+# 瓦面网格按行排列，第一行为檐口
+def getTileClass(faceCount,gridCols):
+    faceIndex = np.arange(faceCount)
+    faceCol = faceIndex % gridCols
+    tileClass = np.full(faceCount,TILE_NONE,dtype=np.int8)
+    # 241113 修正bug：原来的筒板瓦排布时从檐口的瓦面face开始计算，
+    # 实际上第一行应该是勾头滴水的normal，筒板瓦应该从第二行的face开始计算
+    isBody = faceIndex >= gridCols
+    # 排布板瓦，仅在偶数列排布
+    # 不做最后一列板瓦，以免与排山勾滴重叠
+    tileClass[isBody
+              & (faceCol % 2 == 0)
+              & (faceCol != gridCols-1)] = TILE_FLAT
+    # 排布筒瓦，奇数列排布
+    tileClass[isBody & (faceCol % 2 == 1)] = TILE_CIRCULAR
+    # 排布檐口瓦，第一行
+    tileClass[~isBody & (faceIndex % 2 == 0)] = TILE_DRIP
+    tileClass[~isBody & (faceIndex % 2 == 1)] = TILE_EAVE
+    return tileClass
+
+# 批量计算瓦面网格上各个面的瓦片定位矩阵
+# co：(V,3)顶点坐标
+# loopVerts/loopStart/loopTotal：面的顶点索引，与mesh.polygons一致
+# edgeVerts：(N,2)各面定位边的顶点，即面上第dirIndex条边的两个顶点
+#   为None时按面的顶点顺序取
+# 返回(N,4,4)的瓦片变换矩阵，以及(N,)的瓦片类型
+def getTileFrames(co,
+                  loopVerts,
+                  loopStart,
+                  loopTotal,
+                  gridCols,
+                  tileLength,
+                  tileWidth,
+                  tileHeight,
+                  dirIndex=0,
+                  direction='X',
+                  edgeVerts=None):
+    co = np.asarray(co,dtype=np.float64)
+    if edgeVerts is None:
+        edgeVerts = np.stack((
+            loopVerts[loopStart + dirIndex],
+            loopVerts[loopStart + (dirIndex+1) % loopTotal]),axis=1)
+    # 基于edge，构造Matrix变换矩阵，用于瓦片的定位
+    # https://blender.stackexchange.com/questions/177218/make-bone-roll-match-a-face-vertex-normal/177331#177331
+    edgeVec = co[edgeVerts[:,1]] - co[edgeVerts[:,0]]
+    cellLength = np.linalg.norm(edgeVec, axis=1)
+    # 边的向量(归一化)，做为Y轴
+    y = edgeVec / cellLength[:,None]
+    # 面的法线，做为Z轴
+    z = getPolyNormals(co,loopVerts,loopStart,loopTotal)
+    # Y/Z轴做叉积，得到与之垂直的X轴
+    x = np.cross(y, z)
+    # 以XYZ为列构造矩阵
+    M = np.stack((x,y,z), axis=2)
+    # 250116 按照网格长度缩放筒板瓦
+    scale_factor = cellLength/tileLength
+    if direction=='X':
+        M[:,1,:] *= scale_factor[:,None]
+    else:
+        M[:,0,:] *= scale_factor[:,None]
+    # 与赋值matrix_local时的分解方式保持一致
+    rot, size = decomposeMatrix(M)
+
+    # 瓦片类型
+    tileClass = getTileClass(len(M),gridCols)
+
+    # 250116 瓦片布在网格几何中心，
+    # 并对齐筒瓦顶面，以避免卷棚顶筒瓦的间隙
+    # 筒板瓦对齐网格的下沿，滴水瓦当对齐网格的上沿
+    offset = np.empty((len(M),3))
+    if direction=='X':
+        offset[:,0] = tileWidth/4
+    else:
+        offset[:,0] = -tileWidth/4
+    isHead = (tileClass == TILE_DRIP) | (tileClass == TILE_EAVE)
+    offset[:,1] = np.where(isHead,cellLength/2,-cellLength/2)
+    offset[:,2] = -tileHeight
+    # 坐标系原点放在几何面的中心
+    center = getPolyCenters(co,loopVerts,loopStart,loopTotal)
+    frames = composeMatrix(
+        center + np.einsum('nij,nj->ni', rot, offset),
+        rot, size)
+    return frames, tileClass
+
+# 以下仅用于测试和性能比较
+# 逐面循环的计算方式，与原来基于bmesh的实现一致：
+# 按面构造定位矩阵后赋值给瓦片对象的matrix_local，
+# blender将其分解为位置、XYZ欧拉角和缩放（剪切被丢弃），
+# 再将偏移量按欧拉角旋转后叠加到位置上
+# 这里逐面以标量运算复现该过程，不复用上面的批量函数
+
+# 3x3矩阵（已按列归一化）转XYZ欧拉角
+# 参考blender的mat3_normalized_to_eul，取两组解中较小的一组
+def __matrixToEulerLoop(m):
+    import math
+    cy = math.hypot(m[0][0], m[1][0])
+    if cy > 16*FLT_EPSILON:
+        eul1 = (math.atan2(m[2][1], m[2][2]),
+                math.atan2(-m[2][0], cy),
+                math.atan2(m[1][0], m[0][0]))
+        eul2 = (math.atan2(-m[2][1], -m[2][2]),
+                math.atan2(-m[2][0], -cy),
+                math.atan2(-m[1][0], -m[0][0]))
+    else:
+        eul1 = (math.atan2(-m[1][2], m[1][1]),
+                math.atan2(-m[2][0], cy),
+                0.0)
+        eul2 = eul1
+    if sum(abs(a) for a in eul1) > sum(abs(a) for a in eul2):
+        return eul2
+    return eul1
+
+# XYZ欧拉角转3x3矩阵，参考blender的eul_to_mat3
+def __eulerToMatrixLoop(euler):
+    import math
+    ci,cj,ch = (math.cos(a) for a in euler)
+    si,sj,sh = (math.sin(a) for a in euler)
+    cc,cs = ci*ch, ci*sh
+    sc,ss = si*ch, si*sh
+    return np.array((
+        (cj*ch, sj*sc-cs, sj*cc+ss),
+        (cj*sh, sj*ss+cc, sj*cs-sc),
+        (-sj,   cj*si,    cj*ci)))
+
+def getTileFramesLoop(co,
+                      loopVerts,
+                      loopStart,
+                      loopTotal,
+                      gridCols,
+                      tileLength,
+                      tileWidth,
+                      tileHeight,
+                      dirIndex=0,
+                      direction='X',
+                      edgeVerts=None):
+    co = np.asarray(co,dtype=np.float64)
+    frames = []
+    for n in range(len(loopStart)):
+        start,total = loopStart[n],loopTotal[n]
+        verts = co[loopVerts[start:start+total]]
+        # 取面上第dirIndex条边
+        if edgeVerts is None:
+            v0 = loopVerts[start + dirIndex]
+            v1 = loopVerts[start + (dirIndex+1) % total]
+        else:
+            v0,v1 = edgeVerts[n]
+        y = co[v1] - co[v0]
+        cellLength = np.linalg.norm(y)
+        y = y / cellLength
+        z = np.sum(np.cross(verts,np.roll(verts,-1,axis=0)),axis=0)
+        z = z / np.linalg.norm(z)
+        x = np.cross(y,z)
+        M = np.column_stack((x,y,z))
+        if direction=='X':
+            M = np.diag((1,cellLength/tileLength,1)) @ M
+        else:
+            M = np.diag((cellLength/tileLength,1,1)) @ M
+        # 赋值matrix_local：缩放取各列的长度，旋转转为欧拉角
+        size = np.linalg.norm(M,axis=0)
+        euler = __matrixToEulerLoop(M / size)
+        rot = __eulerToMatrixLoop(euler)
+        # 偏移量按欧拉角旋转后叠加到位置上
+        offsetX = tileWidth/4 if direction=='X' else -tileWidth/4
+        if n < gridCols:
+            offset = (offsetX,cellLength/2,-tileHeight)
+        else:
+            offset = (offsetX,-cellLength/2,-tileHeight)
+        frame = np.identity(4)
+        frame[:3,:3] = rot * size
+        frame[:3,3] = verts.mean(axis=0) + rot @ offset
+        frames.append(frame)
+    return np.array(frames)
+
+# 生成一个带起翘的规则瓦面网格
+# 起翘使得瓦面各处的坡度不同，缩放后的定位矩阵带有剪切
+def makeGrid(rows,cols):
+    gx,gy = np.meshgrid(
+        np.linspace(0,10,cols+1),np.linspace(0,8,rows+1))
+    gz = 0.3*gy + 0.02*gx**2
+    co = np.stack((gx,gy,gz),axis=2).reshape((-1,3))
+    r,c = np.meshgrid(np.arange(rows),np.arange(cols),indexing='ij')
+    v0 = (r*(cols+1) + c).ravel()
+    faces = np.stack((v0,v0+1,v0+cols+2,v0+cols+1),axis=1)
+    # 第一条边沿坡面方向
+    faces = faces[:,[0,3,2,1]]
+    loopTotal = np.full(len(faces),4)
+    loopStart = np.arange(len(faces))*4
+    return co,faces.ravel(),loopStart,loopTotal
+
+def benchmark(faceCount=10000,repeat=5):
+    import time
+    cols = 101
+    rows = max(1,faceCount // cols)
+    co,loopVerts,loopStart,loopTotal = makeGrid(rows,cols)
+    args = (co,loopVerts,loopStart,loopTotal,cols,0.3,0.4,0.05)
+
+    timeLoop = time.perf_counter()
+    framesLoop = getTileFramesLoop(*args)
+    timeLoop = time.perf_counter() - timeLoop
+
+    timeArray = time.perf_counter()
+    for n in range(repeat):
+        frames,tileClass = getTileFrames(*args)
+    timeArray = (time.perf_counter() - timeArray)/repeat
+
+    # 两种计算方式的结果应当一致
+    assert np.allclose(frames,framesLoop), \
+        "批量计算与逐面循环的结果不一致"
+
+    print("faces: %d" % len(loopStart))
+    print("loop:  %.4fs" % timeLoop)
+    print("numpy: %.4fs" % timeArray)
+    print("speedup: %.1fx" % (timeLoop/timeArray))
+    return timeLoop,timeArray
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        benchmark(int(sys.argv[1]))
+    else:
+        benchmark()
@@ -0,0 +1,138 @@
+# 作者：willimxp
+# 所属插件：ACA Builder
+# 功能概述：
+#   参数修改的延迟重建
+#   拖动DK、柱高、推山等滑块时，每个中间值都会触发一次update回调，
+#   原来每次都同步执行fastRun重建，拖动过程非常卡顿
+#   这里以bpy.app.timers合并同一建筑的连续修改，
+#   在停止修改一段时间（场景属性update_delay）后只重建一次，
+#   期间新的修改会推迟并替换尚未执行的重建
+import bpy
+import time
+from bpy.app.handlers import persistent
+
+from . import utils
+
+# 定时器的检查间隔(秒)
+TIMER_INTERVAL = 0.05
+
+# 延迟重建完成后，默认压入撤销栈的名称
+UNDO_MSG = 'ACA Rebuild'
+
+# 等待执行的重建，以建筑对象的指针为key
+# 同时记录名称，定时器执行时先按指针、再按名称查找建筑，
+# 避免等待期间建筑改名导致重建丢失
+# {pointer:{'name':..., 'func':..., 'kwargs':..., 'due':..., 'undo':...}}
+__pending = {}
+
+# 延迟执行重建
+# func为以buildingObj为参数的重建函数，如build.updateBuilding，
+# kwargs为func的其他参数
+# 同一建筑已有等待的重建时，按以下规则合并：
+#   相同的函数和参数，仅推迟执行时间
+#   不同的函数，改为分层重建，由参数差异决定重建哪些层
+# 属性修改的撤销步骤在回调返回后即已压入，延迟的重建完成后需要再压入一次，
+# 否则撤销时恢复的几何体与参数不一致，undoMsg为该撤销步骤的名称
+def schedule(buildingObj:bpy.types.Object,
+             func,
+             undoMsg:str = None,
+             **kwargs):
+    delay = bpy.context.scene.ACA_data.update_delay
+    # 后台运行时没有事件循环，定时器不会执行，直接重建
+    if delay <= 0 or bpy.app.background:
+        __run(buildingObj,func,kwargs,undoMsg)
+        return
+
+    key = buildingObj.as_pointer()
+    item = __pending.get(key)
+    if item != None and (item['func'] != func
+                         or item['kwargs'] != kwargs):
+        from . import build
+        func = build.updateBuilding
+        kwargs = {'incremental':True}
+    if undoMsg == None:
+        undoMsg = item['undo'] if item != None else UNDO_MSG
+    __pending[key] = {
+        'name' : buildingObj.name,
+        'func' : func,
+        'kwargs' : kwargs,
+        'due' : time.perf_counter() + delay,
+        'undo' : undoMsg,
+    }
+    if not bpy.app.timers.is_registered(__onTimer):
+        bpy.app.timers.register(__onTimer,
+                                first_interval=TIMER_INTERVAL)
+    return
+
+# 取消建筑等待中的重建
+def cancel(buildingObj:bpy.types.Object=None):
+    if buildingObj == None:
+        __pending.clear()
+    else:
+        __pending.pop(buildingObj.as_pointer(),None)
+    return
+
+# 是否有等待中的重建
+def isPending(buildingObj:bpy.types.Object=None):
+    if buildingObj == None:
+        return len(__pending) > 0
+    return buildingObj.as_pointer() in __pending
+
+def __run(buildingObj:bpy.types.Object,func,kwargs,undoMsg):
+    utils.fastRun(lambda:func(buildingObj=buildingObj,**kwargs))
+    if undoMsg != None and not bpy.app.background:
+        bpy.ops.ed.undo_push(message=undoMsg)
+    return
+
+# 查找等待重建的建筑
+# 优先按指针查找，建筑改名后仍能找到；
+# 撤销、重做后指针会变化，再按名称查找
+def __findBuilding(key,name):
+    for obj in bpy.data.objects:
+        if obj.as_pointer() == key:
+            return obj
+    return bpy.data.objects.get(name)
+
+# 定时器回调
+# 返回下次检查的间隔，返回None时注销定时器
+def __onTimer():
+    # 分步营造进行中，等待完成后再重建
+    from . import build
+    if not build.isFinished:
+        return TIMER_INTERVAL
+    now = time.perf_counter()
+    dueList = [key for key,item in __pending.items()
+               if item['due'] <= now]
+    for key in dueList:
+        item = __pending.pop(key)
+        buildingObj = __findBuilding(key,item['name'])
+        # 建筑已被删除
+        if buildingObj == None:
+            continue
+        args = (buildingObj,item['func'],item['kwargs'],item['undo'])
+        # 定时器中没有窗口上下文，重绘和视角设置需要指定窗口
+        windows = bpy.context.window_manager.windows
+        if len(windows) == 0:
+            __run(*args)
+            continue
+        with bpy.context.temp_override(window=windows[0],
+                                       screen=windows[0].screen):
+            __run(*args)
+    if len(__pending) == 0:
+        return None
+    return TIMER_INTERVAL
+
+# 打开新文件后，放弃等待中的重建
+@persistent
+def __onLoadPre(dummy):
+    __pending.clear()
+
+def register():
+    bpy.app.handlers.load_pre.append(__onLoadPre)
+
+def unregister():
+    if __onLoadPre in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(__onLoadPre)
+    if bpy.app.timers.is_registered(__onTimer):
+        bpy.app.timers.unregister(__onTimer)
+    __pending.clear()
@@ -14,6 +14,8 @@ import time
 from typing import List
 
 from . import data
+from . import orphanCleanup
+from . import meshArray
 from .const import ACA_Consts as con
 
 # 获取console窗口的context
@@ -73,6 +75,10 @@ def popMessageBox(message = "", icon = 'INFO'):
     logger = logging.getLogger('ACA')
     logger.info(message)
 
+    # 后台运行时没有界面，仅写入日志
+    if bpy.app.background:
+        return
+
     bpy.ops.aca.show_message_box('INVOKE_DEFAULT', 
         message=message, 
         icon=icon, 
@@ -217,12 +223,11 @@ def copySimplyObject(
         newObj.rotation_euler = rotation
     if scale != None:
         newObj.scale = scale
-    if dimensions != None:
-        newObj.dimensions = dimensions
-        # 缩放后需要更新数据，以便生效
-        updateScene()
     if parentObj != None:
         newObj.parent = parentObj
+    if dimensions != None:
+        # 250406 由网格包围盒直接计算缩放，不再刷新场景
+        setDimensions(newObj,dimensions)
     showObj(newObj)
     return newObj
 
@@ -259,12 +264,11 @@ def copyObject(
         newObj.rotation_euler = Euler(rotation,'XYZ')
     if scale != None:
         newObj.scale = scale
-    if dimensions != None:
-        newObj.dimensions = dimensions
-        # 缩放后需要更新数据，以便生效
-        updateScene()
     if parentObj != None:
         newObj.parent = parentObj
+    if dimensions != None:
+        # 250406 由网格包围盒直接计算缩放，不再刷新场景
+        setDimensions(newObj,dimensions)
     # 复制子对象
     if len(sourceObj.children) > 0 :
         for child in sourceObj.children:
@@ -365,14 +369,39 @@ def applyTransfrom(ob,
         swap(2)
         
     M = transform[0] @ transform[1] @ transform[2]
-    if hasattr(ob.data, "transform"):
+    if ob.type == 'MESH' and ob.data.shape_keys == None:
+        __transformMesh(ob.data,M)
+    elif hasattr(ob.data, "transform"):
         ob.data.transform(M)
     for c in ob.children:
         c.matrix_local = M @ c.matrix_local
         
     ob.matrix_basis = basis[0] @ basis[1] @ basis[2]
-    # 强制一次刷新，以便对象的dimension能够准确应用
-    updateScene()
+    # 250406 无修改器、无子对象时，尺寸可由getDimensions直接计算，
+    # 仅同步世界矩阵，不再刷新场景
+    if __isPlainMesh(ob) and len(ob.children) == 0:
+        if ob.parent != None:
+            ob.matrix_world = (ob.parent.matrix_world 
+                               @ ob.matrix_parent_inverse
+                               @ ob.matrix_basis)
+        else:
+            ob.matrix_world = ob.matrix_basis.copy()
+        markSceneDirty()
+    else:
+        # 强制一次刷新，以便对象的dimension能够准确应用
+        updateScene()
+
+# 以numpy将矩阵烘焙到网格顶点
+def __transformMesh(mesh:bpy.types.Mesh,matrix:Matrix):
+    count = len(mesh.vertices)
+    co = np.empty(count*3)
+    mesh.vertices.foreach_get('co',co)
+    co = co.reshape((-1,3))
+    M = np.array(matrix)
+    co = co @ M[:3,:3].T + M[:3,3]
+    mesh.vertices.foreach_set('co',co.ravel())
+    mesh.update()
+    return
 
 # 强制聚焦到对象
 def focusObj(object:bpy.types.Object):
@@ -388,30 +417,52 @@ def deleteHierarchy(parent_obj:bpy.types.Object,del_parent=False):
     if parent_obj == None:
         # 没有可删除的对象
         return
-    bpy.ops.object.select_all(action='DESELECT')
     obj = bpy.data.objects[parent_obj.name]
     obj.animation_data_clear()
-    names = set()
-    # Go over all the objects in the hierarchy like @zeffi suggested:
-    def get_child_names(obj):
-        for child in obj.children:
-            names.add(child.name)
-            if child.children:
-                get_child_names(child)
-    get_child_names(obj)
+    # 250405 原来递归收集子对象名称后逐个删除，再全局清理孤立数据
+    # 改为一次遍历收集子树，以batch_remove一次性删除对象及其独占的数据
+    objList = list(obj.children_recursive)
     
     # 是否删除根节点？
     if del_parent:
-        names.add(parent_obj.name)
-    objects = bpy.data.objects
-    if names:
-        for child_name in names:
-            bpy.data.objects.remove(objects[child_name])
+        objList.append(obj)
+    deleteObjects(objList)
 
-    delOrphan()
     # 数据清理
     updateScene()
 
+# 一次性删除对象，以及仅被这些对象使用的网格、曲线数据
+# 与其他对象共用的数据保留
+# 被删除网格上的材质登记到orphanCleanup，营造结束时无用户的一并释放
+def deleteObjects(objList:List[bpy.types.Object]):
+    if len(objList) == 0:
+        return
+    objMap = {obj.as_pointer():obj for obj in objList}
+    # 统计数据在待删除对象中的引用次数
+    dataRefs = {}
+    for obj in objMap.values():
+        objData = obj.data
+        if objData == None:
+            continue
+        key = objData.as_pointer()
+        if key in dataRefs:
+            dataRefs[key][1] += 1
+        else:
+            dataRefs[key] = [objData,1]
+    
+    idList = list(objMap.values())
+    matList = []
+    for objData,refCount in dataRefs.values():
+        if not isinstance(objData,(bpy.types.Mesh,bpy.types.Curve)):
+            continue
+        # 所有用户都在待删除对象中
+        if objData.users == refCount and not objData.use_fake_user:
+            idList.append(objData)
+            matList += [m for m in objData.materials if m != None]
+    bpy.data.batch_remove(idList)
+    orphanCleanup.release(matList)
+    return
+
 # 计算两个点之间距离
 # 使用blender提供的mathutils库中的Vector类
 # https://sinestesia.co/blog/tutorials/calculating-distances-in-blender-with-python/
@@ -599,104 +650,138 @@ def getMeshDims(object):
             z.max() - z.min()
             ))
 
+# 250406 不依赖depsgraph的尺寸计算
+# 原来设置dimensions、应用变换后都需要updateScene，才能读到正确的dimensions
+# 每根柱子、椽子、屋脊、瓦片资产、墙体定位对象都要刷新一次场景
+# 这里对无修改器的网格对象，直接由网格包围盒和缩放计算尺寸，
+# 包围盒按网格缓存，带修改器的对象仍由depsgraph计算，且仅在需要时刷新
+
+# 网格包围盒的缓存
+# 仅缓存不会被修改的网格：从资产库link的网格，以及资产缓存中已缩放的网格
+# 其他网格可能被原地编辑（如transform、bmesh写回），顶点数不变时无法察觉，每次重新计算
+# key为网格指针，同时校验网格名称和顶点数量，避免网格删除后指针被复用
+__meshBounds = {}
+# 资产缓存网格的命名前缀，与assetCache.CACHE_PREFIX一致
+# assetCache引用了utils，这里不反向引用
+__CACHE_PREFIX = 'ACA.cache.'
+# 场景是否有未刷新的修改
+__sceneState = {'dirty':False}
+
+# 网格是否不会再被修改，可以缓存包围盒
+def __isImmutableMesh(mesh:bpy.types.Mesh):
+    return (mesh.library != None
+            or mesh.name.startswith(__CACHE_PREFIX))
+
+# 获取网格的包围盒，返回(最小点,最大点)
+def getMeshBounds(mesh:bpy.types.Mesh):
+    count = len(mesh.vertices)
+    isImmutable = __isImmutableMesh(mesh)
+    if isImmutable:
+        cached = __meshBounds.get(mesh.as_pointer())
+        if (cached != None 
+                and cached[0] == mesh.name 
+                and cached[1] == count):
+            return cached[2],cached[3]
+    if count == 0:
+        return np.zeros(3),np.zeros(3)
+    co = np.empty(count*3)
+    mesh.vertices.foreach_get('co',co)
+    co = co.reshape((-1,3))
+    bounds = (co.min(axis=0),co.max(axis=0))
+    if isImmutable:
+        __meshBounds[mesh.as_pointer()] = (mesh.name,count) + bounds
+    return bounds
+
+# 清空包围盒缓存，在营造结束时调用
+def clearMeshBounds():
+    __meshBounds.clear()
+    return
+
+# 是否可以直接由网格计算尺寸
+def __isPlainMesh(object:bpy.types.Object):
+    return (object.type == 'MESH' 
+            and len(object.modifiers) == 0)
+
+# 标记场景有未刷新的修改
+def markSceneDirty():
+    __sceneState['dirty'] = True
+    return
+
+# 仅在有未刷新的修改时刷新场景
+def ensureScene():
+    if __sceneState['dirty']:
+        updateScene()
+    return
+
+# 获取对象的尺寸，等同于object.dimensions，但无需刷新场景
+def getDimensions(object:bpy.types.Object)->Vector:
+    if not __isPlainMesh(object):
+        ensureScene()
+        return object.dimensions.copy()
+    # 仅取对象自身的缩放，营造中父节点的matrix_world可能尚未刷新
+    low,high = getMeshBounds(object.data)
+    return Vector([(high[n]-low[n])*abs(object.scale[n]) 
+                   for n in range(3)])
+
+# 设置对象的尺寸，等同于object.dimensions = dimensions，但无需刷新场景
+# 可以仅设置某个轴，如setDimensions(obj,x=1.0)
+def setDimensions(object:bpy.types.Object,
+                  dimensions=None,
+                  x=None,y=None,z=None):
+    target = list(dimensions) if dimensions != None else [None]*3
+    for n,value in enumerate((x,y,z)):
+        if value != None:
+            target[n] = value
+    if not __isPlainMesh(object):
+        ensureScene()
+        current = object.dimensions.copy()
+        object.dimensions = [current[n] if target[n] == None 
+                             else target[n] for n in range(3)]
+        markSceneDirty()
+        return
+    # 与object.dimensions的赋值一致，仅修改对象自身的缩放
+    low,high = getMeshBounds(object.data)
+    for n in range(3):
+        size = high[n] - low[n]
+        if target[n] == None or size <= 0:
+            continue
+        object.scale[n] = math.copysign(
+            target[n]/size,
+            object.scale[n])
+    markSceneDirty()
+    return
+
 # 绘制六边形，用于窗台、槛墙等
+# 250406 原来用bmesh逐点挤出，改为直接写入棱柱的网格数组
 def drawHexagon(dimensions:Vector,
                 location:Vector,
                 half=False,
                 name='六棱柱',
                 parent=None,):
-    # 创建bmesh
-    bm = bmesh.new()
-    # 各个点的集合
-    vectors = []
-
     # 六边形位移距离
     offset = dimensions.y/math.tan(math.radians(60))
-    # 左顶点
-    v1=Vector((-dimensions.x/2,
-               0,
-               -dimensions.z/2))
-    vectors.append(v1)
-    # 左上点
-    v2=Vector((
-        -dimensions.x/2+offset,
-        dimensions.y/2,
-        -dimensions.z/2))
-    vectors.append(v2)
-    # 右上点
-    v3=Vector((
-        dimensions.x/2-offset,
-        dimensions.y/2,
-        -dimensions.z/2))
-    vectors.append(v3)
-    # 右顶点
-    v4=Vector((dimensions.x/2,
-               0,
-               -dimensions.z/2))
-    vectors.append(v4)
-    if not half:
-        # 右下点
-        v5=Vector((
-            dimensions.x/2-offset,
-            -dimensions.y/2,
-            -dimensions.z/2))
-        vectors.append(v5)
-        # 左下点
-        v6=Vector((
-            -dimensions.x/2+offset,
-            -dimensions.y/2,
-            -dimensions.z/2))
-        vectors.append(v6)
-    else:
-        # 右下点
-        v5=Vector((
-            dimensions.x/2-offset,
-            0,
-            -dimensions.z/2))
-        vectors.append(v5)
-        # 左下点
-        v6=Vector((
-            -dimensions.x/2+offset,
-            0,
-            -dimensions.z/2))
-        vectors.append(v6)
-
-    # 摆放点
-    vertices=[]
-    for n in range(len(vectors)):
-        if n==0:
-            vert = bm.verts.new(vectors[n])
-        else:
-            # 挤出
-            return_geo = bmesh.ops.extrude_vert_indiv(bm, verts=[vert])
-            vertex_new = return_geo['verts'][0]
-            del return_geo
-            # 给挤出的点赋值
-            vertex_new.co = vectors[n]
-            # 交换vertex给下一次循环
-            vert = vertex_new
-        vertices.append(vert)
-    
-    # 创建面
-    bm.faces.new((vertices[0],vertices[1],vertices[2],vertices[3],vertices[4],vertices[5]))
-
-    # 挤出厚度
-    return_geo = bmesh.ops.extrude_face_region(bm, geom=bm.faces)
-    verts = [elem for elem in return_geo['geom'] if type(elem) == bmesh.types.BMVert]
-    bmesh.ops.translate(bm, verts=verts, vec=(0, 0,dimensions.z))
-
-    # 确保face normal朝向
-    bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-
-    mesh = bpy.data.meshes.new(name)
-    obj = bpy.data.objects.new(name, mesh)
-    bpy.context.collection.objects.link(obj) 
-    bm.to_mesh(mesh)
-    bm.free()
-    obj.location = location
-    if parent != None:
-        obj.parent = parent
-
+    x = dimensions.x/2
+    y = dimensions.y/2
+    # 半六边形时，下侧两点收到中线上
+    yBottom = 0 if half else -y
+    outline = (
+        (-x,0),             # 左顶点
+        (-x+offset,y),      # 左上点
+        (x-offset,y),       # 右上点
+        (x,0),              # 右顶点
+        (x-offset,yBottom), # 右下点
+        (-x+offset,yBottom),# 左下点
+    )
+    arrays = meshArray.prismArrays(
+        outline,
+        zMin=-dimensions.z/2,
+        zMax=dimensions.z/2)
+    obj = addMeshObject(
+        arrays,
+        name=name,
+        parent=parent,
+        location=location,
+        focus=False)
     return obj
 
 # 快速执行bpy.ops执行
@@ -706,8 +791,19 @@ def drawHexagon(dimensions:Vector,
 # 如果函数带参数，需要用偏函数或闭包进行封装后传入
 # https://blender.stackexchange.com/questions/7358/python-performance-with-blender-operators
 def fastRun(func):
-    # 清理垃圾数据
-    delOrphan()
+    # 250330 按需统计bpy.ops的调用次数和耗时
+    from . import opsTrace
+    isOpsTrace = opsTrace.begin()
+    try:
+        return __fastRun(func)
+    finally:
+        if isOpsTrace:
+            opsTrace.finish()
+
+def __fastRun(func):
+    # 记录营造前已有的数据，结束时仅清理营造中产生的垃圾数据
+    # 250404 原来在开始和结束时都调用delOrphan，遍历整个文件
+    orphanCleanup.begin()
     
     # 关闭viewlayer的刷新
     from bpy.ops import _BPyOpsSubModOp
@@ -731,16 +827,29 @@ def fastRun(func):
                 + "”|请联系开发者，并提供日志文件")
         popMessageBox(message)
 
+        # 清理已产生的垃圾数据
+        orphanCleanup.finish()
+        clearMeshBounds()
+
         # 返回给上层调用
         return {'CANCELLED':e}
     finally:
         _BPyOpsSubModOp._view_layer_update = view_layer_update
     
-    # 清理重复的材质
-    cleanDupMat()
+    # 营造结束后刷新一次，显示最终结果
+    try:
+        requestRedraw(force=True)
+    except Exception as e:
+        print(e)
     
-    # 再次清理数据
-    delOrphan()
+    try:
+        # 清理重复的材质
+        cleanDupMat()
+    finally:
+        # 清理营造中产生的垃圾数据
+        # 即使清理材质出错，也要结束本次的垃圾记录
+        orphanCleanup.finish()
+        clearMeshBounds()
 
     return result
 
@@ -764,18 +873,14 @@ def outputMsg(msg:str):
     # 更新到build进度中
     from . import build
     build.buildStatus = msg
-    # 更新进度条
-    if build.progress < 0.5:
-        build.progress += 0.05
-    elif build.progress < 0.8:
-        build.progress += 0.02
-    else:
-        build.progress += 0.01
+    # 250402 进度条改为在build中按完成的步骤更新，不再按消息数量累加
     
     # 界面刷新
+    # 250403 原来每条消息都刷新，一次营造有几十次场景更新和窗口重绘
+    # 改为按时间限制刷新频率
     try:
         #console_print(strout)
-        redrawViewport()
+        requestRedraw()
         return 
     except Exception as e:
         print(e)
@@ -805,7 +910,36 @@ def showObj(object:bpy.types.Object) :
     object.hide_viewport = False    # “屏幕”，含在viewport中
     object.hide_render = False      # “相机”，渲染
 
+# 以网格数组创建对象
+# origin为新原点在网格坐标系中的位置，网格反向平移，对象位置随之移动，
+# 与setOrigin的效果一致，但不需要刷新场景
+# focus为True时聚焦到新对象，与bpy.ops.mesh.primitive_*_add的行为一致
+def addMeshObject(arrays,
+                  name,
+                  parent=None,
+                  location=(0,0,0),
+                  rotation=(0,0,0),
+                  origin=None,
+                  focus=True):
+    location = Vector(location)
+    if origin is not None:
+        origin = Vector(origin)
+        arrays = dict(arrays)
+        arrays['co'] = arrays['co'] - np.array(origin)
+        location = location + Euler(rotation).to_matrix() @ origin
+    mesh = meshArray.newMeshByArrays(arrays,name)
+    obj = bpy.data.objects.new(name, mesh)
+    obj.location = location
+    obj.rotation_euler = rotation
+    if parent != None:
+        obj.parent = parent
+    bpy.context.collection.objects.link(obj)
+    if focus:
+        focusObj(obj)
+    return obj
+
 # 创建一个基本圆柱体，可用于柱等直立构件
+# 250406 原来调用bpy.ops.mesh.primitive_cylinder_add，改为直接写入网格数组
 def addCylinder(radius=0.5,
                 depth=1,
                 name='cylinder',
@@ -813,57 +947,60 @@ def addCylinder(radius=0.5,
                 location=(0,0,0),
                 rotation=(0,0,0),
                 edge_num = 16,
-                origin_at_bottom = False):
+                origin_at_bottom = False,
+                uv_seam = False):
     # 定义圆柱体圆周面上的面数，不宜太高造成面数负担，也不宜太低影响美观
-    bpy.ops.mesh.primitive_cylinder_add(
-                        vertices = edge_num, 
-                        radius = radius, 
-                        depth = depth,
-                        end_fill_type='NGON', 
-                        calc_uvs=True, 
-                        enter_editmode=False, 
-                        align='WORLD', 
-                        location=location, 
-                        rotation=rotation, 
-                        scale=(1,1,1)
-                    )
-    cylinderObj = bpy.context.object
-    cylinderObj.name = name
-    cylinderObj.data.name = name
-    cylinderObj.parent = root_obj
-    cylinderObj.ACA_data.aca_obj = True
-    shaderSmooth(cylinderObj)
-
+    arrays = meshArray.cylinderArrays(
+        radius=radius,
+        depth=depth,
+        edgeNum=edge_num,
+        uvSeam=uv_seam)
     # 将Origin置于底部
+    origin = None
     if origin_at_bottom :
-        # bpy.ops.object.mode_set(mode = 'EDIT')
-        # bpy.ops.mesh.select_all(action = 'SELECT')
-        # bpy.ops.transform.translate(value=(0,0,depth/2))
-        # bpy.ops.object.mode_set(mode = 'OBJECT')    
-        setOrigin(cylinderObj,Vector((0,0,-depth/2)))
-
+        origin = Vector((0,0,-depth/2))
+    cylinderObj = addMeshObject(
+        arrays,
+        name=name,
+        parent=root_obj,
+        location=location,
+        rotation=rotation,
+        origin=origin,
+        focus=False)
+    cylinderObj.ACA_data.aca_obj = True
+    # shaderSmooth中会聚焦到该对象
+    shaderSmooth(cylinderObj)
     return cylinderObj
 
 # 创建一个水平放置的圆柱体，可用于桁、椽等构件
+# origin为新原点在水平圆柱坐标系中的位置
 def addCylinderHorizontal(radius,depth,name,root_obj,
                 location=(0,0,0),
                 rotation=(0,0,0),
-                edge_num=16):
+                edge_num=16,
+                origin=None,
+                uv_seam=False):
     # 圆柱旋转到横向摆放（默认为相对World垂直摆放）
-    rotation_default = (0,math.radians(90),0)
-    cylinder = addCylinder(radius=radius,
+    # 原来旋转后再applyTransfrom，现在直接旋转网格数组
+    arrays = meshArray.cylinderArrays(
+        radius=radius,
         depth=depth,
-        location=location,
-        rotation=rotation_default,
+        edgeNum=edge_num,
+        uvSeam=uv_seam)
+    arrays = meshArray.transformArrays(
+        arrays,
+        Euler((0,math.radians(90),0)).to_matrix().to_4x4())
+    cylinder = addMeshObject(
+        arrays,
         name=name,
-        root_obj=root_obj,
-        edge_num=edge_num
-    )
-    # apply rotation
-    #bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
-    applyTransfrom(cylinder,use_rotation=True)
-    # 旋转到实际角度
-    cylinder.rotation_euler = rotation
+        parent=root_obj,
+        location=location,
+        rotation=rotation,
+        origin=origin,
+        focus=False)
+    cylinder.ACA_data.aca_obj = True
+    # shaderSmooth中会聚焦到该对象
+    shaderSmooth(cylinder)
     return cylinder
 
 # 根据起始点，创建连接的圆柱体
@@ -872,24 +1009,76 @@ def addCylinderBy2Points(radius:float,
                          start_point:Vector,
                          end_point:Vector,
                          name:str,
-                         root_obj:bpy.types.Object):
+                         root_obj:bpy.types.Object,
+                         edge_num=16):
     depth = getVectorDistance(start_point,end_point)
     location = (start_point+end_point)/2
     rotation = alignToVector(end_point-start_point)
     rotation.x = 0 # 避免x轴翻转
+    # 设置origin到椽头，便于后续向外檐出
     cylinder = addCylinderHorizontal(
         radius=radius,
         depth=depth,
         location=location,
         rotation=rotation,
         name=name,
-        root_obj=root_obj
+        root_obj=root_obj,
+        edge_num=edge_num,
+        origin=Vector((-depth/2,0,0))
     )
-    # 设置origin到椽头，便于后续向外檐出
-    origin = locationTrans(start_point,root_obj,cylinder)
-    setOrigin(cylinder,origin)
     return cylinder
 
+# 根据多组起止点，批量创建圆柱体，合并为一个对象
+# 每根圆柱与addCylinderBy2Points一致：长度指向+X轴，起点为原点
+# 250406 原来逐根调用addCylinderBy2Points再joinObjects，
+# 现在将单位圆柱的网格数组按各根的矩阵一次性复制，只写入一次网格
+# 对象的位置和旋转取第一根圆柱，与joinObjects以第一个对象为基准一致
+def addCylinderSegments(radius:float,
+                        segments,
+                        name:str,
+                        root_obj:bpy.types.Object,
+                        edge_num=16):
+    # 单位长度的水平圆柱，原点在起点
+    unit = meshArray.cylinderArrays(
+        radius=radius,
+        depth=1,
+        edgeNum=edge_num,
+        origin=(0,0,-0.5))
+    unit = meshArray.transformArrays(
+        unit,
+        Euler((0,math.radians(90),0)).to_matrix().to_4x4())
+
+    # 各根圆柱的矩阵：起点平移、对齐方向、按长度缩放
+    rotations = []
+    matrixList = []
+    for start_point,end_point in segments:
+        rotation = alignToVector(end_point-start_point)
+        rotation.x = 0 # 避免x轴翻转
+        length = getVectorDistance(start_point,end_point)
+        rotations.append(rotation)
+        matrixList.append(
+            Matrix.Translation(start_point)
+            @ rotation.to_matrix().to_4x4()
+            @ Matrix.Diagonal((length,1,1,1)))
+    # 转换到第一根圆柱的坐标系
+    baseMatrix = (Matrix.Translation(segments[0][0])
+                  @ rotations[0].to_matrix().to_4x4())
+    baseInverted = baseMatrix.inverted()
+    mats = np.array([baseInverted @ mat for mat in matrixList])
+
+    arrays = meshArray.instanceArrays(unit,mats)
+    cylinderObj = addMeshObject(
+        arrays,
+        name=name,
+        parent=root_obj,
+        location=segments[0][0],
+        rotation=rotations[0],
+        focus=False)
+    cylinderObj.ACA_data.aca_obj = True
+    # shaderSmooth中会聚焦到该对象
+    shaderSmooth(cylinderObj)
+    return cylinderObj
+
 # 添加阵列修改器
 def addModifierArray(object:bpy.types.Object,
                      count:int,
@@ -1148,11 +1337,34 @@ def updateScene():
     # 按照文章的说法，这个消耗更低
     dg = bpy.context.evaluated_depsgraph_get() 
     dg.update()
+    __sceneState['dirty'] = False
 
 # 刷新viewport，避免长时间卡死，并可见到建造过程
+# 上一次刷新的时间
+__redrawState = {'last':0.0}
+
+# 按时间限制的界面刷新
+# 距上次刷新不足1/redraw_rate秒时跳过，force=True时强制刷新
+# 后台运行时不刷新
+def requestRedraw(force=False):
+    if bpy.app.background:
+        return
+    now = time.perf_counter()
+    if not force:
+        rate = bpy.context.scene.ACA_data.redraw_rate
+        if now - __redrawState['last'] < 1.0/rate:
+            return
+    redrawViewport()
+    __redrawState['last'] = time.perf_counter()
+    return
+
 def redrawViewport():
     updateScene()
 
+    # 后台运行时没有视图，无需设置视角和重绘
+    if bpy.app.background:
+        return
+
     # 设置窗口视角
     lockView = bpy.context.scene.ACA_data.is_auto_viewall
     if lockView:
@@ -1184,6 +1396,7 @@ def redrawViewport():
         bpy.ops.wm.redraw_timer(type='DRAW_WIN_SWAP', iterations=1)
 
 # 删除所有无用数据，以免拖累性能
+# 250404 遍历整个文件，营造中不再调用，仅供用户手动清理（aca.purge_orphans）
 def delOrphan():
     bpy.ops.outliner.orphans_purge(
                 do_local_ids=True, 
@@ -1342,32 +1555,17 @@ def addBezierByPoints(
 
     # 定义曲线横截面
     if width!=0 and height!=0:
-        bpy.ops.mesh.primitive_plane_add(size=1,location=(0,0,0))
-        bevel_object = bpy.context.object
-        bevel_object.name = name + '.bevel'
-        bevel_object.parent = root_obj
-        # 设置大小
-        bevel_object.scale = (width,height,0)
-        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-        updateScene()
-        # 移动origin
-        bpy.ops.object.mode_set(mode = 'EDIT')
-        bpy.ops.mesh.select_all(action = 'SELECT')
-        bpy.ops.transform.translate(value=(width/2,height/2,0))
-        bpy.ops.object.mode_set(mode = 'OBJECT')    
-
-        # 将Plane Mesh转换为Curve，才能绑定到curve上
-        
-        bpy.ops.object.convert(target='CURVE')
-        # 翻转curve，否则会导致连檐的face朝向不对
-        bpy.ops.object.editmode_toggle()
-        bpy.ops.curve.switch_direction()
-        bpy.ops.object.editmode_toggle()
+        # 移动origin到截面的角点
+        bevel_object = addBevelProfile(
+            name=name + '.bevel',
+            width=width,
+            height=height,
+            root_obj=root_obj,
+            offset=(width/2,height/2))
 
         curveData.bevel_mode = 'OBJECT'
         curveData.bevel_object = bevel_object
         polyline.use_smooth = False
-        hideObj(bevel_object)
 
     # 曲线对象加入场景
     curveOBJ = bpy.data.objects.new(name, curveData)
@@ -1377,6 +1575,33 @@ def addBezierByPoints(
     
     return curveOBJ
 
+# 创建矩形的曲线截面，用于曲线的bevel_object
+# 250406 原来添加plane后缩放、平移，再转换为Curve并翻转方向，
+# 现在直接写入与之相同的点序：转换后的曲线为逆时针，翻转后为顺时针
+# offset为截面相对中心的平移
+def addBevelProfile(name,
+                    width,
+                    height,
+                    root_obj,
+                    offset=(0,0),
+                    hide=True):
+    x = width/2
+    y = height/2
+    points = ((-x,-y),(-x,y),(x,y),(x,-y))
+    curveData = bpy.data.curves.new(name, type='CURVE')
+    curveData.dimensions = '3D'
+    polyline = curveData.splines.new('POLY')
+    polyline.points.add(len(points)-1)
+    for n,(px,py) in enumerate(points):
+        polyline.points[n].co = (px+offset[0],py+offset[1],0,1)
+    polyline.use_cyclic_u = True
+    bevelObj = bpy.data.objects.new(name, curveData)
+    bpy.context.collection.objects.link(bevelObj)
+    bevelObj.parent = root_obj
+    if hide:
+        hideObj(bevelObj)
+    return bevelObj
+
 # 提取bezier曲线上X方向等分的坐标点
 # 局限性，1，仅可判断两点定义的曲线，2，取值为近似值
 def getBezierSegment(curveObj,count,
@@ -1453,18 +1678,12 @@ def addCurveByPoints(CurvePoints,
     
     # 定义曲线横截面
     if width!=0 and height!=0:
-        bpy.ops.mesh.primitive_plane_add(size=1,location=(0,0,0))
-        bevel_object = bpy.context.object
-        bevel_object.scale = (width,height,0)
-        bevel_object.name = name + '.bevel'
-        bevel_object.parent = root_obj
-        # 将Plane Mesh转换为Curve，才能绑定到curve上
-        bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
-        bpy.ops.object.convert(target='CURVE')
-        # 翻转curve，否则会导致连檐的face朝向不对
-        bpy.ops.object.editmode_toggle()
-        bpy.ops.curve.switch_direction()
-        bpy.ops.object.editmode_toggle()
+        bevel_object = addBevelProfile(
+            name=name + '.bevel',
+            width=width,
+            height=height,
+            root_obj=root_obj,
+            hide=False)
 
         curveData.bevel_mode = 'OBJECT'
         curveData.bevel_object = bevel_object
@@ -1583,8 +1802,7 @@ def joinObjects(objList:List[bpy.types.Object],
         bpy.ops.mesh.remove_doubles()
         bpy.ops.object.mode_set( mode = 'OBJECT' )
 
-    # 清理垃圾数据
-    delOrphan()
+    # 被合并对象的网格已无用户，在营造结束时统一清理
 
     # print("Objects join in %.2f秒" 
     #            % (time.time()-timeStart))
@@ -1736,7 +1954,7 @@ def replaceObject(
     toObj.parent = fromObj.parent
 
     if use_Dimension:
-        toObj.dimensions = getMeshDims(fromObj) # 排除modifier的尺寸
+        setDimensions(toObj,getMeshDims(fromObj)) # 排除modifier的尺寸
         applyTransfrom(toObj,use_scale=True)
     
     if use_Modifier: